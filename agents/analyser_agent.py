@@ -5,27 +5,54 @@ from datetime import datetime
 from rich.console import Console
 from rich.tree import Tree
 from rich.panel import Panel
+from repo_index import (
+    scan_repository,
+    load_manifest,
+    save_manifest,
+    diff_manifest,
+    index_revision,
+)
+from vb_lexer import parse_vb_file, parse_vb_files, read_source
+from vb_parser import extract_methods_from_content
+from dependency_graph import (
+    build_dependency_graph,
+    load_dependency_graph,
+    save_dependency_graph,
+    GRAPH_PATH,
+)
 
 console = Console(record=True)
 
-IMPORT_PATTERN = re.compile(r"^\s*Imports\s+([A-Za-z0-9_.]+)", re.MULTILINE)
-
 
 def extract_imports_from_vb(file_path: str):
-    """Extract all 'Imports' dependencies from a VB.NET file."""
+    """Extract all 'Imports' dependencies from a VB.NET file (shared lexer pass)."""
     try:
-        with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read()
-        return IMPORT_PATTERN.findall(content)
+        return [imp["name"] for imp in parse_vb_file(file_path)["imports"]]
     except Exception:
         return []
 
 
-def analyze_repo_structure(repo_path: str, return_tree=False):
+def _load_previous_summary(json_path: str):
+    try:
+        with open(json_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def analyze_repo_structure(
+    repo_path: str, return_tree=False, index=None, force=False, workers=None, symbols=None
+):
     """
     Scans the project folder, builds a rich tree visualization,
     extracts dependencies, and saves project_summary.json.
 
+    Pass a shared `index` from repo_index.scan_repository to skip the walk.
+    Imports are only re-extracted for files added or changed since the manifest
+    saved next to project_summary.json (force=True re-reads everything), and
+    those files are parsed across `workers` processes.
+    `symbols` (symbol_index.SymbolIndex) is brought up to date for every VB file
+    whose hash it has not seen yet.
     If return_tree=True → returns (summary, tree_text)
     """
     # ✅ Create a fresh Rich console that records output each run
@@ -41,33 +68,74 @@ def analyze_repo_structure(repo_path: str, return_tree=False):
 
     root_tree = Tree(f"[bold cyan]📁 {os.path.basename(repo_path)}[/bold cyan]")
 
-    # ---- Build directory tree ----
-    for root, dirs, files in os.walk(repo_path):
-        rel_root = os.path.relpath(root, repo_path)
-        branch = root_tree
-        if rel_root != ".":
-            for part in rel_root.split(os.sep):
-                branch = branch.add(f"[yellow]{part}[/yellow]")
-
-        for file in files:
-            ext = os.path.splitext(file)[-1].lower()
-            abs_path = os.path.join(root, file)
-            rel_path = os.path.join(rel_root, file)
-
-            summary["extensions"][ext].append(rel_path)
-
-            color = (
-                "green"
-                if ext == ".vb"
-                else "blue" if ext in [".config", ".csproj"] else "white"
+    json_path = os.path.join("reports", "project_summary.json")
+    manifest = {} if force else load_manifest(repo_path)
+    previous = _load_previous_summary(json_path) if manifest else None
+    if index is None:
+        index = scan_repository(repo_path, previous=manifest)
+
+    changes = diff_manifest(manifest, index)
+    stale = changes["added"] | changes["changed"]
+    previous_deps = (previous or {}).get("vb_dependencies", {})
+    if previous is not None:
+        local_console.print(
+            f"[cyan]♻ Incremental scan:[/cyan] {len(changes['added'])} added, "
+            f"{len(changes['changed'])} changed, {len(changes['deleted'])} deleted"
+        )
+
+    # Parse stale VB files up front in parallel; extract_imports_from_vb then hits the cache
+    parse_vb_files(
+        [
+            e["path"] for e in index
+            if e["ext"] == ".vb"
+            and (
+                previous is None
+                or e["rel_path"] in stale
+                or (symbols and symbols.needs_update(e["rel_path"], e["hash"]))
             )
-            branch.add(f"[{color}]{file}[/{color}]")
+        ],
+        workers=workers,
+    )
 
-            # Extract dependencies if VB.NET
-            if ext == ".vb":
-                imports = extract_imports_from_vb(abs_path)
-                if imports:
-                    summary["vb_dependencies"][rel_path] = imports
+    # ---- Build directory tree ----
+    branches = {"": root_tree}
+    for entry in index:
+        rel_dir, _, file = entry["rel_path"].rpartition("/")
+        branch = branches.get(rel_dir)
+        if branch is None:
+            branch, built = root_tree, ""
+            for part in rel_dir.split("/"):
+                built = f"{built}/{part}" if built else part
+                if built not in branches:
+                    branches[built] = branch.add(f"[yellow]{part}[/yellow]")
+                branch = branches[built]
+
+        ext = entry["ext"]
+        rel_path = entry["rel_path"]
+        summary["extensions"][ext].append(rel_path)
+
+        color = (
+            "green"
+            if ext == ".vb"
+            else "blue" if ext in [".config", ".csproj"] else "white"
+        )
+        branch.add(f"[{color}]{file}[/{color}]")
+
+        # Extract dependencies if VB.NET (unchanged files reuse the previous result)
+        if ext == ".vb":
+            if previous is not None and rel_path not in stale:
+                imports = previous_deps.get(rel_path, [])
+            else:
+                imports = extract_imports_from_vb(entry["path"])
+            if imports:
+                summary["vb_dependencies"][rel_path] = imports
+            if symbols and symbols.needs_update(rel_path, entry["hash"]):
+                content = read_source(entry["path"])
+                parsed = parse_vb_file(entry["path"], content)
+                symbols.update_file(
+                    rel_path, entry["hash"], parsed,
+                    extract_methods_from_content(content, parsed),
+                )
 
     # ---- Print & Export Tree ----
     local_console.print(root_tree)
@@ -80,12 +148,21 @@ def analyze_repo_structure(repo_path: str, return_tree=False):
     tree_text = re.sub(r"\n\s*\n", "\n", tree_text).strip()
     # ---- Save summary ----
     os.makedirs("reports", exist_ok=True)
-    json_path = os.path.join("reports", "project_summary.json")
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(summary, f, indent=2)
+    save_manifest(repo_path, index)
+
+    # ---- Clustered dependency graph + layout (only rebuilt when the repo changed) ----
+    revision = index_revision(index)
+    graph = load_dependency_graph()
+    if force or not graph or graph.get("revision") != revision:
+        save_dependency_graph(build_dependency_graph(summary["vb_dependencies"], revision))
+    if symbols:
+        symbols.retain(e["rel_path"] for e in index if e["ext"] == ".vb")
 
     local_console.print(
         f"[bold magenta]📦 Project summary saved to:[/bold magenta] {json_path}\n"
+        f"[bold magenta]🕸 Dependency graph saved to:[/bold magenta] {GRAPH_PATH}\n"
     )
 
     # ---- Return both summary & tree ----
@@ -1,22 +1,29 @@
 # agents/annotator_agent.py
 import os, json
 from rich.console import Console
-from ai_provider import LLMProvider
-import time
+from provider_router import get_llm
 import re
-from dotenv import load_dotenv
+import hashlib
 
-from pathlib import Path
+from repo_index import scan_repository
+from vb_lexer import parse_vb_file
+from rate_limiter import RateLimiter
 
 console = Console()
-env_path = Path(__file__).resolve().parents[1] / ".env"
-load_dotenv(dotenv_path=env_path)
-llm = LLMProvider()
 
+ANNOTATION_CACHE_PATH = os.path.join("reports", "annotation_cache.jsonl")
+ANNOTATE_CONCURRENCY = int(os.getenv("ANNOTATE_CONCURRENCY", "4"))
+FLUSH_EVERY = 50  # rewrite annotations.json every N new summaries, not after each file
 
-def summarize_file(file_path: str):
-    """Locally parse the file to extract only relevant structural info, then send to LLM."""
-    try:
+
+def build_file_prompt(file_path: str):
+    """Locally parse the file and build the small structural prompt sent to the LLM."""
+    if file_path.lower().endswith(".vb"):
+        # 🔹 VB.NET: reuse the shared lexer pass (types + members)
+        parsed = parse_vb_file(file_path)
+        tokens = [f"{t['kind']} {t['name']}" for t in parsed["types"]]
+        tokens += [f"{m['kind']} {m['name']}" for m in parsed["members"]]
+    else:
         with open(file_path, "r", encoding="utf-8", errors="ignore") as f:
             content = f.read()
 
@@ -28,30 +35,79 @@ def summarize_file(file_path: str):
 
         # 🔹 Extract only key parts (classes, functions, subs)
         tokens = re.findall(r"(?i)(class\s+\w+|sub\s+\w+|function\s+\w+|public\s+\w+|private\s+\w+)", clean)
-        snippet = ", ".join(tokens)[:800]
+    snippet = ", ".join(tokens)[:800]
 
-        file_name = os.path.basename(file_path)
-        ext = os.path.splitext(file_name)[-1].lower().replace(".", "")
+    file_name = os.path.basename(file_path)
+    ext = os.path.splitext(file_name)[-1].lower().replace(".", "")
 
-        # ✨ Small, structured prompt
-        prompt = (
-            f"This is a {ext.upper()} source file named '{file_name}'. "
-            f"It contains: {snippet or 'no identifiable functions or classes'}. "
-            "Describe in one short English line what the file likely does."
-        )
+    # ✨ Small, structured prompt
+    return (
+        f"This is a {ext.upper()} source file named '{file_name}'. "
+        f"It contains: {snippet or 'no identifiable functions or classes'}. "
+        "Describe in one short English line what the file likely does."
+    )
+
+
+def _summarize_prompt(prompt: str, file_name: str):
+    return _clean_summary(get_llm().generate(prompt), file_name)
+
+
+def _clean_summary(summary, file_name: str):
+    if not isinstance(summary, str) or not summary.strip():
+        return f"⚠ No summary generated for {file_name}"
+    return summary.strip()
 
-        summary = llm.generate(prompt)
-        if not isinstance(summary, str) or not summary.strip():
-            return f"⚠ No summary generated for {file_name}"
-        return summary.strip()
 
+def summarize_file(file_path: str):
+    """Locally parse the file to extract only relevant structural info, then send to LLM."""
+    try:
+        return _summarize_prompt(build_file_prompt(file_path), os.path.basename(file_path))
     except Exception as e:
         return f"⚠ Exception while summarizing {file_path}: {e}"
 
 
-def annotate_repository(repo_path, extensions=[".vb", ".cs", ".py"], force=False):
-    """Summarize each relevant file, caching results."""
-    import json, time, os
+def _load_annotation_cache(path=ANNOTATION_CACHE_PATH):
+    """Append-only JSONL log of {"key": prompt hash, "summary"}; later lines win."""
+    cache = {}
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                    cache[item["key"]] = item["summary"]
+                except (ValueError, KeyError):
+                    continue  # torn line from an interrupted run
+    return cache
+
+
+def _save_annotations(annotations, save_path):
+    tmp_path = save_path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(annotations, f, indent=2)
+    os.replace(tmp_path, save_path)
+
+
+def annotate_repository(
+    repo_path,
+    extensions=[".vb", ".cs", ".py"],
+    force=False,
+    index=None,
+    concurrency=None,
+    rps=None,
+    on_progress=None,
+):
+    """
+    Summarize each relevant file, caching results. `index` is a shared repo_index scan.
+
+    Summaries are cached by a hash of the structural prompt, so a file is only
+    re-summarized when its structure changes. Requests go out through
+    get_llm().generate_many — up to `concurrency` in flight on one event loop
+    (ANNOTATE_CONCURRENCY), paced by the provider's shared adaptive rate limiter;
+    `rps`, if given, additionally caps this run at that many requests per second.
+    New summaries are appended to reports/annotation_cache.jsonl and
+    annotations.json is rewritten in batches.
+    on_progress(done, total), if given, is called as files are summarized.
+    """
     console.print("[bold cyan]🧩 Annotator Agent: Generating file summaries...[/bold cyan]")
 
     os.makedirs("reports", exist_ok=True)
@@ -65,26 +121,62 @@ def annotate_repository(repo_path, extensions=[".vb", ".cs", ".py"], force=False
                 annotations = json.load(f)
         except Exception:
             annotations = {}
+    cache = _load_annotation_cache()
 
-    for root, _, files in os.walk(repo_path):
-        for file in files:
-            ext = os.path.splitext(file)[-1].lower()
-            abs_path = os.path.join(root, file)
-
-            if ext not in extensions:
-                continue
+    if index is None:
+        index = scan_repository(repo_path, with_hash=False)
 
-            if abs_path in annotations and not force:
-                console.print(f"[yellow]⏩ Cached: {file}[/yellow]")
-                continue
-
-            summary = summarize_file(abs_path)
+    todo, cached = [], 0
+    for entry in index:
+        if entry["ext"] not in extensions:
+            continue
+        abs_path = entry["path"]
+        try:
+            prompt = build_file_prompt(abs_path)
+        except Exception as e:
+            annotations[abs_path] = f"⚠ Exception while summarizing {abs_path}: {e}"
+            continue
+        key = hashlib.sha1(prompt.encode("utf-8")).hexdigest()
+        if key in cache and not force:
+            annotations[abs_path] = cache[key]
+            cached += 1
+            continue
+        todo.append((abs_path, prompt, key))
+
+    if cached:
+        console.print(f"[yellow]⏩ {cached} files unchanged — summaries reused[/yellow]")
+
+    if on_progress:
+        on_progress(0, len(todo))
+    limiter = RateLimiter(rps) if rps else None
+
+    done = []
+
+    with open(ANNOTATION_CACHE_PATH, "a", encoding="utf-8") as log:
+
+        def on_result(i, summary):
+            # completion order; runs on the event loop between requests
+            abs_path, _, key = todo[i]
+            summary = _clean_summary(summary, os.path.basename(abs_path))
             annotations[abs_path] = summary
-            console.print(f"[green]✔ {file}[/green]: {summary}")
-            time.sleep(1.5)
-
-            with open(save_path, "w", encoding="utf-8") as f:
-                json.dump(annotations, f, indent=2)
-
+            console.print(f"[green]✔ {os.path.basename(abs_path)}[/green]: {summary}")
+            if not summary.startswith("⚠"):
+                log.write(json.dumps({"key": key, "summary": summary}) + "\n")
+            done.append(abs_path)
+            if on_progress:
+                on_progress(len(done), len(todo))
+            if len(done) % FLUSH_EVERY == 0:
+                log.flush()
+                _save_annotations(annotations, save_path)
+
+        if todo:
+            get_llm().generate_many(
+                [prompt for _, prompt, _ in todo],
+                concurrency=concurrency or ANNOTATE_CONCURRENCY,
+                on_result=on_result,
+                limiter=limiter,
+            )
+
+    _save_annotations(annotations, save_path)
     console.print(f"[bold green]✅ File annotations saved to {save_path}[/bold green]")
     return annotations
@@ -1,12 +1,12 @@
 # agents/planner_agent.py
 import os, json
 from rich.console import Console
-from ai_provider import LLMProvider
+from provider_router import get_llm
 
 console = Console()
-llm = LLMProvider()
 
-def generate_migration_plan(language_info, target_language):
+def generate_migration_plan(language_info, target_language, on_token=None):
+    """`on_token(text)` receives the plan piece by piece while it is being generated."""
     console.print("[bold cyan]🧩 Planner Agent: Drafting migration plan...[/bold cyan]")
     src_lang = language_info.get("primary", "Unknown")
 
@@ -25,7 +25,7 @@ def generate_migration_plan(language_info, target_language):
     """
 
     try:
-        plan_text = llm.generate(prompt)
+        plan_text = get_llm().generate(prompt, on_token=on_token)
     except Exception as e:
         plan_text = f"⚠ Exception during migration plan generation:\n{e}"
 
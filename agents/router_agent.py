@@ -1,6 +1,7 @@
 import os, re, json
 from rich.console import Console
 from collections import Counter
+from repo_index import scan_repository
 
 console = Console()
 
@@ -18,14 +19,11 @@ LANG_MAP = {
 }
 
 
-def detect_languages(repo_path: str):
+def detect_languages(repo_path: str, index=None):
     console.print("[bold cyan]🧭 Routing Agent: Detecting languages...[/bold cyan]")
-    exts = []
-    for root, _, files in os.walk(repo_path):
-        for f in files:
-            ext = os.path.splitext(f)[-1].lower()
-            if ext in LANG_MAP:
-                exts.append(LANG_MAP[ext])
+    if index is None:
+        index = scan_repository(repo_path, with_hash=False)
+    exts = [LANG_MAP[e["ext"]] for e in index if e["ext"] in LANG_MAP]
     if not exts:
         console.print("[red]No recognized language extensions found.[/red]")
         return None
@@ -1,126 +1,458 @@
 # ai_provider.py
 import os
 import json
-import requests
+import threading
 import time
-from dotenv import load_dotenv
+from token_budget import budget_for, estimate_tokens
+from rate_limiter import shared_limiter, parse_retry_after, DEFAULT_RETRY_AFTER
+import telemetry
+
+LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "120"))  # seconds without a byte from the server
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "10"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "32"))  # generate_many default
+POOL_SIZE = 64  # keep-alive connections per provider for the threaded (sync) path
+RETRY_ATTEMPTS = 3
+NAMES = {"gemini": "Gemini", "openrouter": "OpenRouter", "huggingface": "Hugging Face", "ollama": "Ollama"}
+KEY_ENV = {"gemini": "GEMINI_API_KEY", "openrouter": "OPENROUTER_API_KEY", "huggingface": "HUGGINGFACE_API_KEY"}
+NOT_SENT = 0  # outcome["status"] of a request refused before any HTTP (missing key, too large)
+
+
+class StreamError(Exception):
+    """A streamed completion failed; the message is the user-facing "⚠ ..." text."""
+
+
+def _sse_events(response):
+    """JSON payloads of a `text/event-stream` response (Gemini alt=sse, OpenRouter)."""
+    response.encoding = "utf-8"  # SSE is always UTF-8; requests would guess latin-1
+    # chunk_size=None hands over each chunk as it arrives instead of waiting for 512 bytes
+    for line in response.iter_lines(chunk_size=None, decode_unicode=True):
+        if not line or line.startswith(":") or not line.startswith("data:"):
+            continue  # blank separators, keep-alive comments, event:/id: fields
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        yield json.loads(data)
 
-load_dotenv()
 
 class LLMProvider:
-    def __init__(self):
-        self.provider = os.getenv("AI_PROVIDER", "gemini")  # gemini | openrouter | huggingface | ollama
-        self.api_key = os.getenv("GEMINI_API_KEY") or os.getenv("OPENROUTER_API_KEY")
-        self.model = os.getenv("MODEL", "gemini-2.0-flash-lite")
+    """
+    One provider/model. Arguments default to AI_PROVIDER / MODEL / <PROVIDER>_API_KEY;
+    `attempts` is how often a 429 is retried in place (provider_router passes 1 and
+    fails over instead). Hosted APIs are paced by a rate_limiter.SharedRateLimiter
+    that every process using the same API key shares.
+    """
+
+    def __init__(self, provider=None, model=None, api_key=None, attempts=RETRY_ATTEMPTS):
+        # gemini | openrouter | huggingface | ollama
+        self.provider = provider or os.getenv("AI_PROVIDER", "gemini")
+        self.api_key = (
+            api_key
+            or os.getenv(KEY_ENV.get(self.provider.lower(), ""), "")
+            or os.getenv("GEMINI_API_KEY")
+            or os.getenv("OPENROUTER_API_KEY")
+        )
+        self.model = model or os.getenv("MODEL", "gemini-2.0-flash-lite")
+        self.attempts = max(1, attempts)
+        # <PROVIDER>_BASE_URL points a provider at a proxy or a local stand-in
+        # (e.g. benchmarks/fake_llm_server.py)
         self.base_urls = {
-            "gemini": "https://generativelanguage.googleapis.com/v1beta/models",
-            "openrouter": "https://openrouter.ai/api/v1/chat/completions",
-            "huggingface": "https://api-inference.huggingface.co/models",
-            "ollama": "http://localhost:11434/api/generate",
+            "gemini": os.getenv(
+                "GEMINI_BASE_URL", "https://generativelanguage.googleapis.com/v1beta/models"
+            ),
+            "openrouter": os.getenv(
+                "OPENROUTER_BASE_URL", "https://openrouter.ai/api/v1/chat/completions"
+            ),
+            "huggingface": os.getenv(
+                "HUGGINGFACE_BASE_URL", "https://api-inference.huggingface.co/models"
+            ),
+            "ollama": os.getenv("OLLAMA_BASE_URL", "http://localhost:11434/api/generate"),
         }
+        # (connect, read) — no request may hang forever
+        self.timeout = (LLM_CONNECT_TIMEOUT, LLM_TIMEOUT)
+        self._session = None
+        self._session_lock = threading.Lock()
+        self._shared_limiter = None
 
-    def generate(self, prompt: str):
+    def _limiter(self):
+        """Shared, adaptive limiter of this account; None for Ollama or with LLM_RPS=0."""
         provider = self.provider.lower()
-        if provider == "gemini":
-            return self._call_gemini(prompt)
-        elif provider == "openrouter":
-            return self._call_openrouter(prompt)
-        elif provider == "huggingface":
-            return self._call_huggingface(prompt)
-        elif provider == "ollama":
-            return self._call_ollama(prompt)
-        else:
-            raise ValueError(f"Unknown AI provider: {provider}")
+        if self._shared_limiter is None and provider in KEY_ENV:
+            with self._session_lock:
+                if self._shared_limiter is None:
+                    self._shared_limiter = shared_limiter(
+                        provider, self.api_key, self.base_urls.get(provider, "")
+                    )
+        return self._shared_limiter
+
+    def _pace(self):
+        """Wait for a slot of the shared limiter; returns the seconds waited."""
+        limiter = self._limiter()
+        return limiter.acquire() if limiter else 0.0
+
+    def _on_response(self, status: int, headers, attempt: int):
+        """
+        Feed the response to the limiter. For a 429, returns how long to back off:
+        Retry-After if the server sent one (else DEFAULT_RETRY_AFTER doubling per
+        attempt), or longer if another process already blocked the bucket.
+        """
+        limiter = self._limiter()
+        if status != 429:
+            if limiter and status < 400:
+                limiter.succeeded()
+            return None
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        if retry_after is None:
+            retry_after = DEFAULT_RETRY_AFTER * 2 ** attempt
+        return limiter.throttled(retry_after) if limiter else retry_after
 
-    def _call_gemini(self, prompt: str):
-        base = self.base_urls["gemini"]
-        model = self.model or "gemini-2.0-flash-lite"
-        key = self.api_key
+    def _http(self):
+        """Shared keep-alive session: one TLS handshake per pooled connection, not per call."""
+        if self._session is None:
+            # requests is imported on first use: it is the slowest import of a cold start
+            import requests
+            from requests.adapters import HTTPAdapter
 
-        if not key:
+            with self._session_lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    self._session = session
+        return self._session
+
+    def _check(self, provider: str, prompt: str):
+        """A "⚠ ..." message when the request cannot be sent at all, else None."""
+        if provider not in NAMES:
+            raise ValueError(f"Unknown AI provider: {provider}")
+        if provider == "gemini" and not self.api_key:
             return "⚠ Gemini API key missing in environment."
-        clean_prompt = (
-        prompt.replace("```", "")      # remove code fences
-        .replace("\u0000", "")   # remove nulls
-        .replace("\r", " ")[:10000]  # trim to ~10 KB
-    )
-
-        url = f"{base}/{model}:generateContent?key={key}"
-        payload = {
-        "contents": [
-            {
-                "role": "user",  # ✅ required field!
-                "parts": [{"text": clean_prompt}]
+        # Never cut a prompt silently: callers chunk large inputs (see method_chunker)
+        limit = budget_for(provider, self.model)["context"]
+        if estimate_tokens(prompt) > limit:
+            return (
+                f"⚠ Prompt too large for {provider}/{self.model}: "
+                f"~{estimate_tokens(prompt)} tokens > {limit}"
+            )
+        return None
+
+    # ---------- Requests and responses (shared by the sync, streaming and async paths) ----------
+    def _request(self, provider: str, prompt: str, stream: bool = False):
+        """(url, headers, json body) of one completion request."""
+        if provider == "gemini":
+            model = self.model or "gemini-2.0-flash-lite"
+            action = "streamGenerateContent?alt=sse&" if stream else "generateContent?"
+            url = f"{self.base_urls['gemini']}/{model}:{action}key={self.api_key}"
+            body = {
+                "contents": [
+                    {"role": "user", "parts": [{"text": prompt.replace("\u0000", "")}]}  # remove nulls
+                ]
+            }
+            return url, {"Content-Type": "application/json"}, body
+        if provider == "openrouter":
+            body = {
+                "model": self.model,
+                "messages": [
+                    {"role": "system", "content": "You are an AI assistant."},
+                    {"role": "user", "content": prompt},
+                ],
             }
-        ]
-    }
-        headers = {"Content-Type": "application/json"}
+            if stream:
+                body["stream"] = True
+            headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
+            return self.base_urls["openrouter"], headers, body
+        if provider == "huggingface":
+            url = f"{self.base_urls['huggingface']}/{self.model}"
+            return url, {"Authorization": f"Bearer {self.api_key}"}, {"inputs": prompt}
+        # Ollama streams NDJSON unless told otherwise
+        return self.base_urls["ollama"], {}, {"model": self.model, "prompt": prompt, "stream": stream}
+
+    def _parse(self, provider: str, status: int, reason: str, text: str):
+        """Completion text, or a "⚠ ..." message, from a finished (non-streamed) response."""
+        name = NAMES[provider]
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return f"⚠ {name} error: {status} {reason} | {text[:200]}"
+
+        if provider == "gemini":
+            if status >= 400:
+                # detailed message for debugging
+                return f"⚠ Gemini network error: {status} {reason} | {text[:200]}"
+            if "candidates" in data and len(data["candidates"]) > 0:
+                parts = data["candidates"][0].get("content", {}).get("parts", [])
+                if parts and "text" in parts[0]:
+                    return parts[0]["text"].strip()
+            if "error" in data:
+                return f"⚠ Gemini API error: {data['error'].get('message', 'unknown error')}"
+            return f"⚠ Unexpected Gemini response: {json.dumps(data)[:300]}"
+        if provider == "openrouter":
+            try:
+                return data["choices"][0]["message"]["content"].strip()
+            except Exception:
+                return f"⚠ OpenRouter error: {data}"
+        if provider == "huggingface":
+            try:
+                if isinstance(data, list):
+                    return data[0]["generated_text"]
+                if isinstance(data, dict) and "error" in data:
+                    return f"⚠ Hugging Face error: {data['error']}"
+                return str(data)
+            except Exception:
+                return f"⚠ Hugging Face error: {data}"
+        if not isinstance(data, dict) or "error" in data or status >= 400:
+            return f"⚠ Ollama error: {data}"
+        return data.get("response", str(data))
+
+    # ---------- Blocking calls (pooled session, thread-safe) ----------
+    def generate(self, prompt: str, on_token=None, outcome: dict = None):
+        """
+        Full completion as a string (or a "⚠ ..." message). With `on_token`, the
+        response is streamed and on_token(text) is called for every piece as it arrives.
+        `outcome`, if given, receives {"text", "status"}: the last HTTP status, None
+        after a network error, NOT_SENT if the request was refused locally.
+        """
+        outcome = {} if outcome is None else outcome
+        if on_token is not None:
+            for piece in self.generate_stream(prompt, outcome):
+                on_token(piece)
+            return outcome["text"]
+        provider = self.provider.lower()
+        error = self._check(provider, prompt)
+        if error:
+            outcome.update(text=error, status=NOT_SENT)
+            return error
+        # queueing for the quota happens before the span: only the request is timed
+        self._pace()
+        # 📈 latency, sizes, status, retries and backoff of every call
+        with telemetry.llm_call(provider, self.model, prompt) as result:
+            result.set(self._complete(provider, prompt))
+            outcome.update(text=result.value, status=telemetry.http_status())
+        return result.value
+
+    def _complete(self, provider: str, prompt: str):
+        import requests
 
+        url, headers, body = self._request(provider, prompt)
         try:
-            for attempt in range(3):
-                r = requests.post(url, headers=headers, json=payload, timeout=60)
-                if r.status_code == 429:
-                    time.sleep(8 * (attempt + 1))
+            for attempt in range(self.attempts):
+                if attempt:
+                    telemetry.note_wait(self._pace())
+                r = self._http().post(url, headers=headers, json=body, timeout=self.timeout)
+                telemetry.note_http_status(r.status_code)
+                backoff = self._on_response(r.status_code, r.headers, attempt)
+                if backoff is not None and attempt + 1 < self.attempts:
+                    telemetry.note_retry(backoff)
+                    time.sleep(backoff)
                     continue
+                return self._parse(provider, r.status_code, r.reason, r.text)
+        except requests.exceptions.RequestException as e:
+            return f"⚠ {NAMES[provider]} network error: {e}"
+        return f"⚠ {NAMES[provider]} returned no content."
+
+    # ---------- Streaming ----------
+    def generate_stream(self, prompt: str, outcome: dict = None):
+        """
+        Yield the completion piece by piece as the provider sends it.
+        A failure is yielded as a final "⚠ ..." piece; `outcome["text"]` receives
+        what generate() would have returned (the error alone if the stream broke).
+        """
+        outcome = {} if outcome is None else outcome
+        provider = self.provider.lower()
+        error = self._check(provider, prompt)
+        if error:
+            outcome.update(text=error, status=NOT_SENT)
+            yield error
+            return
+        streams = {
+            "gemini": self._stream_gemini,
+            "openrouter": self._stream_openrouter,
+            "huggingface": self._stream_huggingface,
+            "ollama": self._stream_ollama,
+        }
+        import requests
+
+        self._pace()
+        with telemetry.llm_call(provider, self.model, prompt) as result:
+            parts = []
+            try:
+                for piece in streams[provider](prompt):
+                    if not piece:
+                        continue
+                    if not parts:
+                        telemetry.note_first_token()
+                    parts.append(piece)
+                    yield piece
+                text = "".join(parts).strip() or f"⚠ {provider} returned no content."
+            except StreamError as e:
+                text = str(e)
+                yield ("\n\n" if parts else "") + text
+            except requests.exceptions.RequestException as e:
+                text = f"⚠ {provider} network error: {e}"
+                yield ("\n\n" if parts else "") + text
+            outcome.update(text=text, status=telemetry.http_status())
+            result.set(text)
+
+    def _post_stream(self, provider: str, prompt: str, attempt: int = 0):
+        url, headers, body = self._request(provider, prompt, stream=True)
+        if attempt:
+            telemetry.note_wait(self._pace())
+        return self._http().post(url, headers=headers, json=body, stream=True, timeout=self.timeout)
+
+    def _stream_gemini(self, prompt: str):
+        for attempt in range(self.attempts):
+            r = self._post_stream("gemini", prompt, attempt)
+            telemetry.note_http_status(r.status_code)
+            backoff = self._on_response(r.status_code, r.headers, attempt)
+            if backoff is not None and attempt + 1 < self.attempts:
+                r.close()
+                telemetry.note_retry(backoff)
+                time.sleep(backoff)
+                continue
+            with r:
                 if r.status_code >= 400:
-                # detailed message for debugging
-                    return f"⚠ Gemini network error: {r.status_code} {r.reason} | {r.text[:200]}"
-                r.raise_for_status()
-
-                data = r.json()
-                if "candidates" in data and len(data["candidates"]) > 0:
-                    parts = data["candidates"][0].get("content", {}).get("parts", [])
-                    if parts and "text" in parts[0]:
-                        return parts[0]["text"].strip()
+                    raise StreamError(
+                        f"⚠ Gemini network error: {r.status_code} {r.reason} | {r.text[:200]}"
+                    )
+                for data in _sse_events(r):
+                    if "error" in data:
+                        raise StreamError(
+                            f"⚠ Gemini API error: {data['error'].get('message', 'unknown error')}"
+                        )
+                    for candidate in data.get("candidates", [])[:1]:
+                        for part in candidate.get("content", {}).get("parts", []):
+                            yield part.get("text", "")
+            return
+        raise StreamError("⚠ Gemini returned no content.")
+
+    def _stream_openrouter(self, prompt: str):
+        for attempt in range(self.attempts):
+            r = self._post_stream("openrouter", prompt, attempt)
+            telemetry.note_http_status(r.status_code)
+            backoff = self._on_response(r.status_code, r.headers, attempt)
+            if backoff is not None and attempt + 1 < self.attempts:
+                r.close()
+                telemetry.note_retry(backoff)
+                time.sleep(backoff)
+                continue
+            with r:
+                if r.status_code >= 400:
+                    raise StreamError(f"⚠ OpenRouter error: {r.status_code} {r.text[:200]}")
+                for data in _sse_events(r):
+                    if "error" in data:
+                        raise StreamError(f"⚠ OpenRouter error: {data['error']}")
+                    for choice in data.get("choices", [])[:1]:
+                        yield (choice.get("delta") or {}).get("content") or ""
+            return
+        raise StreamError("⚠ OpenRouter returned no content.")
+
+    def _stream_huggingface(self, prompt: str):
+        # The inference API used here has no token stream: deliver the whole text at once
+        text = self._complete("huggingface", prompt)
+        if text.lstrip().startswith("⚠"):
+            raise StreamError(text)
+        yield text
+
+    def _stream_ollama(self, prompt: str):
+        # Ollama streams newline-delimited JSON objects, the last one has "done": true
+        with self._post_stream("ollama", prompt) as r:
+            telemetry.note_http_status(r.status_code)
+            if r.status_code >= 400:
+                raise StreamError(f"⚠ Ollama error: {r.status_code} {r.text[:200]}")
+            for line in r.iter_lines(chunk_size=None):
+                if not line:
+                    continue
+                data = json.loads(line)
                 if "error" in data:
-                    return f"⚠ Gemini API error: {data['error'].get('message', 'unknown error')}"
-                return f"⚠ Unexpected Gemini response: {json.dumps(data)[:300]}"
+                    raise StreamError(f"⚠ Ollama error: {data['error']}")
+                yield data.get("response", "")
+                if data.get("done"):
+                    return
 
-        except requests.exceptions.RequestException as e:
-            return f"⚠ Gemini network error: {e}"
+    # ---------- Async (one event loop, pooled aiohttp connections, no threads) ----------
+    def _async_client(self, concurrency: int):
+        import aiohttp  # only needed by generate_many
 
-        return "⚠ Gemini returned no content."
+        return aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=concurrency),
+            timeout=aiohttp.ClientTimeout(sock_connect=LLM_CONNECT_TIMEOUT, sock_read=LLM_TIMEOUT),
+        )
 
+    async def agenerate(self, prompt: str, client, outcome: dict = None):
+        """Async generate() on an aiohttp.ClientSession (see generate_many)."""
+        import asyncio
+        import aiohttp
 
+        outcome = {} if outcome is None else outcome
+        provider = self.provider.lower()
+        error = self._check(provider, prompt)
+        if error:
+            outcome.update(text=error, status=NOT_SENT)
+            return error
+        url, headers, body = self._request(provider, prompt)
+        limiter = self._limiter()
+        if limiter:
+            await limiter.acquire_async()
+        with telemetry.llm_call(provider, self.model, prompt) as result:
+            try:
+                for attempt in range(self.attempts):
+                    if limiter and attempt:
+                        telemetry.note_wait(await limiter.acquire_async())
+                    async with client.post(url, headers=headers, json=body) as r:
+                        telemetry.note_http_status(r.status)
+                        text = await r.text(encoding="utf-8", errors="replace")
+                    # the shared limiter writes to SQLite: keep that off the event loop
+                    backoff = await asyncio.to_thread(self._on_response, r.status, r.headers, attempt)
+                    if backoff is not None and attempt + 1 < self.attempts:
+                        telemetry.note_retry(backoff)
+                        await asyncio.sleep(backoff)
+                        continue
+                    result.set(self._parse(provider, r.status, r.reason, text))
+                    break
+                else:
+                    result.set(f"⚠ {NAMES[provider]} returned no content.")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                result.set(f"⚠ {NAMES[provider]} network error: {e!r}")
+            outcome.update(text=result.value, status=telemetry.http_status())
+        return result.value
 
+    async def agenerate_many(
+        self, prompts, concurrency=None, on_result=None, limiter=None, outcomes=None
+    ):
+        import asyncio
 
-    # ---------- OpenRouter ----------
-    def _call_openrouter(self, prompt: str):
-        body = {
-            "model": self.model,
-            "messages": [
-                {"role": "system", "content": "You are an AI assistant."},
-                {"role": "user", "content": prompt}
-            ]
-        }
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json",
-        }
-        r = requests.post(self.base_urls["openrouter"], headers=headers, json=body)
-        data = r.json()
-        try:
-            return data["choices"][0]["message"]["content"].strip()
-        except Exception:
-            return f"⚠ OpenRouter error: {data}"
-
-    # ---------- Hugging Face ----------
-    def _call_huggingface(self, prompt: str):
-        url = f"{self.base_urls['huggingface']}/{self.model}"
-        headers = {"Authorization": f"Bearer {self.api_key}"}
-        payload = {"inputs": prompt}
-        r = requests.post(url, headers=headers, json=payload)
-        data = r.json()
-        try:
-            if isinstance(data, list):
-                return data[0]["generated_text"]
-            return str(data)
-        except Exception:
-            return f"⚠ Hugging Face error: {data}"
-
-    # ---------- Ollama ----------
-    def _call_ollama(self, prompt: str):
-        payload = {"model": self.model, "prompt": prompt}
-        r = requests.post(self.base_urls["ollama"], json=payload)
-        data = r.json()
-        return data.get("response", str(data))
+        prompts = list(prompts)
+        concurrency = max(1, concurrency or LLM_CONCURRENCY)
+        gate = asyncio.Semaphore(concurrency)
+
+        async with self._async_client(concurrency) as client:
+
+            async def one(i, prompt):
+                async with gate:
+                    if limiter:
+                        await limiter.acquire_async()
+                    try:
+                        text = await self.agenerate(
+                            prompt, client, outcomes[i] if outcomes is not None else None
+                        )
+                    except Exception as e:
+                        text = f"⚠ Exception during generation: {e}"
+                if on_result:
+                    on_result(i, text)
+                return text
+
+            return await asyncio.gather(*(one(i, p) for i, p in enumerate(prompts)))
+
+    def generate_many(self, prompts, concurrency=None, on_result=None, limiter=None, outcomes=None):
+        """
+        Complete every prompt from a single event loop with up to `concurrency`
+        requests in flight over pooled keep-alive connections (default LLM_CONCURRENCY).
+        Returns the completions in prompt order; on_result(i, text) fires as each
+        finishes. `limiter` (rate_limiter.RateLimiter) paces request starts.
+        `outcomes`, a list of dicts (one per prompt), receives each call's outcome.
+        """
+        import asyncio  # only the async path pays for it, not every cold start
+
+        return asyncio.run(
+            self.agenerate_many(prompts, concurrency, on_result, limiter, outcomes)
+        )
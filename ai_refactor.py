@@ -7,40 +7,385 @@ from repo_handler import clone_or_load_repo
 from vb_parser import extract_vb_methods
 
 from report_generator import save_report
-import requests
-from dotenv import load_dotenv
+from translation_engine import translate_methods, DEFAULT_CONCURRENCY
 import os
-from ai_provider import LLMProvider
-llm = LLMProvider()
+import threading
+from concurrent.futures import Future, as_completed
+from contextlib import contextmanager
+from functools import partial
+from provider_router import get_llm
+from translation_cache import TranslationCache, cache_key
+from translation_batcher import (
+    CONTEXT_PROMPT,
+    DEFAULT_BATCH_TOKENS,
+    build_batch_prompt,
+    merge_contexts,
+    pack_batches,
+    split_batch_response,
+)
+from symbol_index import SymbolIndex, SYMBOL_CONTEXT_CHARS
+from token_budget import method_token_limit
+from method_chunker import chunk_method, stitch
+from translation_cache import is_cacheable
 
+TRANSLATE_PROMPT = "Convert this VB.NET code to idiomatic C#:\n\n```vbnet\n{vb_code}\n```"
+CHUNK_PROMPT = (
+    "This is part {part} of {total} of a large VB.NET method with the signature:\n"
+    "```vbnet\n{header}\n```\n"
+    "{overlap}"
+    "Convert only the following statements to idiomatic C#. Continue exactly where the "
+    "previous part stopped: do not repeat the signature unless it is below, and do not "
+    "close blocks opened before this part.\n\n```vbnet\n{body}\n```"
+)
+OVERLAP_PROMPT = (
+    "The statements just before this part (already translated — context only, "
+    "do not translate them again):\n```vbnet\n{context}\n```\n"
+)
 
-def translate_vb_to_csharp(vb_code: str):
-    prompt = f"Convert this VB.NET code to idiomatic C#:\n\n```vbnet\n{vb_code}\n```"
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_translation_cache():
+    """Open the on-disk translation cache once (disabled with TRANSLATION_CACHE=0)."""
+    global _cache
+    if os.getenv("TRANSLATION_CACHE", "1") == "0":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranslationCache()
+    return _cache
+
+
+def _cache_key(vb_code: str, context: str = "", answered_by=None):
+    # Context is part of the prompt, so it is part of the key; no context keeps old keys valid
+    template = f"{TRANSLATE_PROMPT}\x00{context}" if context else TRANSLATE_PROMPT
+    llm = get_llm()
+    provider, model = answered_by or (llm.provider, llm.model)
+    return cache_key(vb_code, provider, model, template)
+
+
+def _answered_by(outcome):
+    """(provider, model) that produced a completion: a router names it, a single provider is get_llm()."""
+    provider, _, model = (outcome.get("provider") or "").partition("/")
+    if provider:
+        return provider, model
+    llm = get_llm()
+    return llm.provider, llm.model
+
+
+def _complete(prompt: str, answered: set, on_token=None):
+    """get_llm().generate(), adding the (provider, model) that answered to `answered`."""
+    outcome = {}
+    text = get_llm().generate(prompt, on_token=on_token, outcome=outcome)
+    answered.add(_answered_by(outcome))
+    return text
+
+
+def _store(cache, vb_code: str, context: str, translation, answered):
+    """
+    Cache under the provider/model that actually answered, so a failover answer is
+    never served as the primary's. A method answered by several (a failover between
+    chunks) is not cached.
+    """
+    if cache and len(answered) == 1:
+        cache.put(_cache_key(vb_code, context, next(iter(answered))), translation)
+
+
+def translation_token_limit():
+    """Largest method (estimated tokens) the configured provider/model takes in one request."""
+    llm = get_llm()
+    return method_token_limit(llm.provider, llm.model)
+
+
+def _chunk_prompts(chunks, context: str = ""):
+    """One prompt per piece of an oversized method; each stands alone, so they can run in parallel."""
+    prefix = CONTEXT_PROMPT.format(context=context) if context else ""
+    return [
+        prefix + CHUNK_PROMPT.format(
+            part=i,
+            total=len(chunks),
+            header=chunk["header"],
+            overlap=OVERLAP_PROMPT.format(context=chunk["context"]) if chunk["context"] else "",
+            body=chunk["body"],
+        )
+        for i, chunk in enumerate(chunks, 1)
+    ]
+
+
+def _stitch_parts(parts):
+    for i, translation in enumerate(parts, 1):
+        if not is_cacheable(translation):
+            return f"// Translation failed in part {i}/{len(parts)}: {translation}"
+    return stitch(parts)
+
+
+def _translate_chunks(chunks, context: str = "", on_token=None, answered=None):
+    """Translate an oversized method piece by piece and stitch the C# back together."""
+    answered = answered if answered is not None else set()
+    parts = []
+    for prompt in _chunk_prompts(chunks, context):
+        parts.append(_complete(prompt, answered, on_token))
+        if not is_cacheable(parts[-1]):
+            break  # the rest would be thrown away
+    return _stitch_parts(parts)
+
+
+def _translate_prompt(vb_code: str, context: str = ""):
+    prompt = TRANSLATE_PROMPT.format(vb_code=vb_code)
+    return CONTEXT_PROMPT.format(context=context) + prompt if context else prompt
+
+
+def _generate_translation(vb_code: str, cache=None, context: str = "", on_token=None):
+    chunks = chunk_method(vb_code, translation_token_limit())
+    prompt = _translate_prompt(vb_code, context)
+    answered = set()
     try:
-        return llm.generate(prompt)
+        if len(chunks) > 1:
+            translation = _translate_chunks(chunks, context, on_token, answered)
+        else:
+            translation = _complete(prompt, answered, on_token)
     except Exception as e:
         return f"// Translation failed: {e}"
-    
+
+    _store(cache, vb_code, context, translation, answered)
+    return translation
+
+
+def translate_vb_to_csharp(vb_code: str, use_cache: bool = True, context: str = "", on_token=None):
+    """
+    `context` is a short block of related project declarations (see symbol_index).
+    With `on_token`, the completion is streamed and each piece is passed to it.
+    """
+    cache = get_translation_cache() if use_cache else None
+    if cache:
+        cached = cache.get(_cache_key(vb_code, context))
+        if cached is not None:
+            return cached
+    return _generate_translation(vb_code, cache, context, on_token)
+
+
+def translate_vb_batch(vb_codes, use_cache: bool = True, contexts=None, on_token=None):
+    """
+    Translate several small methods with a single LLM request.
+    Cached methods are answered locally; anything the model does not return
+    cleanly between its markers is retried as a single-method request.
+    `contexts` (one per method) are merged into a single shared context block.
+    """
+    contexts = contexts or [""] * len(vb_codes)
+    cache = get_translation_cache() if use_cache else None
+    results = [None] * len(vb_codes)
+    if cache:
+        for i, code in enumerate(vb_codes):
+            results[i] = cache.get(_cache_key(code, contexts[i]))
+
+    missing = [i for i, r in enumerate(results) if r is None]
+    if len(missing) > 1:
+        prompt = build_batch_prompt(
+            [vb_codes[i] for i in missing],
+            merge_contexts([contexts[i] for i in missing], SYMBOL_CONTEXT_CHARS * 2),
+        )
+        answered = set()
+        try:
+            response = _complete(prompt, answered, on_token)
+        except Exception:
+            response = None
+        for i, translation in zip(missing, split_batch_response(response, len(missing))):
+            if translation is not None:
+                results[i] = translation
+                _store(cache, vb_codes[i], contexts[i], translation, answered)
+
+    for i, r in enumerate(results):
+        if r is None:
+            results[i] = _generate_translation(vb_codes[i], cache, contexts[i], on_token)
+    return results
+
+
+@contextmanager
+def async_translator(concurrency=None, use_cache: bool = True):
+    """
+    One event loop on a background thread, one pooled aiohttp session and at most
+    `concurrency` LLM requests in flight. Yields submit(codes, contexts=None): it
+    starts translating one batch of methods and returns a concurrent.futures.Future
+    of their translations, so callers keep the loop busy by submitting a new batch
+    as each finishes. Several methods go in one batched prompt as in
+    translate_vb_batch; oversized ones are chunked and their parts sent concurrently.
+    """
+    import asyncio
+
+    llm = get_llm()
+    cache = get_translation_cache() if use_cache else None
+    limit = translation_token_limit()
+    concurrency = max(1, concurrency or DEFAULT_CONCURRENCY)
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, name="translate-async", daemon=True)
+    thread.start()
+    client = None
+    outstanding = set()
+
+    async def open_client():
+        return llm._async_client(concurrency), asyncio.Semaphore(concurrency)
+
+    async def complete(prompt, answered):
+        outcome = {}
+        async with gate:
+            text = await llm.agenerate(prompt, client, outcome)
+        answered.add(_answered_by(outcome))
+        return text
+
+    async def store(code, context, translation, answered):
+        if cache:  # SQLite stays off the event loop
+            await asyncio.to_thread(_store, cache, code, context, translation, answered)
+
+    async def translate_one(code, context):
+        answered = set()
+        chunks = chunk_method(code, limit)
+        if len(chunks) > 1:
+            parts = await asyncio.gather(
+                *(complete(prompt, answered) for prompt in _chunk_prompts(chunks, context))
+            )
+            translation = _stitch_parts(parts)
+        else:
+            translation = await complete(_translate_prompt(code, context), answered)
+        await store(code, context, translation, answered)
+        return translation
+
+    async def translate_batch(codes, contexts, results):
+        missing = [i for i, r in enumerate(results) if r is None]
+        try:
+            if len(missing) > 1:
+                answered = set()
+                prompt = build_batch_prompt(
+                    [codes[i] for i in missing],
+                    merge_contexts([contexts[i] for i in missing], SYMBOL_CONTEXT_CHARS * 2),
+                )
+                response = await complete(prompt, answered)
+                for i, translation in zip(missing, split_batch_response(response, len(missing))):
+                    if translation is not None:
+                        results[i] = translation
+                        await store(codes[i], contexts[i], translation, answered)
+            retry = [i for i, r in enumerate(results) if r is None]
+            translations = await asyncio.gather(
+                *(translate_one(codes[i], contexts[i]) for i in retry)
+            )
+            for i, translation in zip(retry, translations):
+                results[i] = translation
+        except Exception as e:
+            results = [r if r is not None else f"// Translation failed: {e}" for r in results]
+        return results
+
+    def submit(codes, contexts=None):
+        codes = list(codes)
+        contexts = [c or "" for c in (contexts or [""] * len(codes))]
+        # cache hits are answered here, on the caller's thread
+        results = [cache.get(_cache_key(c, x)) if cache else None for c, x in zip(codes, contexts)]
+        if None not in results:
+            future = Future()
+            future.set_result(results)
+            return future
+        future = asyncio.run_coroutine_threadsafe(translate_batch(codes, contexts, results), loop)
+        outstanding.add(future)
+        future.add_done_callback(outstanding.discard)
+        return future
+
+    try:
+        client, gate = asyncio.run_coroutine_threadsafe(open_client(), loop).result()
+        yield submit
+    finally:
+        for future in list(outstanding):
+            future.cancel()
+        if client is not None:
+            asyncio.run_coroutine_threadsafe(client.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def translate_vb_many(
+    vb_codes,
+    use_cache: bool = True,
+    contexts=None,
+    concurrency=None,
+    batch_tokens: int = 0,
+    on_result=None,
+):
+    """
+    Translate many methods through async_translator: every request shares one
+    event loop and its pooled connections instead of holding a thread.
+    Small methods are packed into batched prompts up to `batch_tokens`.
+    on_result(i, translation) fires as soon as method i is final.
+    """
+    vb_codes = list(vb_codes)
+    contexts = list(contexts or [""] * len(vb_codes))
+    if batch_tokens and batch_tokens > 0:
+        groups = list(pack_batches(range(len(vb_codes)), batch_tokens, key=lambda i: vb_codes[i]))
+    else:
+        groups = [[i] for i in range(len(vb_codes))]
+    results = [None] * len(vb_codes)
+    with async_translator(concurrency, use_cache) as submit:
+        futures = {
+            submit([vb_codes[i] for i in g], contexts=[contexts[i] for i in g]): g for g in groups
+        }
+        for future in as_completed(futures):
+            for i, translation in zip(futures[future], future.result()):
+                results[i] = translation
+                if on_result:
+                    on_result(i, translation)
+    return results
+
+
+def print_cache_stats(console):
+    cache = get_translation_cache()
+    if cache:
+        stats = cache.stats()
+        console.print(
+            f"[cyan]🗃  Translation cache:[/cyan] {stats['hits']} hits, {stats['misses']} misses"
+        )
+
 
 app = typer.Typer()
 console = Console()
 
 
 @app.command()
-def analyze(repo: str):
+def analyze(
+    repo: str,
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY, "--concurrency", "-j", help="Parallel translations"
+    ),
+    no_cache: bool = typer.Option(False, "--no-cache", help="Ignore the translation cache"),
+    batch_tokens: int = typer.Option(
+        DEFAULT_BATCH_TOKENS, "--batch-tokens", help="Token budget per batched request (0 = off)"
+    ),
+):
     console.print(Panel.fit("[bold cyan]🤖 Internal AI Pair Programmer[/bold cyan]"))
     repo_path = clone_or_load_repo(repo, console)
 
-    vb_methods = extract_vb_methods(repo_path, console)
-    report = []
-
-    for method in track(vb_methods, description="Translating VB.NET → C#"):
-        translation = translate_vb_to_csharp(method["code"])
-        report.append({"file": method["file"], "vb": method["code"], "cs": translation})
-
-    save_report(report)
+    symbols = SymbolIndex(repo_path)
+    vb_methods = extract_vb_methods(repo_path, console, symbols=symbols)
+    batch_tokens = min(batch_tokens, translation_token_limit())
+    save_report(
+        track(
+            translate_methods(
+                vb_methods,
+                partial(translate_vb_to_csharp, use_cache=not no_cache),
+                concurrency=concurrency,
+                translate_batch=partial(translate_vb_batch, use_cache=not no_cache),
+                batch_tokens=batch_tokens,
+                context_for=symbols.context_for,
+            ),
+            total=len(vb_methods),
+            description="Translating VB.NET → C#",
+        )
+    )
+    symbols.close()
+    if not no_cache:
+        print_cache_stats(console)
     console.print(Panel.fit("[green]✅ Report generated successfully![/green]"))
 
 
 if __name__ == "__main__":
+    from dotenv import load_dotenv
+
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
     app()
@@ -0,0 +1,282 @@
+# benchmarks/fake_llm_server.py
+"""
+Local stand-in for the LLM HTTP APIs that LLMProvider talks to, for load tests
+that must not spend API quota.
+
+Speaks the Gemini (`/models/<model>:generateContent`, `:streamGenerateContent?alt=sse`),
+OpenRouter (`/api/v1/chat/completions`, `"stream": true` → SSE) and Ollama
+(`/api/generate`, `"stream": true` → NDJSON) request/response shapes.
+Latency, error rate, 429 bursts, a requests-per-second quota (429 + Retry-After
+when exceeded, like a shared API key) and response size are configurable; request
+counts are served on GET /_stats (POST /_reset clears them).
+
+    python benchmarks/fake_llm_server.py --port 8765 --latency-ms 300 --error-rate 0.02
+    GEMINI_BASE_URL=http://127.0.0.1:8765/v1beta/models GEMINI_API_KEY=x python main.py -r ...
+"""
+import re
+import json
+import math
+import time
+import random
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import typer
+
+VB_MARKER = re.compile(r"<<<VB (\d+)>>>")
+STREAM_PIECE_CHARS = 24  # size of each streamed "token"
+
+
+class FakeLLMConfig:
+    def __init__(self, latency_ms=200.0, jitter_ms=50.0, error_rate=0.0,
+                 burst_every_s=0.0, burst_len_s=0.0, retry_after_s=1,
+                 response_chars=400, piece_ms=0.0, faulty_api=None, quota_rps=0.0, seed=0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.burst_every_s = burst_every_s  # every N seconds...
+        self.burst_len_s = burst_len_s  # ...answer 429 for this long
+        self.retry_after_s = retry_after_s
+        self.response_chars = response_chars
+        self.piece_ms = piece_ms  # delay between streamed pieces (latency_ms is time to first)
+        self.faulty_api = faulty_api  # errors/bursts hit only this API (None = all), for failover tests
+        self.quota_rps = quota_rps  # 0 = unlimited
+        self.rng = random.Random(seed)
+
+
+class FakeLLMState:
+    def __init__(self, config: FakeLLMConfig):
+        self.config = config
+        self.started = time.monotonic()
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.quota_tokens = config.quota_rps
+        self.quota_updated = self.started
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.stats = {"requests": 0, "ok": 0, "errors": 0, "throttled": 0, "by_api": {}}
+
+    def count(self, api, outcome):
+        with self.lock:
+            self.stats["requests"] += 1
+            self.stats[outcome] += 1
+            self.stats["by_api"][api] = self.stats["by_api"].get(api, 0) + 1
+
+    def in_burst(self):
+        c = self.config
+        if c.burst_every_s <= 0 or c.burst_len_s <= 0:
+            return False
+        return (time.monotonic() - self.started) % c.burst_every_s < c.burst_len_s
+
+    def over_quota(self):
+        """Seconds until the next request fits the quota (0.0 = admitted now)."""
+        rate = self.config.quota_rps
+        if rate <= 0:
+            return 0.0
+        with self.lock:
+            now = time.monotonic()
+            self.quota_tokens = min(rate, self.quota_tokens + (now - self.quota_updated) * rate)
+            self.quota_updated = now
+            if self.quota_tokens >= 1:
+                self.quota_tokens -= 1
+                return 0.0
+            return (1 - self.quota_tokens) / rate
+
+    def draw(self):
+        """(sleep seconds, fail?) for one request."""
+        c = self.config
+        with self.lock:
+            delay = max(0.0, c.rng.gauss(c.latency_ms, c.jitter_ms)) / 1000
+            fail = c.rng.random() < c.error_rate
+        return delay, fail
+
+
+def fake_completion(prompt: str, size: int) -> str:
+    """A C#-looking reply; batched prompts get one <<<CS n>>> block per <<<VB n>>> method."""
+    filler = ("// generated by fake_llm_server\n" * (size // 32 + 1))[:size]
+    markers = VB_MARKER.findall(prompt)
+    if markers:
+        return "\n".join(
+            f"<<<CS {n}>>>\npublic void Method{n}() {{ }}\n{filler}<<<END CS {n}>>>" for n in markers
+        )
+    return f"```csharp\npublic void Method() {{ }}\n{filler}```"
+
+
+def make_handler(state: FakeLLMState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body are separate writes
+
+        def log_message(self, *args):
+            pass
+
+        def _send(self, status, payload, headers=None):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _stream(self, api, text, model):
+            """Send `text` in pieces: SSE for Gemini/OpenRouter, NDJSON for Ollama."""
+            self.send_response(200)
+            self.send_header(
+                "Content-Type", "application/x-ndjson" if api == "ollama" else "text/event-stream"
+            )
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def send(data: bytes):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            pieces = [text[i:i + STREAM_PIECE_CHARS] for i in range(0, len(text), STREAM_PIECE_CHARS)]
+            for n, piece in enumerate(pieces):
+                if n and state.config.piece_ms:
+                    time.sleep(state.config.piece_ms / 1000)
+                if api == "gemini":
+                    event = {"candidates": [{"content": {"role": "model", "parts": [{"text": piece}]}}]}
+                elif api == "openrouter":
+                    event = {"choices": [{"delta": {"content": piece}}]}
+                else:
+                    event = {"model": model, "response": piece, "done": False}
+                line = json.dumps(event)
+                send((f"{line}\n" if api == "ollama" else f"data: {line}\n\n").encode("utf-8"))
+            if api == "ollama":
+                send(json.dumps({"model": model, "response": "", "done": True}).encode() + b"\n")
+            elif api == "openrouter":
+                send(b"data: [DONE]\n\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        def do_GET(self):
+            if self.path.startswith("/_stats"):
+                with state.lock:
+                    return self._send(200, json.loads(json.dumps(state.stats)))
+            self._send(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b"{}"
+            if self.path.startswith("/_reset"):
+                state.reset()
+                return self._send(200, {"ok": True})
+            try:
+                body = json.loads(raw or b"{}")
+            except ValueError:
+                return self._send(400, {"error": "bad json"})
+
+            stream = bool(body.get("stream"))
+            if re.search(r":(stream)?generatecontent", self.path.lower()):
+                api = "gemini"
+                stream = ":streamgeneratecontent" in self.path.lower()
+                prompt = "".join(
+                    p.get("text", "") for c in body.get("contents", []) for p in c.get("parts", [])
+                )
+            elif self.path.rstrip("/").endswith("/chat/completions"):
+                api = "openrouter"
+                prompt = "".join(m.get("content", "") for m in body.get("messages", []))
+            elif self.path.rstrip("/").endswith("/api/generate"):
+                api = "ollama"
+                prompt = body.get("prompt", "")
+            else:
+                return self._send(404, {"error": f"unknown endpoint {self.path}"})
+
+            faulty = state.config.faulty_api in (None, api)
+            retry_after = state.config.retry_after_s if faulty and state.in_burst() else None
+            if retry_after is None and faulty:
+                wait = state.over_quota()
+                retry_after = math.ceil(wait) if wait else None
+            if retry_after is not None:
+                state.count(api, "throttled")
+                return self._send(
+                    429,
+                    {"error": {"code": 429, "message": "Resource has been exhausted (fake)"}},
+                    {"Retry-After": str(retry_after)},
+                )
+            delay, fail = state.draw()
+            time.sleep(delay)
+            if fail and faulty:
+                state.count(api, "errors")
+                return self._send(500, {"error": {"code": 500, "message": "fake internal error"}})
+
+            text = fake_completion(prompt, state.config.response_chars)
+            state.count(api, "ok")
+            if stream:
+                return self._stream(api, text, body.get("model", ""))
+            if api == "gemini":
+                payload = {"candidates": [{"content": {"role": "model", "parts": [{"text": text}]}}]}
+            elif api == "openrouter":
+                payload = {"choices": [{"message": {"role": "assistant", "content": text}}]}
+            else:
+                payload = {"model": body.get("model", ""), "response": text, "done": True}
+            self._send(200, payload)
+
+    return Handler
+
+
+class FakeLLMServer(ThreadingHTTPServer):
+    request_queue_size = 1024  # listen backlog: generate_many opens hundreds of connections at once
+
+
+def start_server(config: FakeLLMConfig = None, host="127.0.0.1", port=0):
+    """Start on a background thread; returns (server, state, base_url). port=0 picks a free port."""
+    state = FakeLLMState(config or FakeLLMConfig())
+    server = FakeLLMServer((host, port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="fake-llm", daemon=True).start()
+    return server, state, f"http://{host}:{server.server_address[1]}"
+
+
+def provider_env(base_url: str, provider: str):
+    """Environment that points LLMProvider at the fake server for `provider`."""
+    return {
+        "gemini": {
+            "AI_PROVIDER": "gemini",
+            "GEMINI_API_KEY": "fake-key",
+            "GEMINI_BASE_URL": f"{base_url}/v1beta/models",
+        },
+        "openrouter": {
+            "AI_PROVIDER": "openrouter",
+            "OPENROUTER_API_KEY": "fake-key",
+            "OPENROUTER_BASE_URL": f"{base_url}/api/v1/chat/completions",
+        },
+        "ollama": {
+            "AI_PROVIDER": "ollama",
+            "OLLAMA_BASE_URL": f"{base_url}/api/generate",
+        },
+    }[provider]
+
+
+def main(
+    host: str = typer.Option("127.0.0.1", "--host"),
+    port: int = typer.Option(8765, "--port"),
+    latency_ms: float = typer.Option(200.0, "--latency-ms", help="Mean response latency"),
+    jitter_ms: float = typer.Option(50.0, "--jitter-ms", help="Latency standard deviation"),
+    error_rate: float = typer.Option(0.0, "--error-rate", help="Fraction of requests answered 500"),
+    burst_every: float = typer.Option(0.0, "--burst-every", help="Seconds between 429 bursts (0 = off)"),
+    burst_len: float = typer.Option(0.0, "--burst-len", help="Length of each 429 burst in seconds"),
+    response_chars: int = typer.Option(400, "--response-chars", help="Size of each completion"),
+    piece_ms: float = typer.Option(0.0, "--piece-ms", help="Delay between streamed pieces"),
+    faulty_api: str = typer.Option(None, "--faulty-api", help="Inject errors/bursts only into this API"),
+    quota_rps: float = typer.Option(0.0, "--quota-rps", help="Answer 429 above this rate (0 = off)"),
+):
+    config = FakeLLMConfig(latency_ms, jitter_ms, error_rate, burst_every, burst_len,
+                           response_chars=response_chars, piece_ms=piece_ms,
+                           faulty_api=faulty_api, quota_rps=quota_rps)
+    server, _, base_url = start_server(config, host, port)
+    print(f"🧪 Fake LLM server on {base_url}")
+    for provider in ("gemini", "openrouter", "ollama"):
+        env = " ".join(f"{k}={v}" for k, v in provider_env(base_url, provider).items())
+        print(f"   {provider:<10} {env}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    typer.run(main)
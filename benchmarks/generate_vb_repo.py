@@ -0,0 +1,156 @@
+# benchmarks/generate_vb_repo.py
+"""
+Deterministic synthetic "legacy" VB.NET solution for benchmarks.
+
+    python benchmarks/generate_vb_repo.py out/LegacyApp --files 500 --methods 12 --depth 3
+"""
+import os
+import random
+import shutil
+import typer
+
+NAMESPACES = ["Billing", "Inventory", "Reporting", "Shared", "Data", "UI", "Services"]
+IMPORTS = [
+    "System", "System.IO", "System.Data", "System.Data.SqlClient", "System.Text",
+    "System.Collections.Generic", "System.Linq", "Microsoft.VisualBasic",
+]
+# name → (files, methods per file, folder depth, designer files)
+PRESETS = {
+    "small": (50, 8, 2, 2),
+    "medium": (500, 12, 3, 10),
+    "large": (5000, 15, 4, 50),
+}
+
+
+def _method(rng, name, nesting):
+    """One Sub/Function with `nesting` levels of If/For/Try blocks and some clone-like noise."""
+    kind = rng.choice(["Sub", "Function"])
+    ret = " As Integer" if kind == "Function" else ""
+    lines = [f"    Public {kind} {name}(ByVal id As Integer, ByVal label As String){ret}"]
+    indent = "        "
+    closers = []
+    for level in range(nesting):
+        block = rng.choice(["If", "For", "Try", "Using"])
+        if block == "If":
+            lines.append(f"{indent}If id > {level} Then")
+            closers.append(f"{indent}End If")
+        elif block == "For":
+            lines.append(f"{indent}For i{level} As Integer = 0 To id")
+            closers.append(f"{indent}Next")
+        elif block == "Try":
+            lines.append(f"{indent}Try")
+            closers.append(f"{indent}Catch ex As Exception\n{indent}    Log(ex.Message)\n{indent}End Try")
+        else:
+            lines.append(f"{indent}Using conn As New SqlConnection(\"Server=.;Db={name}\")")
+            closers.append(f"{indent}End Using")
+        indent += "    "
+    for j in range(rng.randint(2, 8)):
+        lines.append(f"{indent}Dim v{j} = Compute(id, \"{_label(rng)}\") ' step {j}")
+    lines.append(f"{indent}Log(\"{name} done: \" & label & _")
+    lines.append(f"{indent}    id.ToString())")
+    lines.extend(reversed(closers))
+    if kind == "Function":
+        lines.append("        Return id")
+    lines.append(f"    End {kind}")
+    return "\n".join(lines)
+
+
+def _label(rng):
+    return rng.choice(["Saved", "Loaded", "it's done", "Retry", "Total"])
+
+
+def _class_file(rng, namespace, cls, methods, nesting):
+    parts = [f"Imports {imp}" for imp in rng.sample(IMPORTS, rng.randint(1, 4))]
+    parts.append(f"\nNamespace {namespace}\n    Public Class {cls}")
+    parts.append("        Public Property Name As String")
+    parts.append("        Private _count As Integer = 0")
+    for m in range(methods):
+        body = _method(rng, f"{rng.choice(['Load', 'Save', 'Calc', 'Print'])}{cls}{m}", nesting)
+        parts.append("\n".join("    " + line for line in body.splitlines()))
+    parts.append("    End Class\nEnd Namespace\n")
+    return "\n".join(parts)
+
+
+def _designer_file(cls, controls):
+    """WinForms-style .Designer.vb: one huge InitializeComponent, like real generated code."""
+    lines = [
+        "<Global.Microsoft.VisualBasic.CompilerServices.DesignerGenerated()> _",
+        f"Partial Class {cls}",
+        "    Inherits System.Windows.Forms.Form",
+        "    Private components As System.ComponentModel.IContainer",
+        "    <System.Diagnostics.DebuggerStepThrough()> _",
+        "    Private Sub InitializeComponent()",
+    ]
+    for i in range(controls):
+        lines += [
+            f"        Me.Button{i} = New System.Windows.Forms.Button()",
+            f"        Me.Button{i}.Location = New System.Drawing.Point({i % 40 * 20}, {i // 40 * 20})",
+            f"        Me.Button{i}.Name = \"Button{i}\"",
+            f"        Me.Button{i}.Text = \"Button {i}\"",
+            f"        Me.Controls.Add(Me.Button{i})",
+        ]
+    lines += ["    End Sub"]
+    lines += [f"    Friend WithEvents Button{i} As System.Windows.Forms.Button" for i in range(controls)]
+    lines += ["End Class", ""]
+    return "\n".join(lines)
+
+
+def generate_repo(out_dir, files=50, methods=8, depth=2, designer_files=2,
+                  designer_controls=400, seed=42):
+    """
+    Write a synthetic solution to `out_dir` (replaced if it exists) and return stats.
+    Besides .vb sources it adds a few .cs/.py/.config files so language
+    detection and the annotator see a mixed tree.
+    """
+    rng = random.Random(seed)
+    if os.path.exists(out_dir):
+        shutil.rmtree(out_dir)
+    stats = {"files": 0, "vb_files": 0, "methods": 0, "bytes": 0}
+
+    def write(rel_path, content):
+        path = os.path.join(out_dir, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            f.write(content)
+        stats["files"] += 1
+        stats["bytes"] += len(content.encode("utf-8"))
+
+    for i in range(files):
+        folders = [rng.choice(NAMESPACES) for _ in range(rng.randint(1, depth))]
+        namespace = ".".join(["Legacy", *folders])
+        cls = f"{folders[-1]}Class{i}"
+        write("/".join([*folders, f"{cls}.vb"]), _class_file(rng, namespace, cls, methods, depth))
+        stats["vb_files"] += 1
+        stats["methods"] += methods
+
+    for i in range(designer_files):
+        write(f"UI/Forms/Form{i}.Designer.vb", _designer_file(f"Form{i}", designer_controls))
+        stats["vb_files"] += 1
+        stats["methods"] += 1
+
+    for i in range(max(1, files // 20)):
+        write(f"Tools/Helper{i}.cs", f"public class Helper{i} {{ public int Run() {{ return {i}; }} }}\n")
+        write(f"scripts/job{i}.py", f"def job{i}():\n    return {i}\n")
+    write("App.config", "<configuration><appSettings /></configuration>\n")
+    write("bin/Debug/ignored.vb", "' build output — pruned by repo_index\n")
+    return stats
+
+
+def main(
+    out_dir: str = typer.Argument(..., help="Folder to create (replaced if present)"),
+    preset: str = typer.Option(None, "--preset", help="small | medium | large"),
+    files: int = typer.Option(50, "--files", help="Number of class files"),
+    methods: int = typer.Option(8, "--methods", help="Methods per class file"),
+    depth: int = typer.Option(2, "--depth", help="Folder depth and block nesting"),
+    designer: int = typer.Option(2, "--designer", help="Number of large .Designer.vb files"),
+    seed: int = typer.Option(42, "--seed"),
+):
+    if preset:
+        files, methods, depth, designer = PRESETS[preset]
+    stats = generate_repo(out_dir, files, methods, depth, designer, seed=seed)
+    print(f"✅ Generated {stats['vb_files']} VB.NET files / {stats['methods']} methods "
+          f"({stats['bytes'] / 1e6:.1f} MB) in {out_dir}")
+
+
+if __name__ == "__main__":
+    typer.run(main)
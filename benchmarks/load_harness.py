@@ -0,0 +1,237 @@
+# benchmarks/load_harness.py
+"""
+End-to-end load test of the translation (and optionally annotation) pipeline
+against benchmarks/fake_llm_server.py — no API quota needed.
+
+    python benchmarks/load_harness.py --provider gemini --files 200 -j 8 --latency-ms 300
+    python benchmarks/load_harness.py --provider ollama --error-rate 0.05 --burst-every 10 --burst-len 2
+    python benchmarks/load_harness.py --quota-rps 20 -j 32 --rps 5   # adaptive shared limiter
+    python benchmarks/load_harness.py --files 1000 -j 512 --async   # generate_many, no threads
+    python benchmarks/load_harness.py --provider gemini,ollama --faulty-api gemini --error-rate 0.5
+
+Runs the same parse → translate → report pipeline as main.py and reports
+throughput, p50/p99 client latency per LLM call, HTTP retries and failures.
+"""
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from datetime import datetime
+from functools import partial
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+import typer
+from rich.console import Console
+from rich.table import Table
+
+from benchmarks.fake_llm_server import FakeLLMConfig, start_server, provider_env
+from benchmarks.generate_vb_repo import generate_repo
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+DEFAULT_MODELS = {"gemini": "gemini-2.0-flash-lite", "openrouter": "fake/model", "ollama": "fake"}
+
+console = Console()
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    k = min(len(ordered) - 1, max(0, int(round(q / 100 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+class CallRecorder:
+    """
+    Wraps LLMProvider.generate (threads) and agenerate (generate_many) to time every
+    call, retries included, from the client side.
+    """
+
+    def __init__(self, llm):
+        self.latencies = []
+        self.failures = 0
+        self._lock = threading.Lock()
+        self._generate = llm.generate
+        self._agenerate = llm.agenerate
+        llm.generate = self
+        llm.agenerate = self.agenerate
+
+    def _record(self, start, result):
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.latencies.append(elapsed)
+            if not isinstance(result, str) or result.lstrip().startswith("⚠"):
+                self.failures += 1
+        return result
+
+    def __call__(self, prompt, *args, **kwargs):
+        start = time.perf_counter()
+        return self._record(start, self._generate(prompt, *args, **kwargs))
+
+    async def agenerate(self, prompt, *args, **kwargs):
+        start = time.perf_counter()
+        return self._record(start, await self._agenerate(prompt, *args, **kwargs))
+
+
+def run_load(repo_path, concurrency, batch_tokens, dedupe=True, annotate=False, async_io=False):
+    """main.py-equivalent pipeline; returns (stats, recorder). Imports happen after env setup."""
+    from vb_parser import iter_vb_methods
+    from report_generator import save_report, ReportWriter
+    from translation_engine import translate_methods, prefetch
+    from clone_detector import dedupe_translations
+    from symbol_index import SymbolIndex
+    import ai_refactor
+    from agents import annotator_agent
+    from provider_router import get_llm
+
+    recorder = CallRecorder(get_llm())  # one client serves translation and annotation
+    symbols = SymbolIndex(repo_path)
+    parse_stats, clone_stats = {}, {}
+    batch_tokens = min(batch_tokens, ai_refactor.translation_token_limit())
+
+    def translate_unique(pending):
+        return translate_methods(
+            pending,
+            partial(ai_refactor.translate_vb_to_csharp, use_cache=False),
+            concurrency=concurrency,
+            translate_batch=partial(ai_refactor.translate_vb_batch, use_cache=False),
+            batch_tokens=batch_tokens,
+            context_for=symbols.context_for,
+            translate_async=partial(ai_refactor.async_translator, use_cache=False)
+            if async_io else None,
+        )
+
+    methods = prefetch(iter_vb_methods(repo_path, stats=parse_stats, symbols=symbols))
+    if dedupe:
+        entries = dedupe_translations(
+            methods,
+            translate_unique,
+            retranslate=lambda m: ai_refactor.translate_vb_to_csharp(
+                m["code"], use_cache=False, context=symbols.context_for(m)
+            ),
+            stats=clone_stats,
+            concurrency=concurrency,
+        )
+    else:
+        entries = translate_unique(methods)
+
+    start = time.perf_counter()
+    writer = ReportWriter(directory=tempfile.mkdtemp(prefix="load_reports_"))
+    save_report(entries, writer=writer)
+    stats = {
+        "methods": parse_stats.get("methods", 0),
+        "translate_seconds": time.perf_counter() - start,
+        "clones_adapted": clone_stats.get("adapted", 0),
+    }
+    symbols.close()
+
+    if annotate:
+        start = time.perf_counter()
+        annotated = annotator_agent.annotate_repository(repo_path, force=True, concurrency=concurrency)
+        stats["annotated_files"] = len(annotated)
+        stats["annotate_seconds"] = time.perf_counter() - start
+    return stats, recorder
+
+
+def main(
+    provider: str = typer.Option(
+        "gemini", "--provider", help="gemini | openrouter | ollama, or a comma list to route across"
+    ),
+    files: int = typer.Option(100, "--files", help="Synthetic VB.NET class files"),
+    methods: int = typer.Option(8, "--methods", help="Methods per file"),
+    concurrency: int = typer.Option(8, "--concurrency", "-j"),
+    batch_tokens: int = typer.Option(0, "--batch-tokens", help="Batch small methods (0 = off)"),
+    no_dedupe: bool = typer.Option(False, "--no-dedupe"),
+    annotate: bool = typer.Option(False, "--annotate", help="Also run the annotator"),
+    async_io: bool = typer.Option(False, "--async", help="Translate from one event loop (no worker threads)"),
+    latency_ms: float = typer.Option(200.0, "--latency-ms"),
+    jitter_ms: float = typer.Option(50.0, "--jitter-ms"),
+    error_rate: float = typer.Option(0.0, "--error-rate"),
+    burst_every: float = typer.Option(0.0, "--burst-every", help="Seconds between 429 bursts"),
+    burst_len: float = typer.Option(0.0, "--burst-len", help="Seconds each 429 burst lasts"),
+    response_chars: int = typer.Option(400, "--response-chars"),
+    server_url: str = typer.Option(None, "--server", help="Use an already running fake server"),
+    faulty_api: str = typer.Option(None, "--faulty-api", help="Errors/bursts hit only this API"),
+    quota_rps: float = typer.Option(0.0, "--quota-rps", help="Server-side rate quota (429 above)"),
+    rps: float = typer.Option(
+        0.0, "--rps", help="Starting rate of the adaptive shared limiter (0 = unpaced)"
+    ),
+):
+    work_dir = tempfile.mkdtemp(prefix="load_work_")
+    repo_path = os.path.join(work_dir, "LegacyLoad")
+    generate_repo(repo_path, files, methods, depth=2, designer_files=0)
+    os.chdir(work_dir)  # reports/ caches stay out of the source tree
+
+    if server_url:
+        base_url = server_url.rstrip("/")
+        requests.post(f"{base_url}/_reset", timeout=5)
+    else:
+        config = FakeLLMConfig(latency_ms, jitter_ms, error_rate, burst_every, burst_len,
+                               response_chars=response_chars, faulty_api=faulty_api,
+                               quota_rps=quota_rps)
+        _, _, base_url = start_server(config)
+    providers = provider.split(",")
+    for name in providers:
+        os.environ.update(provider_env(base_url, name))
+    os.environ["MODEL"] = os.getenv("MODEL") or DEFAULT_MODELS[providers[0]]
+    if len(providers) > 1:
+        os.environ["LLM_PROVIDERS"] = ",".join(f"{p}:{DEFAULT_MODELS[p]}" for p in providers)
+    os.environ["TRANSLATION_CACHE"] = "0"
+    os.environ["LLM_RPS"] = str(rps)
+
+    console.print(f"[cyan]🧪 {provider} via {base_url} — {files * methods} methods, -j {concurrency}[/cyan]")
+    wall = time.perf_counter()
+    stats, recorder = run_load(
+        repo_path, concurrency, batch_tokens, not no_dedupe, annotate, async_io
+    )
+    wall = time.perf_counter() - wall
+    server = requests.get(f"{base_url}/_stats", timeout=5).json()
+
+    import telemetry  # after run_load, so it is the instance the pipeline used
+
+    events = telemetry.summary()["events"]
+    calls = len(recorder.latencies)
+    latencies = recorder.latencies
+    summary = {
+        "provider": provider,
+        "concurrency": concurrency,
+        "async": async_io,
+        "batch_tokens": batch_tokens,
+        **stats,
+        "wall_seconds": wall,
+        "methods_per_second": stats["methods"] / stats["translate_seconds"]
+        if stats["translate_seconds"] else 0.0,
+        "llm_calls": calls,
+        "llm_failures": recorder.failures,
+        "latency_p50": percentile(latencies, 50),
+        "latency_p99": percentile(latencies, 99),
+        "http_requests": server["requests"],
+        "http_retries": max(0, server["requests"] - calls),
+        "http_throttled": server["throttled"],
+        "http_errors": server["errors"],
+        "failovers": events.get("failover", 0),
+        "hedged": events.get("hedge", 0),
+    }
+
+    table = Table(title="Load harness")
+    table.add_column("Metric")
+    table.add_column("Value", justify="right")
+    for key, value in summary.items():
+        table.add_row(key, f"{value:.3f}" if isinstance(value, float) else str(value))
+    console.print(table)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    out_path = os.path.join(
+        RESULTS_DIR, f"load_{provider}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2)
+    console.print(f"[green]✅ Results saved to {out_path}[/green]")
+
+
+if __name__ == "__main__":
+    typer.run(main)
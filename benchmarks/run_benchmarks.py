@@ -0,0 +1,209 @@
+# benchmarks/run_benchmarks.py
+"""
+Time the local (no network) stages on a synthetic VB.NET solution and save the
+numbers, so regressions show up between versions.
+
+    python benchmarks/run_benchmarks.py --preset medium
+    python benchmarks/run_benchmarks.py --preset medium --compare benchmarks/results/<older>.json
+
+Each stage runs `--repeat` times; min and median wall time are recorded.
+"Cold" runs clear the in-process parse cache and skip on-disk incremental caches.
+"Cold start" stages time a fresh interpreter importing / launching the CLI.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import typer
+from rich.console import Console
+from rich.table import Table
+
+import vb_lexer
+from vb_parser import extract_vb_methods
+from agents.analyser_agent import analyze_repo_structure
+from agents.router_agent import detect_languages
+from agents.annotator_agent import build_file_prompt
+from report_generator import save_report, ReportWriter
+from repo_index import scan_repository
+from benchmarks.generate_vb_repo import generate_repo, PRESETS
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REGRESSION_THRESHOLD = 1.10  # flag stages more than 10% slower than the baseline
+REGRESSION_MIN_SECONDS = 0.005  # ...and ignore timer noise on millisecond stages
+
+console = Console()
+quiet = Console(file=open(os.devnull, "w", encoding="utf-8"))
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=os.path.dirname(RESULTS_DIR), capture_output=True, text=True,
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def _time(fn, repeat, setup=None):
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"min": min(samples), "median": statistics.median(samples), "runs": repeat}
+
+
+def _cold():
+    vb_lexer._cache.clear()
+
+
+def _fresh_python(*args):
+    """A stage that runs a new interpreter in the project root (import + startup cost)."""
+    return lambda: subprocess.run(
+        [sys.executable, *args], cwd=ROOT_DIR, capture_output=True, check=True
+    )
+
+
+def run_suite(repo_path, repeat=3, workers=None):
+    """Returns {stage: {"min", "median", "runs"}} for every benchmarked stage."""
+    index = scan_repository(repo_path)
+    methods = extract_vb_methods(repo_path, quiet, index=index, incremental=False, workers=1)
+    entries = [{"file": m["file"], "vb": m["code"], "cs": m["code"]} for m in methods]
+    out_dir = tempfile.mkdtemp(prefix="bench_reports_")
+    prompt_files = [e["path"] for e in index if e["ext"] in (".vb", ".cs", ".py")]
+
+    stages = {
+        "scan_repository": (lambda: scan_repository(repo_path), None),
+        "extract_vb_methods (cold)": (
+            lambda: extract_vb_methods(
+                repo_path, quiet, index=index, incremental=False, workers=workers
+            ),
+            _cold,
+        ),
+        "extract_vb_methods (incremental)": (
+            lambda: extract_vb_methods(repo_path, quiet, index=index, workers=workers),
+            None,
+        ),
+        "analyze_repo_structure (cold)": (
+            lambda: analyze_repo_structure(repo_path, index=index, force=True, workers=workers),
+            _cold,
+        ),
+        "analyze_repo_structure (incremental)": (
+            lambda: analyze_repo_structure(repo_path, index=index, workers=workers),
+            None,
+        ),
+        "detect_languages": (lambda: detect_languages(repo_path, index=index), None),
+        "annotator local parse (cold)": (
+            lambda: [build_file_prompt(p) for p in prompt_files],
+            _cold,
+        ),
+        "save_report": (
+            lambda: save_report(iter(entries), writer=ReportWriter(directory=out_dir)),
+            None,
+        ),
+        "cold start: import main": (_fresh_python("-c", "import main"), None),
+        "cold start: main.py --help": (_fresh_python("main.py", "--help"), None),
+    }
+    results = {}
+    for name, (fn, setup) in stages.items():
+        console.print(f"[cyan]⏱  {name}...[/cyan]")
+        results[name] = _time(fn, repeat, setup)
+    return results, {"methods": len(methods), "files": len(index)}
+
+
+def compare(results, baseline_path):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, r in results.items():
+        old = baseline.get(name)
+        if (
+            old and old["min"] > 0
+            and r["min"] / old["min"] > REGRESSION_THRESHOLD
+            and r["min"] - old["min"] > REGRESSION_MIN_SECONDS
+        ):
+            regressions.append((name, old["min"], r["min"]))
+    return baseline, regressions
+
+
+def main(
+    preset: str = typer.Option("small", "--preset", help="small | medium | large"),
+    repeat: int = typer.Option(3, "--repeat", help="Runs per stage"),
+    workers: int = typer.Option(None, "--workers", "-w", help="Parse processes (default: CPU count)"),
+    repo: str = typer.Option(None, "--repo", help="Benchmark an existing folder instead"),
+    compare_to: str = typer.Option(None, "--compare", help="Earlier results JSON to compare with"),
+):
+    # Stages write their caches/reports relative to the working directory — keep them out of the repo
+    work_dir = tempfile.mkdtemp(prefix="bench_work_")
+    compare_to = os.path.abspath(compare_to) if compare_to else None
+    gen_stats = {}
+    if repo:
+        repo_path = os.path.abspath(repo)
+    else:
+        repo_path = os.path.join(work_dir, f"Legacy_{preset}")
+        files, methods, depth, designer = PRESETS[preset]
+        console.print(f"[yellow]🏗  Generating {preset} solution ({files} files)...[/yellow]")
+        gen_stats = generate_repo(repo_path, files, methods, depth, designer)
+    os.chdir(work_dir)
+
+    results, sizes = run_suite(repo_path, repeat=repeat, workers=workers)
+
+    table = Table(title=f"Benchmarks — {preset if not repo else repo}")
+    table.add_column("Stage")
+    table.add_column("min (s)", justify="right")
+    table.add_column("median (s)", justify="right")
+    baseline, regressions = ({}, [])
+    if compare_to:
+        baseline, regressions = compare(results, compare_to)
+        table.add_column("baseline min (s)", justify="right")
+    for name, r in results.items():
+        row = [name, f"{r['min']:.3f}", f"{r['median']:.3f}"]
+        if compare_to:
+            old = baseline.get(name)
+            row.append(f"{old['min']:.3f}" if old else "—")
+        table.add_row(*row)
+    console.print(table)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    commit = _git_commit()
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = preset if not repo else "custom"
+    out_path = os.path.join(RESULTS_DIR, f"{name}_{commit or 'nogit'}_{stamp}.json")
+    with open(out_path, "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "commit": commit,
+                "created": datetime.now().isoformat(),
+                "preset": None if repo else preset,
+                "repo": repo,
+                "sizes": {**gen_stats, **sizes},
+                "python": platform.python_version(),
+                "cpus": os.cpu_count(),
+                "workers": workers or vb_lexer.DEFAULT_PARSE_WORKERS,
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+    console.print(f"[green]✅ Results saved to {out_path}[/green]")
+
+    if regressions:
+        for name, old, new in regressions:
+            console.print(f"[red]⚠ Regression: {name} {old:.3f}s → {new:.3f}s[/red]")
+        raise typer.Exit(code=1)
+
+
+if __name__ == "__main__":
+    typer.run(main)
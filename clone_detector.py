@@ -0,0 +1,261 @@
+# clone_detector.py
+"""
+Local detection of copy-pasted VB.NET methods ("clone families").
+
+Methods are tokenized and normalized — identifiers become ID, literals become
+STR/NUM, comments and layout are dropped — and grouped by a hash of that
+sequence, which is a single O(n) pass over the methods. The first method of a
+family is translated; the others get its C# with their own identifiers and
+literals substituted back, but only after the mapping is checked to be a
+bijection that can be applied safely to the C#. Anything that fails a check
+is translated normally.
+"""
+import re
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from translation_cache import is_cacheable
+from translation_engine import DEFAULT_CONCURRENCY
+
+TOKEN = re.compile(
+    r"""'[^\n]*"""                               # comment
+    r'''|"(?:[^"]|"")*"c?'''                     # string / char literal
+    r"|#[^#\n]*#"                                # date literal
+    r"|&[HhOoBb][0-9A-Fa-f_]+\w*"                # hex / octal / binary literal
+    r"|\d[\d_]*(?:\.\d+)?(?:[Ee][+-]?\d+)?[A-Za-z@#%!&]*"  # number (+ type suffix)
+    r"|\[[A-Za-z_]\w*\]|[A-Za-z_]\w*"            # (escaped) identifier or keyword
+    r"|\S"                                       # operator / punctuation
+)
+KEYWORDS = {
+    "addhandler", "addressof", "alias", "and", "andalso", "as", "boolean", "byref",
+    "byte", "byval", "call", "case", "catch", "cbool", "cbyte", "cchar", "cdate",
+    "cdbl", "cdec", "char", "cint", "class", "clng", "cobj", "const", "continue",
+    "csbyte", "cshort", "csng", "cstr", "ctype", "cuint", "culng", "cushort", "date",
+    "decimal", "declare", "default", "delegate", "dim", "directcast", "do", "double",
+    "each", "else", "elseif", "end", "enum", "erase", "error", "event", "exit",
+    "false", "finally", "for", "friend", "function", "get", "gettype", "global",
+    "goto", "handles", "if", "implements", "imports", "in", "inherits", "integer",
+    "interface", "is", "isnot", "let", "lib", "like", "long", "loop", "me", "mod",
+    "module", "mustinherit", "mustoverride", "mybase", "myclass", "nameof",
+    "namespace", "narrowing", "new", "next", "not", "nothing", "notinheritable",
+    "notoverridable", "object", "of", "on", "operator", "option", "optional", "or",
+    "orelse", "overloads", "overridable", "overrides", "paramarray", "partial",
+    "private", "property", "protected", "public", "raiseevent", "readonly", "redim",
+    "rem", "removehandler", "resume", "return", "sbyte", "select", "set", "shadows",
+    "shared", "short", "single", "static", "step", "stop", "string", "structure",
+    "sub", "synclock", "then", "throw", "to", "true", "try", "trycast", "typeof",
+    "uinteger", "ulong", "ushort", "using", "when", "while", "widening", "with",
+    "withevents", "writeonly", "xor", "async", "await", "iterator", "yield",
+}
+# Literals whose C# spelling is identical to the VB.NET one, so they can be swapped in place
+PORTABLE_STRING = re.compile(r'^"[^"\\\n]*"$')
+PORTABLE_NUMBER = re.compile(r"^\d+(?:\.\d+)?$")
+
+
+def tokenize(code: str):
+    """[(kind, text)] with kind in {"kw", "id", "str", "num", "op"}; comments dropped."""
+    tokens = []
+    for m in TOKEN.finditer(code):
+        text = m.group(0)
+        first = text[0]
+        if first == "'":
+            continue
+        if first == '"' or first == "#":
+            tokens.append(("str", text))
+        elif first.isdigit() or first == "&" and len(text) > 1:
+            tokens.append(("num", text))
+        elif first.isalpha() or first in "_[":
+            word = text.strip("[]")
+            if text[0] != "[" and word.lower() in KEYWORDS:
+                if word.lower() == "rem":
+                    break  # REM comment on a line of its own — rare, stop conservatively
+                tokens.append(("kw", word.lower()))
+            else:
+                tokens.append(("id", word))
+        else:
+            tokens.append(("op", text))
+    return tokens
+
+
+def family_key(tokens) -> str:
+    """Hash of the normalized token sequence: same key ⇔ same code up to names/literals."""
+    h = hashlib.sha1()
+    for kind, text in tokens:
+        h.update((text if kind in ("kw", "op") else kind.upper()).encode("utf-8"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def _mapping(rep_tokens, tokens):
+    """
+    Position-wise rep → member substitutions for identifiers and literals, or None
+    if the correspondence is not one-to-one (VB.NET identifiers compare case-insensitively).
+    """
+    if len(rep_tokens) != len(tokens):
+        return None
+    forward, backward, spelling = {}, {}, {}
+    for (kind, a), (other, b) in zip(rep_tokens, tokens):
+        if kind != other:
+            return None
+        if kind in ("kw", "op"):
+            if a != b:
+                return None
+            continue
+        ka, kb = (a.lower(), b.lower()) if kind == "id" else (a, b)
+        ka, kb = (kind, ka), (kind, kb)
+        if forward.setdefault(ka, kb) != kb or backward.setdefault(kb, ka) != ka:
+            return None
+        spelling.setdefault(ka, (a, b))
+    # Case-only renames are the same identifier in VB.NET; keep the representative's spelling
+    return {
+        a: b for (kind, _), (a, b) in spelling.items()
+        if (a.lower() != b.lower() if kind == "id" else a != b)
+    }
+
+
+def adapt_translation(rep_code: str, rep_cs: str, code: str):
+    """
+    Rewrite the representative's C# for a clone, or return None when it cannot be
+    done safely (structure differs, mapping not bijective, a renamed identifier or
+    changed literal cannot be located in the C#, or a new name would collide).
+    """
+    rep_tokens, tokens = tokenize(rep_code), tokenize(code)
+    if family_key(rep_tokens) != family_key(tokens):
+        return None
+    subs = _mapping(rep_tokens, tokens)
+    if subs is None:
+        return None
+    if not subs:
+        return rep_cs
+
+    patterns = []
+    kinds = {text: kind for kind, text in rep_tokens}
+    renamed = {source.lower() for source in subs}
+    for source, target in subs.items():
+        kind = kinds.get(source, "id")
+        if kind == "id":
+            word = re.compile(rf"\b{re.escape(source)}\b")
+            if not word.search(rep_cs):
+                return None  # the translation renamed it — can't tell where it went
+            if target.lower() not in renamed and re.search(
+                rf"\b{re.escape(target)}\b", rep_cs, re.IGNORECASE
+            ):
+                return None  # the new name already means something else in the C#
+            patterns.append(rf"\b{re.escape(source)}\b")
+        else:
+            if not (PORTABLE_STRING.match(source) or PORTABLE_NUMBER.match(source)):
+                return None
+            if not (PORTABLE_STRING.match(target) or PORTABLE_NUMBER.match(target)):
+                return None
+            # Every occurrence in the C# must come from the VB.NET literal, none added
+            vb_count = sum(1 for _, text in rep_tokens if text == source)
+            literal = (
+                re.escape(source) if source[0] == '"'
+                else rf"(?<![\w.]){re.escape(source)}(?![\w.])"
+            )
+            if len(re.findall(literal, rep_cs)) != vb_count:
+                return None
+            patterns.append(literal)
+
+    # One simultaneous pass, so swapped names (a↔b) don't chain into each other
+    swap = re.compile("|".join(sorted(patterns, key=len, reverse=True)))
+    return swap.sub(lambda m: subs[m.group(0)], rep_cs)
+
+
+def dedupe_translations(
+    methods, translate, retranslate, stats=None, on_adapted=None, concurrency=None
+):
+    """
+    Lazily yield report entries for `methods` in source order, sending only the
+    first method of each clone family to translate(representatives) — which must
+    yield {"file", "vb", "cs"} entries in the order it was given. Later clones are
+    adapted from their representative's C# as soon as it is known; when that is not
+    possible (or the representative failed) retranslate(method) runs for them on a
+    shared pool of `concurrency` threads, so they translate alongside the stream
+    instead of holding it up one by one.
+    `stats` counts {"families", "adapted", "retranslated"}; on_adapted(method, cs)
+    fires for every clone answered without an LLM call.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(families=0, adapted=0, retranslated=0)
+    source = iter(methods)
+    order = deque()  # {"kind": "rep" | "clone", "method", "key", ...}, in source order
+    reps_queue = deque()
+    results = {}  # family key → (representative method, its C#), None until translated
+    waiting = {}  # family key → clone records seen before their representative finished
+    pool = None
+
+    def resolve(record):
+        """Adapt a clone from its finished representative, or start retranslating it."""
+        nonlocal pool
+        method = record["method"]
+        rep, rep_cs = results[record["key"]]
+        cs = adapt_translation(rep["code"], rep_cs, method["code"]) if is_cacheable(rep_cs) else None
+        if cs is None:
+            stats["retranslated"] += 1
+            if pool is None:
+                pool = ThreadPoolExecutor(
+                    max_workers=max(1, concurrency or DEFAULT_CONCURRENCY),
+                    thread_name_prefix="retranslate",
+                )
+            record["future"] = pool.submit(retranslate, method)
+            return
+        stats["adapted"] += 1
+        record["cs"] = cs
+        record["clone_of"] = f"{rep['file']}:{rep.get('start_line', 0)}"
+        if on_adapted:
+            on_adapted(method, cs)
+
+    def advance():
+        method = next(source, None)
+        if method is None:
+            return False
+        key = family_key(tokenize(method["code"]))
+        if key in results:
+            record = {"kind": "clone", "method": method, "key": key}
+            order.append(record)
+            if results[key] is None:
+                waiting.setdefault(key, []).append(record)
+            else:
+                resolve(record)
+        else:
+            results[key] = None
+            stats["families"] += 1
+            order.append({"kind": "rep", "method": method, "key": key})
+            reps_queue.append(method)
+        return True
+
+    def representatives():
+        while True:
+            while not reps_queue:
+                if not advance():
+                    return
+            yield reps_queue.popleft()
+
+    fresh = iter(translate(representatives()))
+    try:
+        while order or advance():
+            record = order.popleft()
+            method = record["method"]
+            if record["kind"] == "rep":
+                entry = next(fresh)
+                results[record["key"]] = (method, entry["cs"])
+                for clone in waiting.pop(record["key"], []):
+                    resolve(clone)
+                yield entry
+            elif "future" in record:
+                try:
+                    cs = record["future"].result()
+                except Exception as e:
+                    cs = f"// Translation failed: {e}"
+                yield {"file": method["file"], "vb": method["code"], "cs": cs}
+            else:
+                yield {
+                    "file": method["file"],
+                    "vb": method["code"],
+                    "cs": record["cs"],
+                    "clone_of": record["clone_of"],
+                }
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
@@ -1,42 +1,34 @@
 import os
 import streamlit as st
-import io, sys, json, time
+import io, sys, json
+from collections import deque
 from contextlib import redirect_stdout
+from dotenv import load_dotenv
+
+# .env before the project modules read their settings (LLM clients are built lazily)
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
 from rich.console import Console
 from repo_handler import clone_or_load_repo
 from agents.router_agent import detect_languages
 from agents.analyser_agent import analyze_repo_structure
 from agents.planner_agent import generate_migration_plan
-import networkx as nx
 
 from textwrap import shorten
-from pyvis.network import Network
 
 from agents.annotator_agent import annotate_repository
+from repo_index import scan_repository, load_manifest, index_revision
+from jobs import start_job, get_job, forget_job
+import telemetry
+from dependency_graph import (
+    build_dependency_graph,
+    load_dependency_graph,
+    save_dependency_graph,
+    render_graph_html,
+)
 
-
-
-options = """
-{
-  "nodes": {
-    "shape": "dot",
-    "size": 18,
-    "font": { "color": "white", "face": "monospace", "size": 14 }
-  },
-  "edges": {
-    "color": { "color": "#888" },
-    "width": 1.2,
-    "smooth": { "type": "continuous" }
-  },
-  "interaction": {
-    "hover": true,
-    "tooltipDelay": 120,
-    "zoomView": true,
-    "dragView": true
-  },
-  "physics": { "stabilization": true }
-}
-"""
+TERMINAL_LINES = 200  # the terminal box only ever renders this many lines
+ANNOTATIONS_PATH = "reports/annotations.json"
 
 # ---- Streamlit Config ----
 st.set_page_config(page_title="AI Pair Programmer", layout="wide")
@@ -67,19 +59,199 @@ st.markdown(
 
 # ---- Terminal-like output box ----
 terminal_box = st.empty()
-terminal_text = ""
+if "term_lines" not in st.session_state:
+    st.session_state.term_lines = deque(maxlen=TERMINAL_LINES)
 
 
-def term_log(msg: str):
-    """Simulate terminal output."""
-    global terminal_text
-    terminal_text += f"{msg}\n"
-    terminal_box.markdown(
-        f"<div class='terminal'><pre>{terminal_text}</pre></div>",
+def render_terminal(lines, box=None):
+    (box or terminal_box).markdown(
+        "<div class='terminal'><pre>" + "\n".join(lines) + "</pre></div>",
         unsafe_allow_html=True,
     )
 
 
+def term_log(msg: str):
+    """Simulate terminal output (bounded: only the last TERMINAL_LINES lines are kept)."""
+    st.session_state.term_lines.append(msg)
+    render_terminal(st.session_state.term_lines)
+
+
+if st.session_state.term_lines:
+    render_terminal(st.session_state.term_lines)
+
+
+# ---- Background pipeline ----
+def run_pipeline(job, repo_url):
+    """Clone → index → detect → analyze → annotate, reporting progress to `job`."""
+    telemetry.reset()
+    job.progress(stage="Cloning repository")
+    job.log(f"🤖 Starting pipeline for: {repo_url}")
+    with telemetry.span("clone"):
+        repo_path = clone_or_load_repo(repo_url, console)
+    job.log(f"✅ Repo ready at: {repo_path}")
+
+    job.progress(stage="Indexing files")
+    job.log("📇 Indexing repository files...")
+    with telemetry.span("index"):
+        index = scan_repository(repo_path, previous=load_manifest(repo_path))
+    job.log(f"✅ Indexed {len(index)} files")
+
+    job.progress(stage="Detecting languages")
+    job.log("🧭 Detecting languages...")
+    with telemetry.span("detect"):
+        lang_info = detect_languages(repo_path, index=index)
+    job.log(json.dumps(lang_info, indent=2))
+
+    job.progress(stage="Analyzing structure")
+    job.log("🔍 Running Analyzer Agent...")
+    with telemetry.span("analyze"):
+        summary, tree_text = analyze_repo_structure(repo_path, return_tree=True, index=index)
+    job.log("✅ Analysis completed and saved to /reports")
+
+    job.progress(stage="Annotating files")
+    with telemetry.span("annotate"):
+        annotate_repository(
+            repo_path,
+            index=index,
+            on_progress=lambda done, total: job.progress(done, total),
+        )
+    job.log("✅ File summaries saved to reports/annotations.json")
+    run = telemetry.export()
+    job.log(
+        f"📈 Stages: " + ", ".join(f"{k} {v:.1f}s" for k, v in run["stages"].items())
+        + f" — {run['llm']['calls']} LLM calls, {run['llm']['retries']} retries"
+    )
+    return {
+        "repo_path": repo_path,
+        "repo_index": index,
+        "revision": index_revision(index),
+        "lang_info": lang_info,
+        "summary": summary,
+        "tree_text": tree_text,
+    }
+
+
+def _job_panel():
+    """Polls the running job; once it finishes, publishes its results and reruns the page."""
+    job = get_job(st.session_state.get("job_id"))
+    if job is None:
+        return
+    snap = job.snapshot()
+    if snap["status"] == "running":
+        fraction = snap["done"] / snap["total"] if snap["total"] else 0.0
+        count = f" ({snap['done']}/{snap['total']})" if snap["total"] else ""
+        st.progress(fraction, text=f"⏳ {snap['stage']}{count} — {snap['elapsed']:.0f}s")
+        render_terminal(snap["lines"], box=st.empty())
+        return
+    # collected once: the registry drops the job, so its result is not held forever
+    forget_job(job.id)
+    st.session_state.job_id = None
+    st.session_state.term_lines.extend(snap["lines"])
+    if snap["status"] == "done":
+        st.session_state.update(job.result)
+    else:
+        st.error(f"❌ Pipeline failed: {snap['error']}")
+    st.rerun()
+
+
+running_job = get_job(st.session_state.get("job_id"))
+# Poll once a second only while a job is running; idle reruns stay cheap
+job_panel = st.fragment(
+    run_every=1.0 if running_job is not None and running_job.running else None
+)(_job_panel)
+
+
+# ---- Cached views (keyed by repo revision, so reruns skip the work) ----
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_annotations(path: str, mtime: float):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        annotations = json.load(f)
+    # Normalize paths (handles Windows/relative mismatches)
+    return {
+        os.path.normpath(p).lower(): desc.strip()
+        for p, desc in annotations.items()
+        if isinstance(desc, str)
+    }
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def build_tree_html(revision: str, root_base: str, annotations_mtime: float, _index):
+    """Annotated folder tree; recomputed only when the repo revision or annotations change."""
+    normalized_annotations = load_annotations(ANNOTATIONS_PATH, annotations_mtime)
+
+    tree_lines = []
+    shown_dirs = set()
+    by_folder = sorted(
+        _index,
+        key=lambda e: (e["rel_path"].split("/")[:-1], e["rel_path"]),
+    )
+    for entry in by_folder:
+        parts = entry["rel_path"].split("/")
+        file = parts[-1]
+        # Print any folder headers (parents first) not shown yet
+        for level in range(len(parts)):
+            folder = "/".join(parts[:level])
+            if folder not in shown_dirs:
+                shown_dirs.add(folder)
+                name = parts[level - 1] if level else os.path.basename(root_base)
+                tree_lines.append(f"{'│   ' * level}📁 {name}/")
+        indent = "│   " * (len(parts) - 1)
+
+        abs_path = entry["path"]
+        variants = [
+            os.path.normpath(abs_path).lower(),
+            os.path.basename(abs_path).lower(),
+            os.path.relpath(abs_path, root_base).lower(),
+        ]
+
+        desc = ""
+        for v in variants:
+            if v in normalized_annotations:
+                desc = normalized_annotations[v]
+                break
+
+        short_desc = shorten(desc, width=80, placeholder="…") if desc else ""
+        tree_lines.append(f"{indent}    📄 {file} — {short_desc}")
+
+    joined_tree = "\n".join(tree_lines)
+    return f"""
+    <div style="
+    color:#00ffff;
+    background-color:#111;
+    padding:10px;
+    border-radius:8px;
+    font-family:monospace;
+    height:500px;
+    overflow-y:auto;
+    white-space:pre;
+    line-height:1.4;
+    ">
+    {joined_tree}
+    </div>
+    """
+
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def load_graph(revision: str, _dependencies):
+    """The clustered graph + layout saved by the analyzer (rebuilt only if it is stale)."""
+    graph = load_dependency_graph()
+    if not graph or graph.get("revision") != revision:
+        graph = build_dependency_graph(_dependencies, revision)
+        save_dependency_graph(graph)
+    return graph
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_graph_html(revision: str, expanded: tuple, _graph):
+    """Render the clustered graph for one set of expanded clusters; reports/graph.html mirrors it."""
+    html = render_graph_html(_graph, expanded)
+    with open("reports/graph.html", "w", encoding="utf-8") as f:
+        f.write(html)
+    return html
+
+
 # ---- Session State ----
 if "repo_path" not in st.session_state:
     st.session_state.repo_path = None
@@ -87,29 +259,19 @@ if "lang_info" not in st.session_state:
     st.session_state.lang_info = None
 if "summary" not in st.session_state:
     st.session_state.summary = None
+if "repo_index" not in st.session_state:
+    st.session_state.repo_index = []
+if "revision" not in st.session_state:
+    st.session_state.revision = None
 
 # ---- Input Section ----
 repo_url = st.text_input("🔗 Enter GitHub repo URL or local folder path:")
-if st.button("🚀 Start Analysis"):
-    term_log(f"🤖 Starting pipeline for: {repo_url}")
-    with st.spinner("Cloning repository..."):
-        st.session_state.repo_path = clone_or_load_repo(repo_url, console)
-    term_log(f"✅ Repo ready at: {st.session_state.repo_path}")
-
-    term_log("🧭 Detecting languages...")
-    st.session_state.lang_info = detect_languages(st.session_state.repo_path)
-    term_log(json.dumps(st.session_state.lang_info, indent=2))
-
-    term_log("🔍 Running Analyzer Agent...")
-    summary, tree_text = analyze_repo_structure(
-        st.session_state.repo_path, return_tree=True
-    )
-    st.session_state.summary = summary
-    st.session_state.tree_text = tree_text
-    term_log("✅ Analysis completed and saved to /reports")
-    time.sleep(5)
-    annotate_repository(st.session_state.repo_path)
-    term_log("✅ File summaries saved to reports/annotations.json")
+busy = running_job is not None and running_job.running
+if st.button("🚀 Start Analysis", disabled=busy):
+    # Runs in the background; the page stays interactive and polls for progress
+    st.session_state.job_id = start_job("analysis", run_pipeline, repo_url).id
+    st.rerun()
+job_panel()
 
 # ---- Results Section ----
 if st.session_state.lang_info:
@@ -128,62 +290,15 @@ if st.session_state.summary:
     st.divider()
     st.subheader("🌲 Project Structure Overview (with inline summaries)")
 
-    annotations_path = "reports/annotations.json"
-    annotations = {}
-    if os.path.exists(annotations_path):
-        with open(annotations_path, "r", encoding="utf-8") as f:
-            annotations = json.load(f)
-
-    # Normalize paths (handles Windows/relative mismatches)
-    normalized_annotations = {
-        os.path.normpath(path).lower(): desc.strip()
-        for path, desc in annotations.items()
-        if isinstance(desc, str)
-    }
-
-    tree_lines = []
-    root_base = st.session_state.repo_path
-
-    for root, dirs, files in os.walk(root_base):
-        level = root.count(os.sep) - root_base.count(os.sep)
-        indent = "│   " * level
-        folder_name = os.path.basename(root)
-        tree_lines.append(f"{indent}📁 {folder_name}/")
-
-        for file in sorted(files):
-            abs_path = os.path.join(root, file)
-            variants = [
-                os.path.normpath(abs_path).lower(),
-                os.path.basename(abs_path).lower(),
-                os.path.relpath(abs_path, root_base).lower(),
-            ]
-
-            desc = ""
-            for v in variants:
-                if v in normalized_annotations:
-                    desc = normalized_annotations[v]
-                    break
-
-            short_desc = shorten(desc, width=80, placeholder="…") if desc else ""
-            tree_lines.append(f"{indent}    📄 {file} — {short_desc}")
-
-    joined_tree = "\n".join(tree_lines)
-    scrollable_html = f"""
-    <div style="
-    color:#00ffff;
-    background-color:#111;
-    padding:10px;
-    border-radius:8px;
-    font-family:monospace;
-    height:500px;
-    overflow-y:auto;
-    white-space:pre;
-    line-height:1.4;
-    ">
-    {joined_tree}
-    </div>
-    """
-
+    annotations_mtime = (
+        os.path.getmtime(ANNOTATIONS_PATH) if os.path.exists(ANNOTATIONS_PATH) else 0.0
+    )
+    scrollable_html = build_tree_html(
+        st.session_state.revision,
+        st.session_state.repo_path,
+        annotations_mtime,
+        st.session_state.repo_index,
+    )
     st.markdown(scrollable_html, unsafe_allow_html=True)
 
     # ✅ Dependency Graph (separate, no summaries)
@@ -191,19 +306,15 @@ if st.session_state.summary:
     summary = st.session_state.summary
 
     if summary.get("vb_dependencies"):
-        G = nx.DiGraph()
-        for file, deps in summary["vb_dependencies"].items():
-            G.add_node(file, color="lightblue", title=file)
-            for dep in deps:
-                G.add_node(dep, color="orange", title=dep)
-                G.add_edge(file, dep)
-
-        net = Network(height="650px", width="100%", bgcolor="#111", font_color="white")
-        net.from_nx(G)
-        net.repulsion(node_distance=150, spring_length=120)
-        net.set_options(options)
-        net.save_graph("reports/graph.html")
-        st.components.v1.html(open("reports/graph.html").read(), height=650)
+        graph = load_graph(st.session_state.revision, summary["vb_dependencies"])
+        labels = {
+            f"{'📁' if n['kind'] == 'folder' else '📦'} {n['label']} ({len(n['members'])})": cid
+            for cid, n in sorted(graph["nodes"].items())
+        }
+        chosen = st.multiselect("🔎 Expand clusters:", list(labels))
+        expanded = tuple(sorted(labels[c] for c in chosen))
+        graph_html = build_graph_html(st.session_state.revision, expanded, graph)
+        st.components.v1.html(graph_html, height=650)
     else:
         st.info("No dependencies found.")
 
@@ -221,8 +332,18 @@ if st.button("🧩 Generate Migration Plan"):
     term_log(
         f"🧠 Generating migration plan for {st.session_state.lang_info['primary']} → {target_lang}"
     )
-    plan_md = generate_migration_plan(st.session_state.lang_info, target_lang)
-    st.session_state.plan_md = plan_md
     st.markdown("### 📜 Migration Plan")
-    st.markdown(plan_md, unsafe_allow_html=True)
+    plan_view = st.empty()
+    streamed = []
+
+    def show_plan_piece(piece):
+        # ⚡ render the plan as it streams in instead of after the whole completion
+        streamed.append(piece)
+        plan_view.markdown("".join(streamed) + " ▌")
+
+    plan_md = generate_migration_plan(
+        st.session_state.lang_info, target_lang, on_token=show_plan_piece
+    )
+    st.session_state.plan_md = plan_md
+    plan_view.markdown(plan_md, unsafe_allow_html=True)
     term_log("✅ Migration plan ready (saved to reports/migration_plan.md)")
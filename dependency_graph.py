@@ -0,0 +1,187 @@
+# dependency_graph.py
+"""
+Clustered Imports graph for large solutions.
+
+Source files are grouped by folder and imported namespaces by their first
+NAMESPACE_DEPTH segments, so the graph has one node per cluster instead of one
+per file. Positions are computed once on the server (networkx spring layout)
+and saved with the analysis; the browser only draws them, with physics off.
+A cluster can be expanded on demand into its members, laid out on a ring
+around the cluster's position.
+"""
+import os
+import json
+import math
+from collections import Counter, defaultdict
+
+GRAPH_PATH = os.path.join("reports", "dependency_graph.json")
+NAMESPACE_DEPTH = int(os.getenv("GRAPH_NAMESPACE_DEPTH", "2"))
+LAYOUT_SCALE = 1000  # vis.js canvas units
+MAX_EXPANDED_MEMBERS = 300  # a single expanded cluster never draws more nodes than this
+
+RENDER_OPTIONS = """
+{
+  "nodes": {
+    "shape": "dot",
+    "font": { "color": "white", "face": "monospace", "size": 14 }
+  },
+  "edges": {
+    "color": { "color": "#888" },
+    "smooth": false,
+    "arrows": { "to": { "enabled": true, "scaleFactor": 0.4 } }
+  },
+  "interaction": {
+    "hover": true,
+    "tooltipDelay": 120,
+    "zoomView": true,
+    "dragView": true,
+    "hideEdgesOnDrag": true
+  },
+  "physics": { "enabled": false }
+}
+"""
+
+
+def folder_cluster(rel_path: str) -> str:
+    folder = rel_path.rpartition("/")[0]
+    return f"dir:{folder or '.'}"
+
+
+def namespace_cluster(name: str) -> str:
+    return "ns:" + ".".join(name.split(".")[:NAMESPACE_DEPTH])
+
+
+def _layout(nodes, edges):
+    """Server-side positions for the cluster graph: {node: (x, y)}."""
+    import networkx as nx  # only needed when a graph is (re)built
+
+    G = nx.Graph()
+    G.add_nodes_from(nodes)
+    for a, b, weight in edges:
+        G.add_edge(a, b, weight=weight)
+    if len(G) <= 1:
+        return {n: (0.0, 0.0) for n in G}
+    # Fewer iterations on big graphs keep the rebuild bounded; seed keeps it stable
+    iterations = 50 if len(G) < 500 else 20
+    pos = nx.spring_layout(G, seed=42, iterations=iterations, scale=LAYOUT_SCALE)
+    return {n: (float(x), float(y)) for n, (x, y) in pos.items()}
+
+
+def build_dependency_graph(vb_dependencies, revision=""):
+    """
+    Aggregate {rel_path: [imports]} into cluster nodes and weighted cluster edges,
+    with a precomputed layout. The per-file edges are kept for expansion.
+    """
+    members = defaultdict(set)
+    weights = Counter()
+    for rel_path, imports in vb_dependencies.items():
+        source = folder_cluster(rel_path)
+        members[source].add(rel_path)
+        for name in imports:
+            target = namespace_cluster(name)
+            members[target].add(name)
+            weights[(source, target)] += 1
+
+    edges = [[a, b, w] for (a, b), w in sorted(weights.items())]
+    pos = _layout(sorted(members), edges)
+    nodes = {
+        cluster: {
+            "label": cluster.split(":", 1)[1],
+            "kind": "folder" if cluster.startswith("dir:") else "namespace",
+            "members": sorted(items),
+            "x": pos[cluster][0],
+            "y": pos[cluster][1],
+        }
+        for cluster, items in members.items()
+    }
+    return {
+        "revision": revision,
+        "nodes": nodes,
+        "edges": edges,
+        "file_edges": {p: list(deps) for p, deps in vb_dependencies.items()},
+    }
+
+
+def save_dependency_graph(graph, path=GRAPH_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(graph, f)
+
+
+def load_dependency_graph(path=GRAPH_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _node_size(count: int) -> float:
+    return 10 + 6 * math.log2(1 + count)
+
+
+def render_graph_html(graph, expanded=(), height="650px"):
+    """
+    pyvis HTML for the clustered graph. Clusters in `expanded` are replaced by
+    their members (up to MAX_EXPANDED_MEMBERS each) on a ring around the cluster.
+    """
+    from pyvis.network import Network
+
+    expanded = set(expanded)
+    net = Network(height=height, width="100%", bgcolor="#111", font_color="white", directed=True)
+    owner = {}  # member → node id drawn for it, inside expanded clusters
+
+    for cluster, node in graph["nodes"].items():
+        color = "lightblue" if node["kind"] == "folder" else "orange"
+        count = len(node["members"])
+        if cluster not in expanded:
+            net.add_node(
+                cluster,
+                label=f"{node['label']} ({count})",
+                title=f"{node['kind']}: {node['label']} — {count} items",
+                color=color,
+                size=_node_size(count),
+                x=node["x"],
+                y=node["y"],
+                physics=False,
+            )
+            continue
+        shown = node["members"][:MAX_EXPANDED_MEMBERS]
+        radius = 60 + 12 * len(shown)
+        for i, member in enumerate(shown):
+            angle = 2 * math.pi * i / len(shown)
+            member_id = f"{cluster}|{member}"
+            owner[(cluster, member)] = member_id
+            net.add_node(
+                member_id,
+                label=member.rsplit("/", 1)[-1],
+                title=member,
+                color=color,
+                size=8,
+                x=node["x"] + radius * math.cos(angle),
+                y=node["y"] + radius * math.sin(angle),
+                physics=False,
+            )
+
+    drawn = set()
+
+    def endpoint(cluster, member):
+        return owner.get((cluster, member), cluster if cluster not in expanded else None)
+
+    for source, target, weight in graph["edges"]:
+        if source not in expanded and target not in expanded:
+            net.add_edge(source, target, value=weight, title=f"{weight} Imports")
+    # Expanded clusters are drawn from the per-file edges
+    for rel_path, imports in graph["file_edges"].items():
+        source = folder_cluster(rel_path)
+        for name in imports:
+            target = namespace_cluster(name)
+            if source not in expanded and target not in expanded:
+                continue
+            a, b = endpoint(source, rel_path), endpoint(target, name)
+            if a and b and (a, b) not in drawn:
+                drawn.add((a, b))
+                net.add_edge(a, b, title=f"{rel_path} → {name}")
+
+    net.set_options(RENDER_OPTIONS)
+    return net.generate_html()
@@ -0,0 +1,104 @@
+# jobs.py
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+LOG_LINES = 200  # only the tail of a job's log is kept / shown
+JOB_TTL = float(os.getenv("JOB_TTL", "3600"))  # seconds a finished, uncollected job is kept
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+class Job:
+    """A long-running stage on a background thread, with a bounded log and progress."""
+
+    def __init__(self, name: str):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name
+        self.status = "running"  # running | done | failed
+        self.stage = ""
+        self.done = 0
+        self.total = 0
+        self.result = None
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+        self.lines = deque(maxlen=LOG_LINES)
+        self._lock = threading.Lock()
+
+    def log(self, msg: str):
+        with self._lock:
+            self.lines.append(msg)
+
+    def progress(self, done=None, total=None, stage=None):
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            if total is not None:
+                self.total = total
+            if done is not None:
+                self.done = done
+
+    def snapshot(self):
+        """Consistent copy of the state for rendering from another thread."""
+        with self._lock:
+            return {
+                "name": self.name,
+                "status": self.status,
+                "stage": self.stage,
+                "done": self.done,
+                "total": self.total,
+                "error": self.error,
+                "elapsed": (self.finished or time.time()) - self.started,
+                "lines": list(self.lines),
+            }
+
+    @property
+    def running(self):
+        return self.status == "running"
+
+
+def start_job(name: str, fn, *args, **kwargs) -> Job:
+    """Run fn(job, *args, **kwargs) on a daemon thread; its return value becomes job.result."""
+    job = Job(name)
+
+    def run():
+        try:
+            job.result = fn(job, *args, **kwargs)
+            job.status = "done"
+        except Exception as e:
+            job.error = str(e)
+            job.log(f"❌ {name} failed: {e}")
+            job.status = "failed"
+        finally:
+            job.finished = time.time()
+
+    with _jobs_lock:
+        _prune()
+        _jobs[job.id] = job
+    threading.Thread(target=run, name=f"job-{name}", daemon=True).start()
+    return job
+
+
+def _prune():
+    """Drop jobs that finished over JOB_TTL ago (their session left without reading them)."""
+    now = time.time()
+    for job_id in [i for i, j in _jobs.items() if j.finished and now - j.finished > JOB_TTL]:
+        del _jobs[job_id]
+
+
+def get_job(job_id):
+    with _jobs_lock:
+        _prune()
+        return _jobs.get(job_id)
+
+
+def forget_job(job_id):
+    """Remove a finished job from the registry once its result has been read."""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is not None and not job.running:
+            del _jobs[job_id]
@@ -1,24 +1,59 @@
-import typer, time, sys
+import time
+
+STARTED = time.perf_counter()  # before the heavy imports: start-to-first-work is tracked
+
+import typer, sys, os, threading
+from functools import partial
+from dotenv import load_dotenv
+
+# .env is read once, here, before any module picks up its settings from the environment
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env"))
+
 from rich.console import Console
 from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.progress import Progress, SpinnerColumn, TextColumn, MofNCompleteColumn
 from repo_handler import clone_or_load_repo
-from vb_parser import extract_vb_methods
-from ai_refactor import translate_vb_to_csharp
+from vb_parser import iter_vb_methods
+from vb_lexer import DEFAULT_PARSE_WORKERS
+from provider_router import ProviderRouter, get_llm
+from ai_refactor import (
+    translate_vb_to_csharp,
+    translate_vb_batch,
+    async_translator,
+    translation_token_limit,
+    print_cache_stats,
+)
 from report_generator import save_report
+from translation_engine import translate_methods, prefetch, DEFAULT_CONCURRENCY
+from translation_batcher import DEFAULT_BATCH_TOKENS
+from run_journal import RunJournal, resume_translations
+from symbol_index import SymbolIndex
+from clone_detector import dedupe_translations
+import telemetry
 
 from agents.analyser_agent import analyze_repo_structure
+from repo_index import scan_repository, load_manifest
 
 
 console = Console()
+STREAM_PREVIEW_CHARS = 60
+TYPE_DELAY = 0.015  # seconds per character of the typing effect
+
+
+def ci_mode():
+    """Non-interactive output by default under CI or when stdout is not a terminal."""
+    return bool(os.getenv("CI")) or not console.is_terminal
 
 
-def type_effect(text: str, color="cyan"):
-    """Claude-style typing effect"""
+def type_effect(text: str, color="cyan", delay=TYPE_DELAY):
+    """Claude-style typing effect (delay=0 prints the line at once)"""
+    if not delay:
+        console.print(text, style=color)
+        return
     for ch in text:
         console.print(ch, style=color, end="")
         sys.stdout.flush()
-        time.sleep(0.015)
+        time.sleep(delay)
     console.print()
 
 
@@ -26,8 +61,55 @@ def main(
     repo: str = typer.Option(
         ..., "--repo", "-r", help="GitHub repo URL or local folder path"
     ),
+    ref: str = typer.Option(None, "--ref", help="Branch, tag or commit to check out"),
+    depth: int = typer.Option(None, "--depth", help="Shallow clone/fetch depth"),
+    full_clone: bool = typer.Option(
+        False, "--full-clone", help="Download all blobs instead of a blobless clone"
+    ),
+    concurrency: int = typer.Option(
+        DEFAULT_CONCURRENCY,
+        "--concurrency",
+        "-j",
+        help="Number of methods translated in parallel",
+    ),
+    no_cache: bool = typer.Option(
+        False, "--no-cache", help="Re-translate everything, ignoring reports/translation_cache.sqlite"
+    ),
+    batch_tokens: int = typer.Option(
+        DEFAULT_BATCH_TOKENS,
+        "--batch-tokens",
+        help="Pack small methods into one request up to this many tokens (0 = off)",
+    ),
+    workers: int = typer.Option(
+        DEFAULT_PARSE_WORKERS, "--workers", "-w", help="Processes used to parse VB.NET files"
+    ),
+    resume: bool = typer.Option(
+        False, "--resume", help="Replay finished methods from the last interrupted run"
+    ),
+    no_dedupe: bool = typer.Option(
+        False, "--no-dedupe", help="Translate copy-pasted methods separately instead of adapting"
+    ),
+    no_stream: bool = typer.Option(
+        False, "--no-stream", help="Wait for whole completions instead of showing them live"
+    ),
+    async_io: bool = typer.Option(
+        False,
+        "--async",
+        help="Send requests from one event loop instead of threads "
+        "(allows a much higher -j; no live preview)",
+    ),
+    ci: bool = typer.Option(
+        None,
+        "--ci/--interactive",
+        help="Plain output without typing effect or live preview "
+        "(default: on under CI or when output is not a terminal)",
+    ),
 ):
     """AI Pair Programmer – VB.NET → C# Refactor CLI"""
+    if ci is None:
+        ci = ci_mode()
+    delay = 0 if ci else TYPE_DELAY
+    telemetry.add_time("startup", time.perf_counter() - STARTED)
     console.print(
         Panel.fit(
             "[bold bright_cyan]🤖  Internal AI Pair Programmer[/bold bright_cyan]"
@@ -35,36 +117,172 @@ def main(
     )
 
     # 🧠 Clone / Load
-    with Progress(
+    with telemetry.span("clone"), Progress(
         SpinnerColumn(), TextColumn("[progress.description]{task.description}")
     ) as progress:
         progress.add_task("🧠  Cloning & loading repo...", total=None)
-        repo_path = clone_or_load_repo(repo, console)
+        repo_path = clone_or_load_repo(
+            repo, console, ref=ref, depth=depth, blobless=not full_clone
+        )
         progress.stop()
 
-    # 🔍 Parse
-    type_effect("🧩  Analyzing project structure...", "magenta")
-    analyze_repo_structure(repo_path)
-    type_effect("🔍  Scanning VB.NET files...", "yellow")
-    vb_methods = extract_vb_methods(repo_path, console)
-    type_effect(f"✅  Found {len(vb_methods)} VB.NET methods.", "green")
+    # 📇 Index (one shared walk of the repo, unchanged files keep their hashes)
+    with telemetry.span("index"):
+        index = scan_repository(repo_path, previous=load_manifest(repo_path))
 
-    # 🤖 Translate
-    results = []
-    with Progress(
-        SpinnerColumn(), TextColumn("[progress.description]{task.description}")
+    # 🔍 Parse → 🤖 Translate → 📦 Report, pipelined: methods stream through a
+    # bounded queue while earlier ones are already being translated, and every
+    # result is written to the report as soon as it is ready.
+    type_effect("🔍  Scanning VB.NET files & translating as they arrive...", "yellow", delay)
+    parse_stats, resume_stats, clone_stats = {}, {}, {}
+    # A batch must fit the provider's budget just like a single method does
+    batch_tokens = min(batch_tokens, translation_token_limit())
+    journal = RunJournal(repo, resume=resume)
+    # 🗂 Changed files are parsed into the symbol index before the first method is
+    # translated; each translation gets a bounded slice of cross-file context from
+    # it (imports, owner type, referenced members) that is the same on every run.
+    symbols = SymbolIndex(repo_path)
+    with telemetry.span("translate"), Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        MofNCompleteColumn(),
+        TextColumn("[dim]{task.fields[preview]}"),
     ) as progress:
-        t = progress.add_task("✨  Translating VB.NET → C# ...", total=len(vb_methods))
-        for method in vb_methods:
-            translation = translate_vb_to_csharp(method["code"])
-            results.append(
-                {"file": method["file"], "vb": method["code"], "cs": translation}
+        t = progress.add_task("✨  Translating VB.NET → C# ...", total=None, preview="")
+        # 📝 Live tail of the C# being streamed back; one buffer per worker thread
+        # so concurrent completions don't interleave in the preview.
+        streams = {}
+
+        def on_token(piece):
+            tail = (streams.get(threading.get_ident(), "") + piece)[-STREAM_PREVIEW_CHARS * 2 :]
+            streams[threading.get_ident()] = tail
+            progress.update(t, preview=" ".join(tail.split())[-STREAM_PREVIEW_CHARS:])
+
+        stream_to = None if no_stream or ci else on_token
+
+        def parsed_methods():
+            # ⏱ parse time is charged separately: it overlaps with translation
+            yield from telemetry.timed_iter(
+                "parse",
+                iter_vb_methods(
+                    repo_path, index=index, workers=workers, stats=parse_stats, symbols=symbols
+                ),
             )
-            progress.advance(t)
+            progress.update(t, total=parse_stats["methods"])
 
-    # 📦 Report
-    type_effect("📦  Generating colorful report...", "magenta")
-    save_report(results)
+        def on_progress(method, translation):
+            progress.update(
+                t,
+                advance=1,
+                description=f"✨  Translated {os.path.basename(method['file'])}",
+            )
+
+        def translate_unique(pending):
+            return translate_methods(
+                pending,
+                partial(translate_vb_to_csharp, use_cache=not no_cache, on_token=stream_to),
+                concurrency=concurrency,
+                on_progress=on_progress,
+                translate_batch=partial(
+                    translate_vb_batch, use_cache=not no_cache, on_token=stream_to
+                ),
+                batch_tokens=batch_tokens,
+                context_for=symbols.context_for,
+                translate_async=partial(async_translator, use_cache=not no_cache)
+                if async_io else None,
+            )
+
+        def retranslate(method):
+            # a clone that could not be adapted; runs on dedupe_translations' pool
+            translation = translate_vb_to_csharp(
+                method["code"], use_cache=not no_cache, context=symbols.context_for(method)
+            )
+            on_progress(method, translation)
+            return translation
+
+        def translate_pending(pending):
+            if no_dedupe:
+                return translate_unique(pending)
+            # ♻ Copy-pasted methods: translate one per clone family, adapt the rest
+            return dedupe_translations(
+                pending,
+                translate_unique,
+                retranslate=retranslate,
+                stats=clone_stats,
+                on_adapted=on_progress,
+                concurrency=concurrency,
+            )
+
+        def report_summary():
+            lines = [f"Methods: {parse_stats.get('methods', 0)}"]
+            if clone_stats:
+                lines.append(
+                    f"Clone families: {clone_stats['families']} — "
+                    f"LLM calls avoided by clone reuse: {clone_stats['adapted']}"
+                )
+            if resume:
+                lines.append(f"Replayed from journal: {resume_stats.get('replayed', 0)}")
+            return lines
+
+        entries = resume_translations(
+            prefetch(parsed_methods()),
+            journal,
+            translate_pending,
+            stats=resume_stats,
+            on_replay=lambda entry: progress.advance(t),
+        )
+        try:
+            save_report(entries, summary=report_summary)
+        finally:
+            journal.close()
+
+    type_effect(f"✅  Found {parse_stats.get('methods', 0)} VB.NET methods.", "green", delay)
+    if clone_stats.get("adapted"):
+        console.print(
+            f"[cyan]♻  {clone_stats['adapted']} copy-pasted methods adapted from "
+            f"their clone family — {clone_stats['adapted']} LLM calls avoided[/cyan]"
+        )
+    if resume:
+        console.print(
+            f"[cyan]♻  Resumed: {resume_stats['replayed']} methods replayed, "
+            f"{resume_stats['pending']} translated[/cyan]"
+        )
+
+    # 🧩 Analyze (files were just tokenized, so this mostly reuses the parse cache)
+    type_effect("🧩  Analyzing project structure...", "magenta", delay)
+    with telemetry.span("analyze"):
+        analyze_repo_structure(repo_path, index=index, workers=workers, symbols=symbols)
+    symbols.close()
+
+    if not no_cache:
+        print_cache_stats(console)
+    run = telemetry.export()
+    llm_stats = run["llm"]
+    console.print(
+        f"[cyan]📈  {llm_stats['calls']} LLM calls, p50 {llm_stats['latency_p50']:.2f}s / "
+        f"p99 {llm_stats['latency_p99']:.2f}s"
+        + (f", first token p50 {llm_stats['first_token_p50']:.2f}s"
+           if llm_stats["streamed_calls"] else "")
+        + f", {llm_stats['retries']} retries "
+        f"({llm_stats['backoff_seconds']:.1f}s backoff) — "
+        f"{telemetry.SUMMARY_PATH}, {telemetry.PROMETHEUS_PATH}[/cyan]"
+    )
+    console.print(
+        f"[cyan]⏱  Started in {run['timers']['startup']['seconds']:.2f}s "
+        f"(launch to first work)[/cyan]"
+    )
+    llm = get_llm()
+    if isinstance(llm, ProviderRouter):
+        events = run["events"]
+        console.print(
+            f"[cyan]🔀  {events.get('failover', 0)} failovers, {events.get('hedge', 0)} hedged "
+            f"requests ({events.get('hedge_won', 0)} won)[/cyan]"
+        )
+        for name, health in llm.snapshot().items():
+            console.print(
+                f"[cyan]   {name}: {health['state']}, "
+                f"{health['error_rate']:.0%} errors over {health['recent_calls']} recent calls[/cyan]"
+            )
     console.print(
         Panel.fit(
             "[bold green]✅  Refactor complete! Report saved in /reports[/bold green]"
@@ -0,0 +1,98 @@
+# method_chunker.py
+"""
+Split VB.NET methods that are too large for one request at statement boundaries,
+and stitch the translated pieces back together.
+
+Cuts prefer the method's top nesting level so each chunk holds whole blocks;
+only a single block larger than the limit is cut inside. Every chunk after the
+first carries the last few statements before it as read-only context.
+"""
+import re
+from token_budget import estimate_tokens
+from vb_lexer import logical_lines
+
+OVERLAP_STATEMENTS = 3
+BLOCK_OPEN = re.compile(
+    r"^(?:If\b.*\bThen$|For\b|While\b|Do\b|Select\s+Case\b|Try$|Using\b|With\b|SyncLock\b)",
+    re.IGNORECASE,
+)
+BLOCK_CLOSE = re.compile(
+    r"^(?:End\s+(?:If|Select|Try|Using|With|SyncLock|While)\b|Next\b|Loop\b|Wend\b)",
+    re.IGNORECASE,
+)
+FENCE = re.compile(r"^\s*```[\w#+-]*\s*\n(.*?)\n?\s*```\s*$", re.DOTALL)
+
+
+def split_statements(code: str):
+    """
+    [(text, depth)] per statement, physical lines joined on `_` continuations;
+    depth is the block nesting inside the method before the statement (0 = top level).
+    Statements come from the lexer's logical lines, so comments and continuations
+    are read the same way (quotes inside string literals included).
+    """
+    lines = code.splitlines()
+    statements, depth = [], 0
+    for head, _, _, first_line, last_line in logical_lines(code):
+        text = "\n".join(lines[first_line - 1:last_line])
+        if BLOCK_CLOSE.match(head):
+            depth = max(0, depth - 1)
+        statements.append((text, depth))
+        if BLOCK_OPEN.match(head):
+            depth += 1
+    return statements
+
+
+def chunk_method(code: str, limit: int):
+    """
+    Split `code` into [{"header", "context", "body"}] pieces whose body stays within
+    `limit` estimated tokens. Returns a single piece when the method already fits.
+    """
+    if estimate_tokens(code) <= limit:
+        return [{"header": "", "context": "", "body": code}]
+
+    statements = split_statements(code)
+    header = statements[0][0] if statements else ""
+    pieces, current, used, last_top = [], [], 0, None
+
+    def close(upto):
+        body = [s for s, _ in current[:upto]]
+        pieces.append(body)
+        del current[:upto]
+
+    for text, depth in statements:
+        cost = estimate_tokens(text)
+        if current and used + cost > limit:
+            if depth == 0:
+                close(len(current))  # between two top-level statements: a clean cut
+            elif last_top and sum(estimate_tokens(s) for s, _ in current[:last_top]) * 2 >= limit:
+                close(last_top)  # back up to the start of the open block
+            else:
+                close(len(current))  # one block alone is over the limit — cut inside it
+            used = sum(estimate_tokens(s) for s, _ in current)
+            last_top = None
+        if depth == 0 and current:
+            last_top = len(current)
+        current.append((text, depth))
+        used += cost
+    if current:
+        close(len(current))
+
+    chunks, previous = [], []
+    for body in pieces:
+        chunks.append({
+            "header": header,
+            "context": "\n".join(previous[-OVERLAP_STATEMENTS:]),
+            "body": "\n".join(body),
+        })
+        previous = body
+    return chunks
+
+
+def strip_fences(text: str) -> str:
+    m = FENCE.match(text or "")
+    return m.group(1) if m else (text or "").strip()
+
+
+def stitch(translations):
+    """Join chunk translations in order, dropping the code fences models like to add."""
+    return "\n".join(strip_fences(t) for t in translations)
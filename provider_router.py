@@ -0,0 +1,366 @@
+# provider_router.py
+"""
+Route LLM calls across several configured providers.
+
+    LLM_PROVIDERS="gemini:gemini-2.0-flash-lite,openrouter:mistralai/mistral-7b-instruct,ollama:llama3"
+
+Providers are tried in the configured order. Per provider the router tracks
+latency and the error rate of the last minute (a provider is only demoted once it
+has enough recent samples, and the demotion wears off as they age); repeated 429s / 5xx / network errors open a circuit
+breaker that skips the provider for a cooldown (doubling while it keeps failing)
+and then lets a single probe request through. A failed call fails over to the
+next provider immediately instead of sleeping on a 429.
+
+With LLM_HEDGE=1, a call that is still running after the provider's p95 latency
+gets a second, hedged request on the next provider; the first good answer wins.
+
+create_llm() returns a plain LLMProvider unless two or more providers are configured;
+get_llm() builds that client once per process, on first use rather than at import.
+"""
+import os
+import time
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from ai_provider import LLMProvider, NOT_SENT, POOL_SIZE
+import telemetry
+
+BREAKER_FAILURES = int(os.getenv("BREAKER_FAILURES", "3"))  # consecutive, to open
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))  # seconds, first opening
+BREAKER_MAX_COOLDOWN = 300.0
+MAX_ERROR_RATE = 0.5  # providers above this recent error rate move to the back
+ERROR_MIN_SAMPLES = 5  # recent outcomes needed before an error rate can demote a provider
+ERROR_WINDOW_SECONDS = 60.0  # outcomes older than this no longer count, so demotion expires
+HEDGE_MIN_SAMPLES = 20  # successful calls needed before a p95 is trusted
+WINDOW = 50  # recent outcomes kept per provider
+
+
+def _trips_breaker(status):
+    """Throttling, server errors and network failures; not bad prompts or odd content."""
+    return status is None or status == 429 or status >= 500
+
+
+class ProviderHealth:
+    """Latency / error bookkeeping and circuit breaker state of one provider."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=200)  # successful calls only
+        self.outcomes = deque(maxlen=WINDOW)  # (time, True = ok)
+        self.failures = 0  # consecutive breaker-worthy failures
+        self.open_until = 0.0
+        self.cooldown = BREAKER_COOLDOWN
+        self.probing = False
+
+    def state(self, now):
+        if self.open_until > now:
+            return "open"
+        return "half-open" if self.open_until else "closed"
+
+    def record(self, ok, now):
+        self.outcomes.append((now, ok))
+
+    def recent(self, now):
+        """Outcomes of the last ERROR_WINDOW_SECONDS (a demoted provider gets no calls: age clears it)."""
+        while self.outcomes and now - self.outcomes[0][0] > ERROR_WINDOW_SECONDS:
+            self.outcomes.popleft()
+        return [ok for _, ok in self.outcomes]
+
+    def error_rate(self, now=None):
+        recent = self.recent(time.monotonic() if now is None else now)
+        return recent.count(False) / len(recent) if recent else 0.0
+
+    def degraded(self, now):
+        """Demoted behind healthy providers: enough recent samples and too many failures."""
+        recent = self.recent(now)
+        return len(recent) >= ERROR_MIN_SAMPLES and recent.count(False) / len(recent) > MAX_ERROR_RATE
+
+    def p95(self):
+        if len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+
+class _Member:
+    def __init__(self, llm):
+        self.llm = llm
+        self.name = f"{llm.provider}/{llm.model}"
+        self.health = ProviderHealth()
+
+
+class ProviderRouter:
+    """
+    Drop-in for LLMProvider (generate, generate_stream, generate_many) over several
+    providers. `provider` / `model` name the first one, which callers use for
+    cache lookups and token budgets; `outcome["provider"]` ("provider/model")
+    names the one that actually answered.
+    """
+
+    def __init__(self, providers, hedge=False):
+        self.members = [_Member(p) for p in providers]
+        self.provider = self.members[0].llm.provider
+        self.model = self.members[0].llm.model
+        self.hedge = hedge
+        self._lock = threading.Lock()
+        self._pool = None
+
+    # ---------- Health ----------
+    def _candidates(self):
+        """Providers to try, in order: closed breakers (healthy first), then one half-open probe each."""
+        now = time.monotonic()
+        healthy, degraded = [], []
+        with self._lock:
+            for m in self.members:
+                state = m.health.state(now)
+                if state == "open":
+                    continue
+                if state == "half-open":
+                    if m.health.probing:
+                        continue
+                    m.health.probing = True
+                (degraded if m.health.degraded(now) else healthy).append(m)
+        return healthy + degraded
+
+    def _record(self, member, outcome, latency):
+        text, status = outcome.get("text"), outcome.get("status")
+        ok = isinstance(text, str) and bool(text.strip()) and not text.lstrip().startswith("⚠")
+        h = member.health
+        with self._lock:
+            h.probing = False
+            if status == NOT_SENT:
+                return ok  # refused locally (missing key, prompt too large): not the backend's fault
+            h.record(ok, time.monotonic())
+            if ok:
+                h.latencies.append(latency)
+                h.failures = 0
+                h.open_until = 0.0
+                h.cooldown = BREAKER_COOLDOWN
+            elif _trips_breaker(status):
+                h.failures += 1
+                if h.open_until or h.failures >= BREAKER_FAILURES:
+                    # failed probe or too many in a row: (re)open, backing off further each time
+                    if h.open_until:
+                        h.cooldown = min(h.cooldown * 2, BREAKER_MAX_COOLDOWN)
+                    h.open_until = time.monotonic() + h.cooldown
+                    telemetry.count(f"breaker_open.{member.name}")
+        return ok
+
+    def _release(self, member):
+        with self._lock:
+            member.health.probing = False
+
+    def snapshot(self):
+        """{provider/model: state, error rate, p95, calls} for logs and the run summary."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                m.name: {
+                    "state": m.health.state(now),
+                    "error_rate": m.health.error_rate(now),
+                    "p95_seconds": m.health.p95(),
+                    "recent_calls": len(m.health.recent(now)),
+                }
+                for m in self.members
+            }
+
+    def _unavailable(self):
+        waits = [m.health.open_until - time.monotonic() for m in self.members]
+        return (
+            "⚠ All LLM providers are unavailable (circuit open): "
+            + ", ".join(m.name for m in self.members)
+            + f" — next retry in {max(0.0, min(waits)):.0f}s"
+        )
+
+    # ---------- Blocking ----------
+    def _attempt(self, member, prompt):
+        outcome = {}
+        start = time.perf_counter()
+        try:
+            member.llm.generate(prompt, outcome=outcome)
+        except Exception as e:
+            outcome = {"text": f"⚠ {member.name} failed: {e}", "status": None}
+        outcome["provider"] = member.name
+        return self._record(member, outcome, time.perf_counter() - start), outcome
+
+    def _hedged(self, primary, candidates, prompt, p95):
+        """Primary first; if it outlives its p95, race it against the next candidate."""
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ThreadPoolExecutor(POOL_SIZE, thread_name_prefix="hedge")
+        first = self._pool.submit(self._attempt, primary, prompt)
+        if wait([first], timeout=p95).done:
+            return [first.result()]
+        telemetry.count("hedge")
+        second = self._pool.submit(self._attempt, candidates.pop(0), prompt)
+        results = []
+        pending = {first, second}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                ok, outcome = future.result()
+                if ok:
+                    if future is second:
+                        telemetry.count("hedge_won")
+                    return [(ok, outcome)]  # the loser finishes (and is recorded) in the background
+                results.append((ok, outcome))
+        return results
+
+    def generate(self, prompt: str, on_token=None, outcome: dict = None):
+        outcome = {} if outcome is None else outcome
+        if on_token is not None:
+            for piece in self.generate_stream(prompt, outcome):
+                on_token(piece)
+            return outcome["text"]
+
+        candidates = self._candidates()
+        last = None
+        try:
+            while candidates:
+                member = candidates.pop(0)
+                p95 = member.health.p95()
+                if self.hedge and candidates and p95:
+                    attempts = self._hedged(member, candidates, prompt, p95)
+                else:
+                    attempts = [self._attempt(member, prompt)]
+                for ok, result in attempts:
+                    if ok:
+                        outcome.update(result)
+                        return result["text"]
+                    last = result
+                if candidates:
+                    telemetry.count("failover")
+        finally:
+            for other in candidates:  # untried half-open probes go back
+                self._release(other)
+        last = last or {"text": self._unavailable(), "status": NOT_SENT}
+        outcome.update(last)
+        return last["text"]
+
+    # ---------- Streaming (fails over only until the first token arrives) ----------
+    def generate_stream(self, prompt: str, outcome: dict = None):
+        outcome = {} if outcome is None else outcome
+        candidates = self._candidates()
+        last = None
+        for n, member in enumerate(candidates):
+            inner = {}
+            start = time.perf_counter()
+            pieces = member.llm.generate_stream(prompt, inner)
+            first = next(pieces, "")
+            if first.lstrip().startswith("⚠") or not first:
+                for _ in pieces:  # an error before any token is the whole stream
+                    pass
+                self._record(member, inner, time.perf_counter() - start)
+                last = inner
+                if n + 1 < len(candidates):
+                    telemetry.count("failover")
+                continue
+            for other in candidates[n + 1:]:
+                self._release(other)
+            yield first
+            yield from pieces
+            self._record(member, inner, time.perf_counter() - start)
+            outcome.update(inner, provider=member.name)  # a mid-stream break is not retried
+            return
+        last = last or {"text": self._unavailable(), "status": NOT_SENT}
+        outcome.update(last)
+        yield last["text"]
+
+    # ---------- Async ----------
+    async def _aattempt(self, member, prompt, client):
+        import asyncio  # async path only; keeps it out of the CLI's cold start
+
+        outcome = {}
+        start = time.perf_counter()
+        try:
+            await member.llm.agenerate(prompt, client, outcome)
+        except asyncio.CancelledError:
+            self._release(member)  # lost a hedge race
+            raise
+        except Exception as e:
+            outcome = {"text": f"⚠ {member.name} failed: {e}", "status": None}
+        outcome["provider"] = member.name
+        return self._record(member, outcome, time.perf_counter() - start), outcome
+
+    async def agenerate(self, prompt: str, client, outcome: dict = None):
+        """Async generate() with the same failover and hedging, on one shared aiohttp session."""
+        import asyncio
+
+        outcome = {} if outcome is None else outcome
+        candidates = self._candidates()
+        last = None
+        try:
+            while candidates:
+                member = candidates.pop(0)
+                p95 = member.health.p95()
+                tasks = {asyncio.ensure_future(self._aattempt(member, prompt, client))}
+                if self.hedge and candidates and p95:
+                    done, _ = await asyncio.wait(tasks, timeout=p95)
+                    if not done:
+                        telemetry.count("hedge")
+                        tasks.add(asyncio.ensure_future(
+                            self._aattempt(candidates.pop(0), prompt, client)
+                        ))
+                while tasks:
+                    done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                    for task in done:
+                        ok, result = task.result()
+                        if ok:
+                            for loser in tasks:
+                                loser.cancel()  # aiohttp aborts the request
+                            if result["provider"] != member.name:
+                                telemetry.count("hedge_won")
+                            outcome.update(result)
+                            return result["text"]
+                        last = result
+                if candidates:
+                    telemetry.count("failover")
+        finally:
+            for other in candidates:
+                self._release(other)
+        last = last or {"text": self._unavailable(), "status": NOT_SENT}
+        outcome.update(last)
+        return last["text"]
+
+    # Same event-loop fan-out as a single provider; agenerate above does the routing
+    _async_client = LLMProvider._async_client
+    agenerate_many = LLMProvider.agenerate_many
+    generate_many = LLMProvider.generate_many
+
+
+def parse_providers(spec: str):
+    """"gemini:model-a,ollama:llama3:8b" → [("gemini", "model-a"), ("ollama", "llama3:8b")]."""
+    providers = []
+    for item in spec.split(","):
+        name, _, model = item.strip().partition(":")
+        if name:
+            providers.append((name.lower(), model or None))
+    return providers
+
+
+def create_llm():
+    """LLMProvider for a single provider, ProviderRouter when LLM_PROVIDERS lists several."""
+    providers = parse_providers(os.getenv("LLM_PROVIDERS", ""))
+    if len(providers) < 2:
+        if providers:
+            return LLMProvider(*providers[0])
+        return LLMProvider()
+    # no in-place 429 retries: the router fails over instead of sleeping
+    return ProviderRouter(
+        [LLMProvider(name, model, attempts=1) for name, model in providers],
+        hedge=os.getenv("LLM_HEDGE", "0") == "1",
+    )
+
+
+_llm = None
+_llm_lock = threading.Lock()
+
+
+def get_llm():
+    """The process-wide client from create_llm(), built on first use (never at import)."""
+    global _llm
+    if _llm is None:
+        with _llm_lock:
+            if _llm is None:
+                _llm = create_llm()
+    return _llm
@@ -0,0 +1,230 @@
+# rate_limiter.py
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+
+SHARED_LIMITER_PATH = os.path.join("reports", "rate_limits.sqlite")
+LLM_RPS = float(os.getenv("LLM_RPS", "2"))  # starting rate per provider + API key (0 = no limiter)
+LLM_MAX_RPS = float(os.getenv("LLM_MAX_RPS", "50"))
+MIN_RPS = 0.1
+RATE_STEP = 1.0  # additive increase: ~this many requests/s more per second of saturated traffic
+RATE_CUT = 0.5  # multiplicative decrease on a 429
+CUT_HOLDOFF = 1.0  # seconds between two rate cuts
+DEFAULT_RETRY_AFTER = 1.0  # first wait after a 429 without Retry-After, doubling per attempt
+
+
+class RateLimiter:
+    """Thread-safe pacing: at most `rate` acquisitions per second (rate <= 0 → unlimited)."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate and rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self):
+        """Claim the next slot; returns how long to wait for it."""
+        if not self.interval:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._next - now)
+            self._next = max(now, self._next) + self.interval
+        return wait
+
+    def acquire(self):
+        """Wait for a slot; returns the seconds waited."""
+        wait = self._reserve()
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    async def acquire_async(self):
+        """acquire() for event-loop code (LLMProvider.generate_many): waits without blocking."""
+        import asyncio  # imported here so the blocking path never loads it
+
+        wait = self._reserve()
+        if wait:
+            await asyncio.sleep(wait)
+        return wait
+
+
+def parse_retry_after(value):
+    """Seconds from a Retry-After header (delta-seconds or an HTTP date); None if absent/bad."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    from email.utils import parsedate_to_datetime
+
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class SharedRateLimiter:
+    """
+    Token bucket shared by every process using the same `key` (provider + API key),
+    kept in SQLite under reports/ so the CLI and the dashboard split one quota.
+
+    The rate adapts AIMD-style: each successful request made while the bucket is
+    empty adds RATE_STEP / rate, and a 429 halves it and blocks the bucket for
+    Retry-After seconds. 429s of requests that were already in flight when the
+    bucket got blocked do not cut again. A block cancels every reservation made
+    before it: callers that were queued take a new slot at the reduced rate, so
+    the bucket reopens with one request, not a burst. Same acquire() /
+    acquire_async() interface as RateLimiter.
+    """
+
+    def __init__(self, key, rate=LLM_RPS, max_rate=LLM_MAX_RPS, path=SHARED_LIMITER_PATH):
+        self.key = key
+        self.initial_rate = max(MIN_RPS, min(rate, max_rate))
+        self.max_rate = max_rate
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # autocommit; every update is an explicit BEGIN IMMEDIATE ... COMMIT
+        self._db = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=OFF")  # losing a bucket on power loss is harmless
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS buckets (
+                key TEXT PRIMARY KEY,
+                rate REAL NOT NULL,
+                tokens REAL NOT NULL,
+                updated REAL NOT NULL,
+                blocked_until REAL NOT NULL,
+                last_cut REAL NOT NULL
+            )"""
+        )
+
+    def _update(self, change):
+        """Run change(bucket, now) on the refilled bucket in one cross-process transaction."""
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()  # wall clock: comparable across processes
+                row = self._db.execute(
+                    "SELECT rate, tokens, updated, blocked_until, last_cut FROM buckets WHERE key = ?",
+                    (self.key,),
+                ).fetchone()
+                if row is None:
+                    row = (self.initial_rate, 1.0, now, 0.0, 0.0)
+                bucket = dict(zip(("rate", "tokens", "updated", "blocked_until", "last_cut"), row))
+                # refill; burst capacity is one second of traffic
+                elapsed = max(0.0, now - bucket["updated"])
+                bucket["tokens"] = min(
+                    max(1.0, bucket["rate"]), bucket["tokens"] + elapsed * bucket["rate"]
+                )
+                # never backwards: a block parks `updated` at its end so nothing refills meanwhile
+                bucket["updated"] = max(now, bucket["updated"])
+                value = change(bucket, now)
+                self._db.execute(
+                    "INSERT OR REPLACE INTO buckets VALUES (?, ?, ?, ?, ?, ?)",
+                    (self.key, bucket["rate"], bucket["tokens"], bucket["updated"],
+                     bucket["blocked_until"], bucket["last_cut"]),
+                )
+                self._db.execute("COMMIT")
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+        return value
+
+    def _reserve(self):
+        """Claim the next slot → (seconds to wait for it, blocked_until it was paced against)."""
+        def take(bucket, now):
+            # tokens may go negative: later callers queue behind earlier reservations,
+            # paced from the moment a block ends
+            bucket["tokens"] -= 1.0
+            opens = max(now, bucket["blocked_until"])
+            return opens - now + max(0.0, -bucket["tokens"] / bucket["rate"]), bucket["blocked_until"]
+
+        return self._update(take)
+
+    def _blocked_until(self):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT blocked_until FROM buckets WHERE key = ?", (self.key,)
+            ).fetchone()
+        return row[0] if row else 0.0
+
+    def acquire(self):
+        """Wait for a slot; returns the seconds waited."""
+        waited = 0.0
+        wait, seen = self._reserve()
+        while wait > 0:
+            time.sleep(wait)
+            waited += wait
+            if self._blocked_until() == seen:
+                break
+            # a 429 blocked the bucket while we slept and cancelled our slot
+            wait, seen = self._reserve()
+        return waited
+
+    async def acquire_async(self):
+        """acquire() for event-loop code; the SQLite transactions run off the loop."""
+        import asyncio
+
+        waited = 0.0
+        wait, seen = await asyncio.to_thread(self._reserve)
+        while wait > 0:
+            await asyncio.sleep(wait)
+            waited += wait
+            if await asyncio.to_thread(self._blocked_until) == seen:
+                break
+            wait, seen = await asyncio.to_thread(self._reserve)
+        return waited
+
+    def succeeded(self):
+        """Additive increase, only while the limiter (not the caller) is the bottleneck."""
+        def grow(bucket, now):
+            if bucket["tokens"] < 1.0:
+                bucket["rate"] = min(self.max_rate, bucket["rate"] + RATE_STEP / bucket["rate"])
+
+        self._update(grow)
+
+    def throttled(self, retry_after=None):
+        """
+        A 429: halve the rate and block every process until Retry-After has passed.
+        Returns the seconds until the bucket reopens.
+        """
+        def cut(bucket, now):
+            if now >= bucket["blocked_until"] and now - bucket["last_cut"] >= CUT_HOLDOFF:
+                bucket["rate"] = max(MIN_RPS, bucket["rate"] * RATE_CUT)
+                bucket["last_cut"] = now
+            if retry_after is not None and now + retry_after > bucket["blocked_until"]:
+                # queued callers notice the new block and reserve again: one slot
+                # when it ends, then the reduced rate
+                bucket["blocked_until"] = now + retry_after
+                bucket["updated"] = bucket["blocked_until"]
+                bucket["tokens"] = 1.0
+            else:
+                bucket["tokens"] = min(bucket["tokens"], 0.0)
+            return max(0.0, bucket["blocked_until"] - now)
+
+        return self._update(cut)
+
+    def rate(self):
+        return self._update(lambda bucket, now: bucket["rate"])
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+
+def shared_limiter(provider: str, api_key: str = None, base_url: str = ""):
+    """
+    The process-wide SharedRateLimiter for one provider account, or None when
+    LLM_RPS=0. Keyed by provider, endpoint and a hash of the API key (never the key itself).
+    """
+    if LLM_RPS <= 0:
+        return None
+    digest = hashlib.sha256((api_key or "").encode("utf-8")).hexdigest()[:16]
+    key = f"{provider}|{base_url}|{digest}"
+    with _shared_lock:
+        if key not in _shared:
+            _shared[key] = SharedRateLimiter(key)
+        return _shared[key]
@@ -1,5 +1,11 @@
 import stat, time, shutil
 import os
+import re
+import hashlib
+import subprocess
+
+CLONE_CACHE_DIR = os.path.join("repos", "cache")
+
 
 def handle_remove_readonly(func, path, exc_info):
     """Force delete read-only or locked files (Windows safe)."""
@@ -11,22 +17,83 @@ def handle_remove_readonly(func, path, exc_info):
     else:
         raise
 
-def clone_or_load_repo(repo_url, console):
-    repo_dir = os.path.join("repos", "current_repo")
-
-    if os.path.exists(repo_dir):
-        console.print("[yellow]⚠ Removing previous repo safely...[/yellow]")
-        for _ in range(3):  # Retry loop for Windows file locks
-            try:
-                shutil.rmtree(repo_dir, onerror=handle_remove_readonly)
-                break
-            except PermissionError:
-                console.print("[red]Repo still in use — retrying in 2s...[/red]")
-                time.sleep(2)
-        else:
-            raise RuntimeError("❌ Could not remove repo folder — try closing any Git tools")
-
-    # now clone fresh
-    os.system(f"git clone {repo_url} {repo_dir}")
+
+def remove_tree(path, console):
+    for _ in range(3):  # Retry loop for Windows file locks
+        try:
+            shutil.rmtree(path, onerror=handle_remove_readonly)
+            return
+        except PermissionError:
+            console.print("[red]Repo still in use — retrying in 2s...[/red]")
+            time.sleep(2)
+    raise RuntimeError("❌ Could not remove repo folder — try closing any Git tools")
+
+
+def _git(args, cwd=None):
+    result = subprocess.run(
+        ["git", *args], cwd=cwd, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"❌ git {args[0]} failed: {result.stderr.strip()[:500]}")
+    return result.stdout.strip()
+
+
+def cache_dir_for(repo_url: str) -> str:
+    """Stable clone location per URL, e.g. repos/cache/LegacyApp-1a2b3c4d5e6f."""
+    name = re.sub(r"\.git$", "", repo_url.rstrip("/").rsplit("/", 1)[-1]) or "repo"
+    name = re.sub(r"[^A-Za-z0-9_.-]", "_", name)
+    digest = hashlib.sha1(repo_url.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(CLONE_CACHE_DIR, f"{name}-{digest}")
+
+
+def _checkout(repo_dir, ref, depth, fetch=True):
+    depth_args = [f"--depth={depth}"] if depth else []
+    if ref:
+        _git(["fetch", "--prune", *depth_args, "origin", "--", ref], cwd=repo_dir)
+        target = "FETCH_HEAD"
+    else:
+        if fetch:
+            _git(["fetch", "--prune", *depth_args, "origin"], cwd=repo_dir)
+        target = "origin/HEAD"
+    _git(["checkout", "--force", "--detach", target, "--"], cwd=repo_dir)
+    _git(["clean", "-ffdx", "--quiet"], cwd=repo_dir)
+
+
+def clone_or_load_repo(repo_url, console, ref=None, depth=None, blobless=True):
+    """
+    Return a local path for `repo_url`.
+
+    - Local folders are used in place (nothing is copied).
+    - Remote URLs are cloned once into repos/cache/<name>-<hash>; later runs fetch
+      and check out `ref` (default: the remote HEAD) instead of re-cloning.
+    - `blobless` clones with --filter=blob:none; `depth` makes clone/fetch shallow.
+    """
+    if os.path.isdir(repo_url):
+        console.print(f"[green]✅ Using local folder in place: {repo_url}[/green]")
+        return os.path.abspath(repo_url)
+
+    repo_dir = cache_dir_for(repo_url)
+
+    if os.path.isdir(os.path.join(repo_dir, ".git")):
+        console.print(f"[cyan]♻ Updating cached clone {repo_dir}...[/cyan]")
+        try:
+            _checkout(repo_dir, ref, depth)
+            console.print(f"[green]✅ Repo ready at {repo_dir}[/green]")
+            return os.path.abspath(repo_dir)
+        except RuntimeError as e:
+            console.print(f"[yellow]⚠ Cached clone unusable ({e}) — cloning again...[/yellow]")
+            remove_tree(repo_dir, console)
+    elif os.path.exists(repo_dir):
+        remove_tree(repo_dir, console)
+
+    os.makedirs(CLONE_CACHE_DIR, exist_ok=True)
+    clone_args = ["clone", "--no-checkout"]
+    if blobless:
+        clone_args.append("--filter=blob:none")
+    if depth:
+        clone_args.append(f"--depth={depth}")
+    # "--": a URL or ref starting with "-" must never be read as a git option
+    _git([*clone_args, "--", repo_url, repo_dir])
+    _checkout(repo_dir, ref, depth, fetch=False)
     console.print(f"[green]✅ Repo cloned to {repo_dir}[/green]")
-    return os.path.abspath(repo_dir)
\ No newline at end of file
+    return os.path.abspath(repo_dir)
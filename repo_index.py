@@ -0,0 +1,174 @@
+# repo_index.py
+import os
+import json
+import fnmatch
+import hashlib
+
+MANIFEST_PATH = os.path.join("reports", "project_manifest.json")
+
+# Build output, package caches and VCS metadata never contain source worth analyzing.
+IGNORED_DIRS = {
+    ".git", ".svn", ".hg", ".vs", ".vscode", ".idea",
+    "bin", "obj", "packages", "node_modules", "__pycache__",
+}
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha1()
+    try:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    except OSError:
+        return ""
+    return h.hexdigest()
+
+
+def _read_gitignore(directory: str, rel_dir: str):
+    """Parse a .gitignore into (base_rel_dir, pattern, dir_only, anchored) rules."""
+    path = os.path.join(directory, ".gitignore")
+    rules = []
+    if not os.path.isfile(path):
+        return rules
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#") or line.startswith("!"):
+                continue  # negations are not supported — being conservative keeps files in
+            dir_only = line.endswith("/")
+            line = line.rstrip("/")
+            if line.startswith("**/"):
+                line = line[3:]
+            anchored = "/" in line
+            rules.append((rel_dir, line.lstrip("/"), dir_only, anchored))
+    return rules
+
+
+def _is_ignored(rel_path: str, is_dir: bool, rules) -> bool:
+    name = rel_path.rsplit("/", 1)[-1]
+    for base, pattern, dir_only, anchored in rules:
+        if dir_only and not is_dir:
+            continue
+        if base:
+            if not rel_path.startswith(base + "/"):
+                continue
+            local = rel_path[len(base) + 1:]
+        else:
+            local = rel_path
+        if anchored:
+            if fnmatch.fnmatchcase(local, pattern):
+                return True
+        elif fnmatch.fnmatchcase(name, pattern):
+            return True
+    return False
+
+
+def scan_repository(repo_path: str, respect_gitignore=True, with_hash=True, previous=None):
+    """
+    Walk the repository once, pruning IGNORED_DIRS and .gitignore'd paths.
+    Returns a list of file entries sorted by relative path:
+        {"path", "rel_path", "ext", "size", "mtime", "hash"}
+    rel_path always uses "/" separators.
+
+    `previous` is a manifest ({rel_path: {"hash", "size", "mtime"}}); files whose
+    size and mtime are unchanged reuse its hash instead of being re-read.
+    """
+    previous = previous or {}
+    repo_path = os.path.abspath(repo_path)
+    entries = []
+    rules_by_dir = {}
+
+    for root, dirs, files in os.walk(repo_path):
+        rel_root = os.path.relpath(root, repo_path).replace(os.sep, "/")
+        rel_root = "" if rel_root == "." else rel_root
+
+        rules = list(rules_by_dir.get(rel_root, []))
+        if respect_gitignore:
+            rules += _read_gitignore(root, rel_root)
+
+        kept = []
+        for d in sorted(dirs):
+            rel_dir = f"{rel_root}/{d}" if rel_root else d
+            if d.lower() in IGNORED_DIRS or _is_ignored(rel_dir, True, rules):
+                continue
+            kept.append(d)
+            rules_by_dir[rel_dir] = rules
+        dirs[:] = kept
+
+        for name in files:
+            rel_path = f"{rel_root}/{name}" if rel_root else name
+            if name == ".gitignore" or _is_ignored(rel_path, False, rules):
+                continue
+            abs_path = os.path.join(root, name)
+            try:
+                st = os.stat(abs_path)
+            except OSError:
+                continue
+            digest = ""
+            if with_hash:
+                known = previous.get(rel_path)
+                if known and known["size"] == st.st_size and known["mtime"] == st.st_mtime:
+                    digest = known["hash"]
+                else:
+                    digest = file_hash(abs_path)
+            entries.append(
+                {
+                    "path": abs_path,
+                    "rel_path": rel_path,
+                    "ext": os.path.splitext(name)[-1].lower(),
+                    "size": st.st_size,
+                    "mtime": st.st_mtime,
+                    "hash": digest,
+                }
+            )
+        rules_by_dir.pop(rel_root, None)
+
+    entries.sort(key=lambda e: e["rel_path"])
+    return entries
+
+
+def files_with_ext(index, *extensions):
+    exts = {e.lower() for e in extensions}
+    return [e for e in index if e["ext"] in exts]
+
+
+def index_revision(index) -> str:
+    """Content revision of a scanned tree: changes whenever a file is added, removed or edited."""
+    h = hashlib.sha1()
+    for e in index:
+        h.update(f"{e['rel_path']}\x00{e['hash'] or e['mtime']}\x00".encode("utf-8"))
+    return h.hexdigest()
+
+
+def load_manifest(repo_path: str, path=MANIFEST_PATH):
+    """Return the saved {rel_path: {"hash", "size", "mtime"}} for this repo, or {}."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("root") != os.path.abspath(repo_path):
+        return {}
+    return data.get("files", {})
+
+
+def save_manifest(repo_path: str, index, path=MANIFEST_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    files = {
+        e["rel_path"]: {"hash": e["hash"], "size": e["size"], "mtime": e["mtime"]}
+        for e in index
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"root": os.path.abspath(repo_path), "files": files}, f)
+
+
+def diff_manifest(manifest, index):
+    """Compare a saved manifest with a fresh index → {"added", "changed", "deleted"} sets."""
+    current = {e["rel_path"]: e["hash"] for e in index}
+    added = {p for p in current if p not in manifest}
+    changed = {
+        p for p, h in current.items()
+        if p in manifest and (not h or h != manifest[p]["hash"])
+    }
+    deleted = {p for p in manifest if p not in current}
+    return {"added": added, "changed": changed, "deleted": deleted}
@@ -1,17 +1,67 @@
-import os, datetime
+import os, json, datetime
 from rich.console import Console
+import telemetry
 
 
-def save_report(report):
-    console = Console()
-    os.makedirs("reports", exist_ok=True)
-    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_path = f"reports/refactor_report_{timestamp}.md"
+class ReportWriter:
+    """
+    Incremental report writer: every entry is appended to the Markdown report and
+    a JSONL sidecar as soon as it is written, so memory stays flat and a crashed
+    run still leaves a readable partial report.
+    """
+
+    def __init__(self, directory="reports", timestamp=None):
+        os.makedirs(directory, exist_ok=True)
+        timestamp = timestamp or datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.md_path = f"{directory}/refactor_report_{timestamp}.md"
+        self.jsonl_path = f"{directory}/refactor_report_{timestamp}.jsonl"
+        self.count = 0
+        self._md = open(self.md_path, "w", encoding="utf-8")
+        self._jsonl = open(self.jsonl_path, "w", encoding="utf-8")
+
+    def write(self, item):
+        self._md.write(f"### File: {item['file']}\n\n")
+        if item.get("clone_of"):
+            self._md.write(f"*Adapted from clone at {item['clone_of']} (no LLM call).*\n\n")
+        self._md.write("**VB.NET:**\n```vbnet\n" + item["vb"] + "\n```\n\n")
+        self._md.write("**C# (Suggested):**\n```csharp\n" + item["cs"] + "\n```\n\n---\n")
+        self._jsonl.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self._md.flush()
+        self._jsonl.flush()
+        self.count += 1
+
+    def write_summary(self, lines):
+        """Append a closing summary section (e.g. run statistics) to the Markdown report."""
+        self._md.write("\n## Summary\n\n" + "".join(f"- {line}\n" for line in lines))
+        self._md.flush()
+
+    def close(self):
+        if not self._md.closed:
+            self._md.close()
+            self._jsonl.close()
 
-    with open(file_path, "w", encoding="utf-8") as f:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def save_report(report, writer=None, summary=None):
+    """
+    Write report entries ({"file", "vb", "cs"}) from any iterable — a list or a
+    generator that yields results as they finish. Returns the Markdown path.
+    `summary`, if given, is called once the entries are written and returns the
+    lines of the closing summary section.
+    """
+    console = Console()
+    writer = writer or ReportWriter()
+    with writer:
         for item in report:
-            f.write(f"### File: {item['file']}\n\n")
-            f.write("**VB.NET:**\n```vbnet\n" + item["vb"] + "\n```\n\n")
-            f.write("**C# (Suggested):**\n```csharp\n" + item["cs"] + "\n```\n\n---\n")
+            with telemetry.timer("report.write"):
+                writer.write(item)
+        if summary:
+            writer.write_summary(summary())
 
-    console.print(f"[cyan]Report saved to:[/cyan] {file_path}")
+    console.print(f"[cyan]Report saved to:[/cyan] {writer.md_path}")
+    return writer.md_path
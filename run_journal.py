@@ -0,0 +1,118 @@
+# run_journal.py
+import os
+import json
+import hashlib
+import threading
+from collections import deque
+from translation_cache import is_cacheable
+
+JOURNAL_DIR = os.path.join("reports", "journals")
+
+
+def journal_path(repo: str, directory=JOURNAL_DIR) -> str:
+    """One journal per repo argument, so --resume finds the interrupted run."""
+    digest = hashlib.sha1(repo.encode("utf-8")).hexdigest()[:12]
+    return os.path.join(directory, f"run_{digest}.jsonl")
+
+
+def method_key(method) -> str:
+    return f"{method['file']}:{method.get('start', 0)}-{method.get('end', 0)}"
+
+
+class RunJournal:
+    """
+    Append-only JSONL record of finished translations for one run.
+    Each entry is identified by file + method span; on resume an entry is only
+    replayed if the method text at that span is unchanged. Failed translations
+    are not recorded, so they are retried.
+    """
+
+    def __init__(self, repo: str, resume=False, directory=JOURNAL_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = journal_path(repo, directory)
+        self.entries = {}
+        self._lock = threading.Lock()
+
+        if resume and os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line from a killed run
+                    self.entries[entry["key"]] = entry
+
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    def lookup(self, method):
+        entry = self.entries.get(method_key(method))
+        if entry and entry.get("vb") == method["code"]:
+            return entry
+        return None
+
+    def record(self, method, translation):
+        if not is_cacheable(translation):
+            return  # failed methods are retried on resume
+        entry = {
+            "key": method_key(method),
+            "file": method["file"],
+            "vb": method["code"],
+            "cs": translation,
+        }
+        with self._lock:
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+def resume_translations(methods, journal, translate, stats=None, on_replay=None):
+    """
+    Lazily yield report entries for `methods` in source order. Methods already in
+    the journal are replayed; the rest are streamed into translate(pending_methods),
+    which must yield entries in the order it was given. Every fresh translation
+    is journaled here, as it is consumed, so no progress callback can drop it.
+    `stats`, if given, counts {"replayed", "pending"} as methods arrive;
+    on_replay(entry) fires for every replayed entry.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(replayed=0, pending=0)
+    source = iter(methods)
+    order = deque()  # ("replay", entry) | ("fresh", method), in source order
+    fresh_queue = deque()
+
+    def advance():
+        method = next(source, None)
+        if method is None:
+            return False
+        entry = journal.lookup(method)
+        if entry is not None:
+            stats["replayed"] += 1
+            order.append(("replay", entry))
+        else:
+            stats["pending"] += 1
+            order.append(("fresh", method))
+            fresh_queue.append(method)
+        return True
+
+    def pending():
+        while True:
+            while not fresh_queue:
+                if not advance():
+                    return
+            yield fresh_queue.popleft()
+
+    fresh = iter(translate(pending()))
+    while order or advance():
+        kind, item = order.popleft()
+        if kind == "replay":
+            if on_replay:
+                on_replay(item)
+            yield {"file": item["file"], "vb": item["vb"], "cs": item["cs"]}
+        else:
+            entry = next(fresh)
+            journal.record(item, entry["cs"])
+            yield entry
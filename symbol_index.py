@@ -0,0 +1,232 @@
+# symbol_index.py
+import os
+import re
+import sqlite3
+import threading
+from vb_lexer import PARSER_VERSION, TYPE_KINDS
+
+SYMBOL_INDEX_PATH = os.path.join("reports", "symbol_index.sqlite")
+SYMBOL_CONTEXT_CHARS = int(os.getenv("SYMBOL_CONTEXT_CHARS", "1200"))
+COMMIT_EVERY = 64  # files per transaction while the parser streams updates
+
+# Names that look like calls but are language keywords or conversion intrinsics
+NOT_SYMBOLS = {
+    "if", "elseif", "while", "until", "for", "each", "in", "return", "new", "not",
+    "and", "or", "andalso", "orelse", "is", "isnot", "typeof", "gettype", "nameof",
+    "ctype", "directcast", "trycast", "cbool", "cbyte", "cchar", "cdate", "cdbl",
+    "cdec", "cint", "clng", "cobj", "csbyte", "cshort", "csng", "cstr", "cuint",
+    "culng", "cushort", "me", "mybase", "myclass", "call", "dim", "as", "of",
+    "sub", "function", "property", "get", "set", "then", "else", "select", "case",
+    "with", "using", "synclock", "throw", "try", "catch", "finally", "end",
+}
+# `Name(`, `.Name` or a bare `Call Name` — the places a VB.NET body references another member
+REFERENCE = re.compile(
+    r"(?:\.\s*|\bCall\s+)([A-Za-z_]\w*)|\b([A-Za-z_]\w*)\s*\(", re.IGNORECASE
+)
+STRING_LITERAL = re.compile(r'"[^"]*"')
+
+
+def referenced_names(code: str):
+    """Distinct member/type names a method body refers to, in first-use order (header skipped)."""
+    body = code.split("\n", 1)[1] if "\n" in code else ""
+    seen = {}
+    for m in REFERENCE.finditer(STRING_LITERAL.sub('""', body)):
+        name = m.group(1) or m.group(2)
+        if name.lower() not in NOT_SYMBOLS:
+            seen.setdefault(name, None)
+    return list(seen)
+
+
+def _signature(code: str) -> str:
+    return " ".join(code.split("\n", 1)[0].split())[:200]
+
+
+class SymbolIndex:
+    """
+    SQLite store of VB.NET declarations, Imports and member references for one repo.
+    Rows are replaced file by file (keyed by rel_path + content hash), so only
+    added or changed files are rewritten on later runs.
+    """
+
+    def __init__(self, repo_path: str, path=SYMBOL_INDEX_PATH):
+        self.root = os.path.abspath(repo_path)
+        self.path = path
+        self._lock = threading.Lock()
+        self._pending = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS files (rel_path TEXT PRIMARY KEY, hash TEXT);
+            CREATE TABLE IF NOT EXISTS symbols (
+                file TEXT, kind TEXT, name TEXT, namespace TEXT, container TEXT,
+                start_line INTEGER, end_line INTEGER, signature TEXT
+            );
+            CREATE TABLE IF NOT EXISTS imports (file TEXT, name TEXT);
+            CREATE TABLE IF NOT EXISTS refs (file TEXT, container TEXT, member TEXT, name TEXT);
+            CREATE INDEX IF NOT EXISTS idx_symbols_name ON symbols(name COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS idx_symbols_namespace ON symbols(namespace);
+            CREATE INDEX IF NOT EXISTS idx_symbols_file ON symbols(file);
+            CREATE INDEX IF NOT EXISTS idx_imports_name ON imports(name);
+            CREATE INDEX IF NOT EXISTS idx_imports_file ON imports(file);
+            CREATE INDEX IF NOT EXISTS idx_refs_name ON refs(name COLLATE NOCASE);
+            CREATE INDEX IF NOT EXISTS idx_refs_file ON refs(file);
+            """
+        )
+        meta = dict(self._db.execute("SELECT key, value FROM meta"))
+        if meta.get("root") != self.root or meta.get("version") != str(PARSER_VERSION):
+            # Another repo (or an older lexer) filled this file — start over
+            for table in ("files", "symbols", "imports", "refs"):
+                self._db.execute(f"DELETE FROM {table}")
+            self._db.executemany(
+                "INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                [("root", self.root), ("version", str(PARSER_VERSION))],
+            )
+        self._db.commit()
+        self._hashes = dict(self._db.execute("SELECT rel_path, hash FROM files"))
+
+    # ---- Updates ----
+    def needs_update(self, rel_path: str, digest: str) -> bool:
+        return not digest or self._hashes.get(rel_path) != digest
+
+    def _delete_file(self, rel_path):
+        for table in ("symbols", "imports", "refs"):
+            self._db.execute(f"DELETE FROM {table} WHERE file = ?", (rel_path,))
+        self._db.execute("DELETE FROM files WHERE rel_path = ?", (rel_path,))
+
+    def update_file(self, rel_path: str, digest: str, parsed, methods):
+        """Replace everything known about one file: `parsed` from vb_lexer, `methods` from vb_parser."""
+        signatures = {(m["start_line"], m["name"]): _signature(m["code"]) for m in methods}
+        symbols = [
+            (rel_path, t["kind"], t["name"], t["namespace"], t["container"],
+             t["start_line"], t["end_line"], f"{t['kind']} {t['name']}")
+            for t in parsed["types"]
+        ] + [
+            (rel_path, m["kind"], m["name"], m["namespace"], m["container"],
+             m["start_line"], m["end_line"],
+             signatures.get((m["start_line"], m["name"]), f"{m['kind']} {m['name']}"))
+            for m in parsed["members"]
+        ]
+        refs = [
+            (rel_path, m["container"], m["name"], name)
+            for m in methods
+            for name in referenced_names(m["code"])
+        ]
+        with self._lock:
+            self._delete_file(rel_path)
+            self._db.executemany("INSERT INTO symbols VALUES (?, ?, ?, ?, ?, ?, ?, ?)", symbols)
+            self._db.executemany(
+                "INSERT INTO imports VALUES (?, ?)",
+                [(rel_path, imp["name"]) for imp in parsed["imports"]],
+            )
+            self._db.executemany("INSERT INTO refs VALUES (?, ?, ?, ?)", refs)
+            self._db.execute("INSERT INTO files VALUES (?, ?)", (rel_path, digest))
+            self._hashes[rel_path] = digest
+            self._pending += 1
+            if self._pending >= COMMIT_EVERY:
+                self._db.commit()
+                self._pending = 0
+
+    def retain(self, rel_paths):
+        """Drop files that are no longer in the repo."""
+        keep = set(rel_paths)
+        with self._lock:
+            for rel_path in [p for p in self._hashes if p not in keep]:
+                self._delete_file(rel_path)
+                del self._hashes[rel_path]
+            self._db.commit()
+            self._pending = 0
+
+    def commit(self):
+        with self._lock:
+            self._db.commit()
+            self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._db.commit()
+            self._db.close()
+
+    # ---- Lookups ----
+    def _query(self, sql, args=()):
+        with self._lock:
+            return self._db.execute(sql, args).fetchall()
+
+    def find_symbols(self, name: str):
+        rows = self._query(
+            "SELECT file, kind, name, namespace, container, start_line, signature "
+            "FROM symbols WHERE name = ? COLLATE NOCASE",
+            (name,),
+        )
+        keys = ("file", "kind", "name", "namespace", "container", "start_line", "signature")
+        return [dict(zip(keys, r)) for r in rows]
+
+    def callers_of(self, name: str):
+        """Members whose body references `name` → [{"file", "container", "member"}]."""
+        rows = self._query(
+            "SELECT DISTINCT file, container, member FROM refs "
+            "WHERE name = ? COLLATE NOCASE ORDER BY file, container, member",
+            (name,),
+        )
+        return [{"file": f, "container": c, "member": m} for f, c, m in rows]
+
+    def types_in_namespace(self, namespace: str):
+        kinds = sorted(TYPE_KINDS)
+        rows = self._query(
+            f"SELECT name, kind, file FROM symbols WHERE namespace = ? "
+            f"AND kind IN ({', '.join('?' * len(kinds))}) ORDER BY name",
+            (namespace, *kinds),
+        )
+        return [{"name": n, "kind": k, "file": f} for n, k, f in rows]
+
+    def files_importing(self, name: str):
+        rows = self._query(
+            "SELECT DISTINCT file FROM imports WHERE name = ? ORDER BY file", (name,)
+        )
+        return [r[0] for r in rows]
+
+    def context_for(self, method, max_chars=None) -> str:
+        """
+        A short, bounded block of declarations relevant to `method` (a vb_parser record):
+        its file's Imports, its containing type and the signatures of members/types
+        it references. Returns "" when nothing is known or the budget is 0.
+        """
+        max_chars = SYMBOL_CONTEXT_CHARS if max_chars is None else max_chars
+        if max_chars <= 0:
+            return ""
+        rel_path = os.path.relpath(method["file"], self.root).replace(os.sep, "/")
+        lines = []
+        imports = [r[0] for r in self._query(
+            "SELECT name FROM imports WHERE file = ?", (rel_path,)
+        )]
+        if imports:
+            lines.append("Imports " + ", ".join(imports))
+        container = method.get("container")
+        if container:
+            owner = self._query(
+                "SELECT kind, namespace FROM symbols WHERE file = ? AND name = ? LIMIT 1",
+                (rel_path, container),
+            )
+            if owner:
+                kind, namespace = owner[0]
+                where = f" (Namespace {namespace})" if namespace else ""
+                lines.append(f"Member of {kind} {container}{where}")
+
+        for name in referenced_names(method["code"]):
+            if name == method.get("name"):
+                continue
+            defs = self.find_symbols(name)
+            # Same type first, then same file, then the rest of the project
+            defs.sort(key=lambda d: (d["container"] != container, d["file"] != rel_path, d["file"]))
+            for d in defs[:2]:
+                owner = f"{d['container']}." if d["container"] else ""
+                lines.append(f"{d['signature']}  ' {owner}{d['name']} in {d['file']}")
+
+        out, used = [], 0
+        for line in lines:
+            if used + len(line) + 1 > max_chars:
+                break
+            out.append(line)
+            used += len(line) + 1
+        return "\n".join(out)
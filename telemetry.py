@@ -0,0 +1,358 @@
+# telemetry.py
+"""
+In-process timing and LLM call metrics for one run.
+
+- span(name): coarse stage timings (clone, index, translate, ...), nested per thread.
+- timer(name) / timed_iter(name, it): cumulative time for hot paths such as
+  parsing or report writes that interleave with other stages.
+- llm_call(...): wraps one LLMProvider call (generate, generate_stream or
+  agenerate); providers call note_retry() and note_http_status() inside it.
+
+export() writes reports/run_summary.json and reports/metrics.prom (Prometheus
+text format, e.g. for node_exporter's textfile collector).
+"""
+import os
+import json
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+
+SUMMARY_PATH = os.path.join("reports", "run_summary.json")
+PROMETHEUS_PATH = os.path.join("reports", "metrics.prom")
+METRIC_PREFIX = "vbmigrate"
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+MAX_LATENCY_SAMPLES = 100_000  # raw samples kept for percentiles
+
+_lock = threading.Lock()
+_local = threading.local()
+# The call being made right now: a context variable, so it follows both worker
+# threads and asyncio tasks (generate_many runs many calls on one thread)
+_current_call = ContextVar("llm_call", default=None)
+_state = {}
+
+
+def reset():
+    """Start a fresh run (the dashboard calls this once per pipeline job)."""
+    with _lock:
+        _state.clear()
+        _state.update(
+            started=time.time(),
+            spans=[],
+            timers={},  # name → [seconds, count]
+            counters={},  # name → count (failovers, hedges, breaker openings, ...)
+            llm={},  # (provider, model, status) → aggregate dict
+            latencies=[],
+            first_tokens=[],  # time to first token of streamed calls
+            buckets={},  # (provider, model) → [count per LATENCY_BUCKETS + inf]
+        )
+
+
+reset()
+
+
+# ---- Stage spans ----
+@contextmanager
+def span(name: str, **attrs):
+    stack = getattr(_local, "spans", None)
+    if stack is None:
+        stack = _local.spans = []
+    path = "/".join([*stack, name])
+    stack.append(name)
+    start, wall = time.perf_counter(), time.time()
+    status = "ok"
+    try:
+        yield
+    except BaseException:
+        status = "error"
+        raise
+    finally:
+        stack.pop()
+        record = {
+            "name": path,
+            "start": wall,
+            "seconds": time.perf_counter() - start,
+            "thread": threading.current_thread().name,
+            "status": status,
+        }
+        if attrs:
+            record["attrs"] = attrs
+        with _lock:
+            _state["spans"].append(record)
+
+
+def add_time(name: str, seconds: float, count: int = 1):
+    with _lock:
+        total = _state["timers"].setdefault(name, [0.0, 0])
+        total[0] += seconds
+        total[1] += count
+
+
+def count(name: str, n: int = 1):
+    with _lock:
+        _state["counters"][name] = _state["counters"].get(name, 0) + n
+
+
+@contextmanager
+def timer(name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_time(name, time.perf_counter() - start)
+
+
+def timed_iter(name: str, iterable):
+    """Yield from `iterable`, charging the time spent producing each item to `name`."""
+    it = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(it)
+        except StopIteration:
+            add_time(name, time.perf_counter() - start, 0)
+            return
+        add_time(name, time.perf_counter() - start)
+        yield item
+
+
+# ---- LLM calls ----
+class _Call:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.retries = 0
+        self.backoff = 0.0
+        self.waited = 0.0  # rate-limiter waits between retries, not part of the latency
+        self.http_status = None
+
+
+def note_retry(backoff_seconds: float = 0.0):
+    """Called by a provider right before it waits and retries the current request."""
+    call = _current_call.get()
+    if call is not None:
+        call.retries += 1
+        call.backoff += backoff_seconds
+
+
+def note_wait(seconds: float):
+    """Called by a provider after it queued for a rate-limiter slot inside the call."""
+    call = _current_call.get()
+    if call is not None and seconds:
+        call.waited += seconds
+
+
+def note_http_status(status: int):
+    call = _current_call.get()
+    if call is not None:
+        call.http_status = status
+
+
+def http_status():
+    """Last HTTP status seen by the current call (None before any response)."""
+    call = _current_call.get()
+    return call.http_status if call is not None else None
+
+
+def note_first_token():
+    """Called by a streaming call when its first piece of text arrives."""
+    call = _current_call.get()
+    if call is not None:
+        with _lock:
+            if len(_state["first_tokens"]) < MAX_LATENCY_SAMPLES:
+                _state["first_tokens"].append(time.perf_counter() - call.start - call.waited)
+
+
+def _status(call, result, failed):
+    if failed:
+        return "exception"
+    if call.http_status and call.http_status >= 400:
+        return str(call.http_status)
+    if not isinstance(result, str) or result.lstrip().startswith("⚠"):
+        return "error"
+    return "ok"
+
+
+class _CallResult:
+    def __init__(self):
+        self.value = None
+
+    def set(self, value):
+        self.value = value
+
+
+@contextmanager
+def llm_call(provider: str, model: str, prompt: str):
+    """
+    with telemetry.llm_call(provider, model, prompt) as result:
+        result.set(do_request())
+    """
+    call = _Call()
+    token = _current_call.set(call)
+    result = _CallResult()
+    failed = False
+    try:
+        yield result
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        _current_call.reset(token)
+        latency = time.perf_counter() - call.start - call.waited
+        status = _status(call, result.value, failed)
+        response_chars = len(result.value) if isinstance(result.value, str) else 0
+        key = (provider, model or "", status)
+        with _lock:
+            agg = _state["llm"].setdefault(
+                key,
+                {"calls": 0, "seconds": 0.0, "prompt_chars": 0, "response_chars": 0,
+                 "retries": 0, "backoff_seconds": 0.0},
+            )
+            agg["calls"] += 1
+            agg["seconds"] += latency
+            agg["prompt_chars"] += len(prompt or "")
+            agg["response_chars"] += response_chars
+            agg["retries"] += call.retries
+            agg["backoff_seconds"] += call.backoff
+            if len(_state["latencies"]) < MAX_LATENCY_SAMPLES:
+                _state["latencies"].append(latency)
+            buckets = _state["buckets"].setdefault(
+                (provider, model or ""), [0] * (len(LATENCY_BUCKETS) + 1)
+            )
+            buckets[bisect_left(LATENCY_BUCKETS, latency)] += 1
+
+
+# ---- Export ----
+def _percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def summary():
+    with _lock:
+        spans = list(_state["spans"])
+        timers = {k: {"seconds": v[0], "count": v[1]} for k, v in _state["timers"].items()}
+        counters = dict(_state["counters"])
+        llm = {k: dict(v) for k, v in _state["llm"].items()}
+        latencies = sorted(_state["latencies"])
+        first_tokens = sorted(_state["first_tokens"])
+        started = _state["started"]
+
+    totals = {"calls": 0, "seconds": 0.0, "prompt_chars": 0, "response_chars": 0,
+              "retries": 0, "backoff_seconds": 0.0}
+    for agg in llm.values():
+        for k in totals:
+            totals[k] += agg[k]
+    stages = {}
+    for s in spans:
+        stages[s["name"]] = stages.get(s["name"], 0.0) + s["seconds"]
+    return {
+        "started": datetime.fromtimestamp(started).isoformat(),
+        "elapsed_seconds": time.time() - started,
+        "stages": stages,
+        "spans": spans,
+        "timers": timers,
+        "events": counters,
+        "llm": {
+            **totals,
+            "latency_p50": _percentile(latencies, 50),
+            "latency_p95": _percentile(latencies, 95),
+            "latency_p99": _percentile(latencies, 99),
+            "streamed_calls": len(first_tokens),
+            "first_token_seconds": sum(first_tokens),
+            "first_token_p50": _percentile(first_tokens, 50),
+            "first_token_p99": _percentile(first_tokens, 99),
+            "by_status": [
+                {"provider": p, "model": m, "status": st, **agg}
+                for (p, m, st), agg in sorted(llm.items())
+            ],
+        },
+    }
+
+
+def _labels(**labels):
+    return "{" + ",".join(
+        f'{k}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+        for k, v in labels.items()
+    ) + "}"
+
+
+def prometheus_text(data=None):
+    data = data or summary()
+    p = METRIC_PREFIX
+    lines = [
+        f"# HELP {p}_stage_seconds Wall time of each pipeline stage in the last run.",
+        f"# TYPE {p}_stage_seconds gauge",
+    ]
+    lines += [f"{p}_stage_seconds{_labels(stage=k)} {v:.6f}" for k, v in data["stages"].items()]
+    lines += [
+        f"# HELP {p}_timer_seconds_total Cumulative time spent in interleaved hot paths.",
+        f"# TYPE {p}_timer_seconds_total counter",
+    ]
+    lines += [
+        f"{p}_timer_seconds_total{_labels(name=k)} {v['seconds']:.6f}"
+        for k, v in data["timers"].items()
+    ]
+    lines += [
+        f"# HELP {p}_events_total Router events: failovers, hedged requests, breaker openings.",
+        f"# TYPE {p}_events_total counter",
+    ]
+    lines += [f"{p}_events_total{_labels(name=k)} {v}" for k, v in data["events"].items()]
+    counters = {
+        "llm_calls_total": ("calls", "LLM requests made through LLMProvider.generate."),
+        "llm_retries_total": ("retries", "HTTP retries performed by providers."),
+        "llm_backoff_seconds_total": ("backoff_seconds", "Time slept before retries."),
+        "llm_prompt_chars_total": ("prompt_chars", "Characters sent in prompts."),
+        "llm_response_chars_total": ("response_chars", "Characters received in responses."),
+        "llm_seconds_total": ("seconds", "Time spent waiting on LLM calls."),
+    }
+    for metric, (field, help_text) in counters.items():
+        lines += [f"# HELP {p}_{metric} {help_text}", f"# TYPE {p}_{metric} counter"]
+        for row in data["llm"]["by_status"]:
+            labels = _labels(provider=row["provider"], model=row["model"], status=row["status"])
+            lines.append(f"{p}_{metric}{labels} {row[field]}")
+
+    if data["llm"]["streamed_calls"]:
+        lines += [
+            f"# HELP {p}_llm_first_token_seconds Time to first token of streamed LLM calls.",
+            f"# TYPE {p}_llm_first_token_seconds summary",
+            f'{p}_llm_first_token_seconds{{quantile="0.5"}} {data["llm"]["first_token_p50"]:.6f}',
+            f'{p}_llm_first_token_seconds{{quantile="0.99"}} {data["llm"]["first_token_p99"]:.6f}',
+            f"{p}_llm_first_token_seconds_sum {data['llm']['first_token_seconds']:.6f}",
+            f"{p}_llm_first_token_seconds_count {data['llm']['streamed_calls']}",
+        ]
+    with _lock:
+        buckets = {k: list(v) for k, v in _state["buckets"].items()}
+    lines += [
+        f"# HELP {p}_llm_latency_seconds Latency of LLM calls, retries included.",
+        f"# TYPE {p}_llm_latency_seconds histogram",
+    ]
+    for (provider, model), counts in sorted(buckets.items()):
+        seconds = sum(
+            row["seconds"] for row in data["llm"]["by_status"]
+            if row["provider"] == provider and row["model"] == model
+        )
+        cumulative = 0
+        for bound, count in zip([*LATENCY_BUCKETS, "+Inf"], counts):
+            cumulative += count
+            labels = _labels(provider=provider, model=model, le=bound)
+            lines.append(f"{p}_llm_latency_seconds_bucket{labels} {cumulative}")
+        labels = _labels(provider=provider, model=model)
+        lines.append(f"{p}_llm_latency_seconds_sum{labels} {seconds:.6f}")
+        lines.append(f"{p}_llm_latency_seconds_count{labels} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def export(summary_path=SUMMARY_PATH, prometheus_path=PROMETHEUS_PATH):
+    """Write the JSON run summary and the Prometheus text file; returns the summary."""
+    data = summary()
+    os.makedirs(os.path.dirname(summary_path) or ".", exist_ok=True)
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    tmp = prometheus_path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(prometheus_text(data))
+    os.replace(tmp, prometheus_path)  # textfile collectors must never see a partial file
+    return data
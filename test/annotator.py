@@ -1,6 +1,8 @@
 import sys, os
 from dotenv import load_dotenv
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+# API keys come from the project's .env; nothing loads it at import time any more
+load_dotenv(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ".env"))
 
 from agents.annotator_agent import summarize_file
 model = os.getenv("MODEL")
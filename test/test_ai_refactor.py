@@ -0,0 +1,81 @@
+# test/test_ai_refactor.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_refactor
+from provider_router import ProviderRouter
+from translation_cache import TranslationCache
+
+VB = "Sub Hello()\n    Console.WriteLine(1)\nEnd Sub"
+
+
+class FakeLLM:
+    def __init__(self, provider, failures=0):
+        self.provider = provider
+        self.model = f"{provider}-model"
+        self.failures = failures
+
+    def generate(self, prompt, on_token=None, outcome=None):
+        if self.failures:
+            self.failures -= 1
+            text, status = "⚠ overloaded", 503
+        else:
+            text, status = f"// C# from {self.provider}", 200
+        outcome.update(text=text, status=status)
+        return text
+
+
+def test_failover_answers_are_not_cached_as_the_primary(tmp_path, monkeypatch):
+    router = ProviderRouter([FakeLLM("a", failures=1), FakeLLM("b")])
+    cache = TranslationCache(path=str(tmp_path / "cache.sqlite"))
+    monkeypatch.setattr(ai_refactor, "get_llm", lambda: router)
+    monkeypatch.setattr(ai_refactor, "get_translation_cache", lambda: cache)
+
+    assert ai_refactor.translate_vb_to_csharp(VB) == "// C# from b"
+    assert cache.get(ai_refactor._cache_key(VB, answered_by=("b", "b-model"))) == "// C# from b"
+    # the primary's key stays empty: the next run asks the primary again
+    assert ai_refactor.translate_vb_to_csharp(VB) == "// C# from a"
+    assert ai_refactor.translate_vb_to_csharp(VB) == "// C# from a"
+    assert cache.stats()["hits"] == 2  # the lookup above and the last call
+
+
+class FakeAsyncLLM:
+    provider, model = "fake", "fake-model"
+
+    def __init__(self, delay):
+        self.delay = delay
+        self.in_flight = self.peak = self.calls = 0
+
+    def _async_client(self, concurrency):
+        class Client:
+            async def close(self):
+                pass
+
+        return Client()
+
+    async def agenerate(self, prompt, client, outcome=None):
+        import asyncio
+
+        self.calls += 1
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        await asyncio.sleep(self.delay)
+        self.in_flight -= 1
+        outcome.update(text="// part", status=200)
+        return "// part"
+
+
+def test_async_translator_sends_chunks_of_large_methods_concurrently(monkeypatch):
+    llm = FakeAsyncLLM(delay=0.2)
+    monkeypatch.setattr(ai_refactor, "get_llm", lambda: llm)
+    monkeypatch.setattr(ai_refactor, "translation_token_limit", lambda: 60)
+    body = "\n".join(f"    total = total + Compute({i}) * {i}" for i in range(40))
+    big = f"Sub Big()\n    Dim total = 0\n{body}\nEnd Sub"
+
+    with ai_refactor.async_translator(concurrency=4, use_cache=False) as submit:
+        [translation] = submit([big]).result()
+
+    assert llm.calls > 4 and translation.count("// part") == llm.calls
+    assert llm.peak == 4  # parts in parallel, capped by the concurrency
@@ -0,0 +1,63 @@
+# test/test_clone_detector.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from clone_detector import dedupe_translations
+from translation_engine import translate_methods
+
+
+def _method(i, name, var):
+    code = f"Sub {name}()\n    Dim {var} = {i}\n    Console.WriteLine({var})\nEnd Sub"
+    return {"file": f"F{i}.vb", "start_line": 1, "code": code}
+
+
+def test_unadaptable_clones_are_retranslated_concurrently_in_order():
+    methods = [_method(1, "First", "a")] + [_method(i, f"Copy{i}", f"v{i}") for i in range(2, 10)]
+    retranslated = []
+
+    def translate(code):
+        return "void Renamed() { }"  # no identifiers left to substitute: clones cannot adapt
+
+    def retranslate(method):
+        time.sleep(0.2)
+        retranslated.append(method["file"])
+        return f"// retranslated {method['file']}"
+
+    stats = {}
+    start = time.perf_counter()
+    entries = list(
+        dedupe_translations(
+            methods,
+            lambda pending: translate_methods(pending, translate, concurrency=4),
+            retranslate,
+            stats=stats,
+            concurrency=8,
+        )
+    )
+    elapsed = time.perf_counter() - start
+
+    assert [e["file"] for e in entries] == [m["file"] for m in methods]
+    assert entries[0]["cs"] == "void Renamed() { }"
+    assert [e["cs"] for e in entries[1:]] == [f"// retranslated F{i}.vb" for i in range(2, 10)]
+    assert stats == {"families": 1, "adapted": 0, "retranslated": 8}
+    assert elapsed < 0.2 * 8 / 2  # eight 0.2 s retranslations overlapped, not run one by one
+
+
+def test_adaptable_clones_skip_the_llm():
+    methods = [_method(1, "First", "a"), _method(2, "Second", "b")]
+
+    def translate(code):
+        return "void First() { var a = 1; Console.WriteLine(a); }"
+
+    entries = list(
+        dedupe_translations(
+            methods,
+            lambda pending: translate_methods(pending, translate, concurrency=2),
+            retranslate=lambda m: "unused",
+        )
+    )
+    assert entries[1]["cs"] == "void Second() { var b = 2; Console.WriteLine(b); }"
+    assert entries[1]["clone_of"] == "F1.vb:1"
@@ -0,0 +1,33 @@
+# test/test_jobs.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jobs
+
+
+def _wait(job):
+    while job.running or job.finished is None:
+        time.sleep(0.01)
+
+
+def test_finished_jobs_leave_the_registry():
+    job = jobs.start_job("quick", lambda job: {"answer": 42})
+    _wait(job)
+    assert jobs.get_job(job.id) is job and job.result == {"answer": 42}
+    jobs.forget_job(job.id)
+    assert jobs.get_job(job.id) is None
+
+    stale = jobs.start_job("uncollected", lambda job: None)
+    _wait(stale)
+    stale.finished -= jobs.JOB_TTL + 1
+    assert jobs.get_job(stale.id) is None
+
+
+def test_running_jobs_are_kept():
+    job = jobs.start_job("slow", lambda job: time.sleep(0.2))
+    jobs.forget_job(job.id)
+    assert jobs.get_job(job.id) is job
+    _wait(job)
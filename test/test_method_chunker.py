@@ -0,0 +1,35 @@
+# test/test_method_chunker.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from method_chunker import split_statements
+
+
+def test_apostrophe_in_string_does_not_break_continuation():
+    code = (
+        "Sub M()\n"
+        "    Dim s = \"it's\" & _\n"
+        "        \"more\"\n"
+        "    If x Then ' comment\n"
+        "        y = 1\n"
+        "    End If\n"
+        "End Sub"
+    )
+    assert split_statements(code) == [
+        ("Sub M()", 0),
+        ("    Dim s = \"it's\" & _\n        \"more\"", 0),
+        ("    If x Then ' comment", 0),
+        ("        y = 1", 1),
+        ("    End If", 0),
+        ("End Sub", 0),
+    ]
+
+
+def test_dangling_continuation_keeps_the_last_lines():
+    code = "Sub M()\n    x = 1 + _\n        2 _"
+    assert split_statements(code) == [
+        ("Sub M()", 0),
+        ("    x = 1 + _\n        2 _", 0),
+    ]
@@ -0,0 +1,52 @@
+# test/test_provider_router.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import provider_router
+from provider_router import ProviderRouter
+
+
+class FakeLLM:
+    def __init__(self, provider, failures=0, status=429):
+        self.provider = provider
+        self.model = f"{provider}-model"
+        self.failures = failures
+        self.status = status
+        self.calls = 0
+
+    def generate(self, prompt, on_token=None, outcome=None):
+        self.calls += 1
+        if self.failures:
+            self.failures -= 1
+            text, status = f"⚠ {self.provider} error", self.status
+        else:
+            text, status = f"answer from {self.provider}", 200
+        outcome.update(text=text, status=status)
+        return text
+
+
+def test_one_transient_error_does_not_demote_the_primary():
+    a, b = FakeLLM("a", failures=1), FakeLLM("b")
+    router = ProviderRouter([a, b])
+    assert router.generate("p") == "answer from b"
+    for _ in range(6):
+        assert router.generate("p") == "answer from a"
+    assert a.calls == 7
+
+
+def test_demotion_expires():
+    # 400s: counted in the error rate, but they do not open the circuit breaker
+    a, b = FakeLLM("a", failures=provider_router.ERROR_MIN_SAMPLES, status=400), FakeLLM("b")
+    router = ProviderRouter([a, b])
+    for _ in range(provider_router.ERROR_MIN_SAMPLES):
+        router.generate("p")
+    assert router.generate("p") == "answer from b"  # demoted behind the healthy fallback
+
+    health = router.members[0].health
+    health.outcomes = type(health.outcomes)(
+        ((t - provider_router.ERROR_WINDOW_SECONDS - 1, ok) for t, ok in health.outcomes),
+        maxlen=health.outcomes.maxlen,
+    )
+    assert router.generate("p") == "answer from a"
@@ -0,0 +1,96 @@
+# test/test_rate_limiter.py
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from email.utils import formatdate
+
+import rate_limiter
+from rate_limiter import SharedRateLimiter, parse_retry_after
+
+
+def _limiter(tmp_path, rate=2, max_rate=50, key="k"):
+    return SharedRateLimiter(key, rate=rate, max_rate=max_rate, path=str(tmp_path / "rl.sqlite"))
+
+
+def test_additive_increase_only_while_saturated(tmp_path):
+    limiter = _limiter(tmp_path, rate=2)
+    limiter.succeeded()  # bucket still full: the caller, not the limiter, is the bottleneck
+    assert limiter.rate() == 2
+    limiter.acquire()  # takes the only token
+    limiter.succeeded()
+    assert limiter.rate() == 2 + rate_limiter.RATE_STEP / 2
+
+
+def test_increase_is_capped(tmp_path):
+    limiter = _limiter(tmp_path, rate=4, max_rate=4.2)
+    limiter.acquire()
+    limiter.acquire()
+    limiter.succeeded()
+    assert limiter.rate() == 4.2
+
+
+def test_429_halves_the_rate_once_per_block(tmp_path):
+    limiter = _limiter(tmp_path, rate=8)
+    assert 0.9 < limiter.throttled(1.0) <= 1.0
+    assert limiter.rate() == 8 * rate_limiter.RATE_CUT
+    # 429s of requests that were already in flight do not cut again
+    limiter.throttled(1.0)
+    limiter.throttled(None)
+    assert limiter.rate() == 8 * rate_limiter.RATE_CUT
+
+
+def test_rate_never_drops_below_the_floor(tmp_path, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "CUT_HOLDOFF", 0.0)
+    limiter = _limiter(tmp_path, rate=0.15)
+    limiter.throttled(None)
+    limiter.throttled(None)
+    assert limiter.rate() == rate_limiter.MIN_RPS
+
+
+def test_retry_after_blocks_every_process(tmp_path):
+    first = _limiter(tmp_path, rate=50)
+    second = _limiter(tmp_path, rate=50)  # another process on the same account
+    other = _limiter(tmp_path, rate=50, key="other")  # another account
+    first.throttled(0.5)
+    assert second.rate() == 25
+    start = time.monotonic()
+    other.acquire()
+    assert time.monotonic() - start < 0.1
+    second.acquire()
+    assert 0.45 <= time.monotonic() - start < 0.8
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert 8 <= parse_retry_after(formatdate(time.time() + 10, usegmt=True)) <= 10
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("soon") is None
+
+
+def test_queued_callers_are_paced_after_a_block(tmp_path):
+    limiter = _limiter(tmp_path, rate=10)
+    start = time.monotonic()
+    released = []
+
+    def call():
+        limiter.acquire()
+        released.append(time.monotonic() - start)
+
+    threads = [threading.Thread(target=call) for _ in range(12)]
+    for t in threads:
+        t.start()
+    time.sleep(0.35)
+    limiter.throttled(1.0)  # rate 10 → 5, blocked until ~1.35 s
+    for t in threads:
+        t.join()
+
+    after = sorted(r for r in released if r > 0.4)
+    assert after, released
+    assert after[0] >= 1.3
+    gaps = [b - a for a, b in zip(after, after[1:])]
+    assert min(gaps) >= 0.15, after  # 1 / 5 rps, not one burst when the block ends
@@ -0,0 +1,54 @@
+# test/test_repo_index.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from repo_index import scan_repository
+
+
+def _write(root, rel_path, text="x"):
+    path = root / rel_path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text)
+
+
+def test_gitignore_rules(tmp_path):
+    _write(tmp_path, ".gitignore", "# comment\n*.bak\n/build/\nlogs/\n**/Temp\n!keep.bak\n")
+    _write(tmp_path, "src/.gitignore", "Generated/*.vb\n")
+    for rel_path in [
+        "Main.vb",
+        "old.bak",  # *.bak anywhere
+        "keep.bak",  # negations are not supported: stays ignored
+        "build/Out.vb",  # /build/ only at the root ...
+        "src/build/Kept.vb",  # ... not below it
+        "logs/today.vb",  # dir-only rule
+        "src/logs",  # a file called logs is kept
+        "src/a/Temp/T.vb",  # **/Temp at any depth
+        "src/Generated/Form.vb",  # nested .gitignore, relative to its folder
+        "src/Generated/Form.resx",
+        "Generated/Root.vb",  # the nested rule does not apply outside src/
+        "bin/Debug/App.vb",  # always-ignored build output
+        "src/obj/App.vb",
+    ]:
+        _write(tmp_path, rel_path)
+
+    kept = [e["rel_path"] for e in scan_repository(str(tmp_path))]
+    assert sorted(kept) == [
+        "Generated/Root.vb",
+        "Main.vb",
+        "src/Generated/Form.resx",
+        "src/build/Kept.vb",
+        "src/logs",
+    ]
+    unfiltered = [e["rel_path"] for e in scan_repository(str(tmp_path), respect_gitignore=False)]
+    assert "old.bak" in unfiltered and "bin/Debug/App.vb" not in unfiltered
+
+
+def test_unchanged_files_reuse_the_manifest_hash(tmp_path):
+    _write(tmp_path, "A.vb", "Module A\nEnd Module\n")
+    [entry] = scan_repository(str(tmp_path))
+    previous = {"A.vb": {"hash": "cached", "size": entry["size"], "mtime": entry["mtime"]}}
+    assert scan_repository(str(tmp_path), previous=previous)[0]["hash"] == "cached"
+    previous["A.vb"]["size"] += 1
+    assert scan_repository(str(tmp_path), previous=previous)[0]["hash"] == entry["hash"]
@@ -0,0 +1,48 @@
+# test/test_run_journal.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from run_journal import RunJournal, resume_translations
+from translation_engine import translate_methods
+
+
+def _run(directory, methods, resume, calls, replayed, stats):
+    def translate(code):
+        calls.append(code)
+        return f"// C# for {code.splitlines()[0]}"
+
+    def translate_pending(pending):
+        # a slow progress callback used to let journal entries slip through
+        return translate_methods(
+            pending, translate, concurrency=8, on_progress=lambda m, t: time.sleep(0.001)
+        )
+
+    journal = RunJournal("repo", resume=resume, directory=directory)
+    try:
+        return list(
+            resume_translations(
+                methods, journal, translate_pending, stats=stats, on_replay=replayed.append
+            )
+        )
+    finally:
+        journal.close()
+
+
+def test_resume_after_complete_run_replays_every_method(tmp_path):
+    methods = [
+        {"file": f"F{i % 7}.vb", "start": i, "end": i + 1, "code": f"Sub M{i}()\nEnd Sub"}
+        for i in range(101)
+    ]
+    calls, replayed, stats = [], [], {}
+    first = _run(str(tmp_path), methods, False, calls, replayed, stats)
+    assert len(calls) == 101
+
+    calls, replayed, stats = [], [], {}
+    second = _run(str(tmp_path), methods, True, calls, replayed, stats)
+    assert calls == []
+    assert len(replayed) == 101
+    assert stats == {"replayed": 101, "pending": 0}
+    assert second == first
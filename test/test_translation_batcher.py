@@ -0,0 +1,63 @@
+# test/test_translation_batcher.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ai_refactor
+from translation_batcher import build_batch_prompt, pack_batches, split_batch_response
+
+CODES = [f"Sub M{i}()\n    Console.WriteLine({i})\nEnd Sub" for i in range(1, 4)]
+
+
+def test_prompt_wraps_every_method_in_numbered_markers():
+    prompt = build_batch_prompt(CODES, context="Imports System")
+    assert prompt.startswith("Declarations from the rest of the project")
+    for i, code in enumerate(CODES, 1):
+        assert f"<<<VB {i}>>>\n{code}\n<<<END VB {i}>>>" in prompt
+
+
+def test_response_is_split_on_cs_markers():
+    response = (
+        "Sure! Here they are.\n"
+        "<<<CS 2>>>\nvoid M2() { }\n<<<END CS 2>>>\n"
+        "<<<CS 1>>>\nvoid M1() { }\n<<<END CS 1>>>\n"
+        "<<<CS 3>>>\n<<<END CS 3>>>\n"  # empty: counts as missing
+        "<<<CS 9>>>void M9() { }<<<END CS 9>>>"  # out of range: ignored
+    )
+    assert split_batch_response(response, 3) == ["void M1() { }", "void M2() { }", None]
+    assert split_batch_response("⚠ Gemini network error", 3) == [None, None, None]
+    assert split_batch_response(None, 2) == [None, None]
+
+
+def test_packing_keeps_order_and_sends_large_methods_alone():
+    small = [{"code": "x" * 40} for _ in range(5)]  # ~10 tokens each
+    large = {"code": "y" * 400}
+    batches = list(pack_batches(small[:3] + [large] + small[3:], budget=25))
+    assert batches == [small[:2], [small[2]], [large], small[3:]]
+
+
+class FakeLLM:
+    provider, model = "fake", "fake-model"
+
+    def __init__(self):
+        self.prompts = []
+
+    def generate(self, prompt, on_token=None, outcome=None):
+        self.prompts.append(prompt)
+        if "<<<VB" in prompt:  # batch: the model forgets method 2
+            text = "<<<CS 1>>>void M1() { }<<<END CS 1>>>\n<<<CS 3>>>void M3() { }<<<END CS 3>>>"
+        else:
+            text = "void M2() { }"
+        outcome.update(text=text, status=200)
+        return text
+
+
+def test_methods_missing_from_the_answer_are_retried_alone(monkeypatch):
+    llm = FakeLLM()
+    monkeypatch.setattr(ai_refactor, "get_llm", lambda: llm)
+    assert ai_refactor.translate_vb_batch(CODES, use_cache=False) == [
+        "void M1() { }", "void M2() { }", "void M3() { }"
+    ]
+    assert len(llm.prompts) == 2
+    assert CODES[1] in llm.prompts[1] and "<<<VB" not in llm.prompts[1]
@@ -0,0 +1,49 @@
+# test/test_translation_cache.py
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translation_cache import TranslationCache, cache_key
+
+VB = "Sub Hello()\n    Console.WriteLine(1)\nEnd Sub"
+PROMPT = "Convert this VB.NET code to idiomatic C#:\n\n{vb_code}"
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = TranslationCache(path=str(tmp_path / "c.sqlite"), max_bytes=300)
+    for name in ("a", "b", "c"):
+        cache.put(name, name * 100)
+        time.sleep(0.01)
+    assert cache.get("a") == "a" * 100  # a is now the most recently used
+    time.sleep(0.01)
+    cache.put("d", "d" * 100)  # 400 bytes > 300: drop down to 270
+
+    assert cache.get("b") is None and cache.get("c") is None
+    assert cache.get("a") == "a" * 100 and cache.get("d") == "d" * 100
+
+    reopened = TranslationCache(path=str(tmp_path / "c.sqlite"), max_bytes=300)
+    assert reopened._total == 200  # the size budget survives a restart
+
+
+def test_failures_are_never_stored(tmp_path):
+    cache = TranslationCache(path=str(tmp_path / "c.sqlite"))
+    for i, text in enumerate(
+        ["⚠ Gemini network error: timeout", "// Translation failed: boom", "  ", None]
+    ):
+        cache.put(str(i), text)
+        assert cache.get(str(i)) is None
+    cache.put("ok", "void Hello() { }")
+    assert cache.get("ok") == "void Hello() { }"
+
+
+def test_key_covers_code_provider_model_and_prompt():
+    key = cache_key(VB, "gemini", "gemini-2.0-flash-lite", PROMPT)
+    # cosmetic edits to the VB.NET source still hit
+    reformatted = "  " + VB.replace("\n", "\n\n") + "  \n"
+    assert cache_key(reformatted, "gemini", "gemini-2.0-flash-lite", PROMPT) == key
+    assert cache_key(VB, "gemini", "gemini-1.5-pro", PROMPT) != key
+    assert cache_key(VB, "openrouter", "gemini-2.0-flash-lite", PROMPT) != key
+    assert cache_key(VB, "gemini", "gemini-2.0-flash-lite", PROMPT + "\nUse C# 12.") != key
+    assert cache_key(VB.replace("1", "2"), "gemini", "gemini-2.0-flash-lite", PROMPT) != key
@@ -0,0 +1,67 @@
+# test/test_translation_engine.py
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from translation_engine import iter_ordered, translate_methods
+
+
+def test_iter_ordered_reports_every_item_before_yielding_it():
+    rng = random.Random(0)
+
+    def worker(i):
+        time.sleep(rng.random() / 500)
+        return i * 2
+
+    for _ in range(20):
+        done = []
+
+        def slow_on_done(item, result):
+            time.sleep(0.002)  # lets more futures finish while the scan is running
+            done.append(item)
+
+        results = []
+        for item, result in iter_ordered(range(100), worker, concurrency=8, on_done=slow_on_done):
+            assert item in done
+            results.append((item, result))
+
+        assert results == [(i, i * 2) for i in range(100)]
+        assert sorted(done) == list(range(100))
+
+
+def test_async_path_streams_instead_of_waiting_for_windows():
+    from concurrent.futures import ThreadPoolExecutor
+    from contextlib import contextmanager
+
+    @contextmanager
+    def translate_async(concurrency):
+        with ThreadPoolExecutor(concurrency) as pool:
+
+            def submit(codes, contexts=None):
+                delay = 0.6 if codes == ["slow"] else 0.01
+                return pool.submit(lambda: time.sleep(delay) or [f"cs {c}" for c in codes])
+
+            yield submit
+
+    methods = [{"file": "F.vb", "code": "slow"}] + [
+        {"file": "F.vb", "code": f"m{i}"} for i in range(60)
+    ]
+    progressed = []
+    start = time.perf_counter()
+    entries = translate_methods(
+        methods,
+        translate=None,
+        concurrency=4,
+        on_progress=lambda m, cs: progressed.append((m["code"], time.perf_counter() - start)),
+        translate_async=translate_async,
+    )
+    first = next(entries)
+    rest = list(entries)
+
+    assert [first["cs"]] + [e["cs"] for e in rest] == [f"cs {m['code']}" for m in methods]
+    done_before_slow = [code for code, t in progressed if t < 0.5]
+    # the other three slots kept going while "slow" ran instead of waiting for it
+    assert len(done_before_slow) >= 20
@@ -0,0 +1,54 @@
+# test/test_vb_lexer.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vb_lexer import parse_vb
+
+SOURCE = """Public Class Sample
+    Public Function Outer() As Integer
+        Dim f = Function(x As List(Of Integer)) As Integer
+                    Return x.Count
+                End Function
+        Dim y = f(New List(Of Integer))
+        Return y
+    End Function
+
+    Public Sub Other()
+        Dim g = Sub(a As Dictionary(Of String, List(Of Integer)))
+                    Console.WriteLine(a.Count)
+                End Sub
+    End Sub
+End Class
+"""
+
+
+def test_multiline_lambda_with_nested_parentheses_keeps_enclosing_method():
+    parsed = parse_vb(SOURCE)
+    members = {m["name"]: m for m in parsed["members"]}
+    assert set(members) == {"Outer", "Other"}
+    outer = SOURCE[members["Outer"]["start"]:members["Outer"]["end"]]
+    assert "Return y" in outer
+    assert outer.rstrip().endswith("End Function")
+    assert members["Outer"]["end_line"] == 8
+    assert members["Other"]["end_line"] == 14
+
+
+def test_single_line_lambda_is_not_a_block():
+    parsed = parse_vb(
+        "Module M\n    Sub Run()\n        Dim f = Function(x As List(Of Integer)) x.Count\n"
+        "        Call f(Nothing)\n    End Sub\nEnd Module\n"
+    )
+    assert [(m["name"], m["end_line"]) for m in parsed["members"]] == [("Run", 5)]
+
+
+def test_logical_lines_cover_every_physical_line():
+    from vb_lexer import logical_lines
+
+    code = "Dim a = 1 ' it's\nDim s = \"x\" & _\n    \"y\"\nReturn a & _\n    b _\n"
+    assert [(text, first, last) for text, _, _, first, last in logical_lines(code)] == [
+        ("Dim a = 1", 1, 1),
+        ("Dim s = \"x\" & \"y\"", 2, 3),
+        ("Return a & b", 4, 5),  # dangling continuation: still ends on the last line
+    ]
@@ -0,0 +1,55 @@
+# test/test_vb_parser.py
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from symbol_index import SymbolIndex
+from vb_parser import iter_vb_methods
+
+CALLER = """Public Class Caller
+    Public Function Run() As Integer
+        Return ZHelper.Compute(2)
+    End Function
+End Class
+"""
+HELPER = """Public Class ZHelper
+    Public Shared Function Compute(x As Integer) As Integer
+        Return x * 2
+    End Function
+End Class
+"""
+
+
+def test_context_is_complete_before_the_first_method(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "A.vb").write_text(CALLER)
+    (repo / "Z.vb").write_text(HELPER)  # indexed after A.vb, which references it
+    monkeypatch.chdir(tmp_path)
+
+    contexts = []
+    for run in range(2):
+        symbols = SymbolIndex(str(repo))
+        methods = iter_vb_methods(str(repo), workers=1, symbols=symbols)
+        first = next(methods)
+        contexts.append(symbols.context_for(first))
+        list(methods)
+        symbols.close()
+
+    assert "Compute" in contexts[0]
+    assert contexts[0] == contexts[1]
+
+
+def test_deleted_files_leave_the_context(tmp_path, monkeypatch):
+    repo = tmp_path / "repo"
+    repo.mkdir()
+    (repo / "A.vb").write_text(CALLER)
+    (repo / "Z.vb").write_text(HELPER)
+    monkeypatch.chdir(tmp_path)
+    symbols = SymbolIndex(str(repo))
+    list(iter_vb_methods(str(repo), workers=1, symbols=symbols))
+
+    (repo / "Z.vb").unlink()
+    first = next(iter_vb_methods(str(repo), workers=1, symbols=symbols))
+    assert "Compute" not in symbols.context_for(first)
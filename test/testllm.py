@@ -1,6 +1,9 @@
 import os, sys
+from dotenv import load_dotenv
 
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+# API keys come from the project's .env; nothing loads it at import time any more
+load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env"))
 
 from ai_provider import LLMProvider
 
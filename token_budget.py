@@ -0,0 +1,69 @@
+# token_budget.py
+import os
+import re
+
+# Identifiers/numbers and single punctuation characters — roughly how BPE tokenizers cut code
+PIECE = re.compile(r"\w+|[^\w\s]")
+
+# (context window, max output) in tokens. Model prefixes override the provider default.
+PROVIDER_BUDGETS = {
+    "gemini": (1_000_000, 8_192),
+    "openrouter": (32_000, 4_096),
+    "huggingface": (4_096, 1_024),
+    "ollama": (4_096, 2_048),
+}
+MODEL_BUDGETS = {
+    "gemini-1.5-pro": (2_000_000, 8_192),
+    "gemini-2.5": (1_000_000, 65_536),
+    "gpt-4o": (128_000, 16_384),
+    "openai/gpt-4o": (128_000, 16_384),
+    "anthropic/claude": (200_000, 8_192),
+    "meta-llama/llama-3": (8_192, 4_096),
+    "mistralai/mistral": (32_000, 4_096),
+    "llama3": (8_192, 4_096),
+    "qwen2.5-coder": (32_768, 8_192),
+}
+DEFAULT_BUDGET = (8_192, 2_048)
+PROMPT_OVERHEAD = 200  # instructions + context block around the code
+OUTPUT_RATIO = 1.3  # C# is usually a bit longer than the VB.NET it replaces
+
+
+def estimate_tokens(text: str) -> int:
+    """Offline token estimate: short words count once, long ones ~4 characters per token."""
+    if not text:
+        return 1
+    return sum((len(p) + 3) // 4 for p in PIECE.findall(text)) + 1
+
+
+def budget_for(provider: str, model: str = ""):
+    """
+    {"context", "output"} token limits for a provider/model pair.
+    LLM_CONTEXT_TOKENS / LLM_OUTPUT_TOKENS override the table.
+    """
+    context, output = PROVIDER_BUDGETS.get((provider or "").lower(), DEFAULT_BUDGET)
+    name = (model or "").lower()
+    for prefix in sorted(MODEL_BUDGETS, key=len, reverse=True):
+        if name.startswith(prefix):
+            context, output = MODEL_BUDGETS[prefix]
+            break
+    context = int(os.getenv("LLM_CONTEXT_TOKENS", "0")) or context
+    output = int(os.getenv("LLM_OUTPUT_TOKENS", "0")) or output
+    return {"context": context, "output": output}
+
+
+def method_token_limit(provider: str, model: str = "") -> int:
+    """
+    Largest VB.NET method (in estimated tokens) that fits one request: its prompt must
+    fit the context window and its translation the output limit. MAX_METHOD_TOKENS overrides.
+    """
+    override = int(os.getenv("MAX_METHOD_TOKENS", "0"))
+    if override:
+        return override
+    budget = budget_for(provider, model)
+    by_output = int(budget["output"] / OUTPUT_RATIO)
+    by_context = budget["context"] - PROMPT_OVERHEAD - budget["output"]
+    return max(256, min(by_output, by_context))
+
+
+def fits_context(prompt: str, provider: str, model: str = "") -> bool:
+    return estimate_tokens(prompt) <= budget_for(provider, model)["context"]
@@ -0,0 +1,81 @@
+# translation_batcher.py
+import os
+import re
+from token_budget import estimate_tokens
+
+DEFAULT_BATCH_TOKENS = int(os.getenv("BATCH_TOKEN_BUDGET", "2000"))
+
+BATCH_PROMPT = (
+    "Convert each of the following VB.NET methods to idiomatic C#.\n"
+    "Every method is wrapped in <<<VB n>>> and <<<END VB n>>> markers.\n"
+    "Reply with one translation per method, wrapped in <<<CS n>>> and <<<END CS n>>> "
+    "markers using the same n, and write nothing outside the markers.\n\n{methods}"
+)
+CONTEXT_PROMPT = (
+    "Declarations from the rest of the project, for reference only (do not translate them):\n"
+    "{context}\n\n"
+)
+BATCH_RESPONSE_PATTERN = re.compile(r"<<<CS (\d+)>>>\s*(.*?)\s*<<<END CS \1>>>", re.DOTALL)
+
+
+def pack_batches(methods, budget=DEFAULT_BATCH_TOKENS, key=lambda m: m["code"]):
+    """
+    Next-fit bin-packing of consecutive methods into batches of at most `budget`
+    estimated tokens. Source order is preserved; methods bigger than half the budget
+    always travel alone. Works lazily on any iterable.
+    """
+    batch, used = [], 0
+    for method in methods:
+        cost = estimate_tokens(key(method))
+        if cost * 2 > budget:
+            if batch:
+                yield batch
+                batch, used = [], 0
+            yield [method]
+            continue
+        if batch and used + cost > budget:
+            yield batch
+            batch, used = [], 0
+        batch.append(method)
+        used += cost
+    if batch:
+        yield batch
+
+
+def build_batch_prompt(vb_codes, context="") -> str:
+    blocks = [
+        f"<<<VB {i}>>>\n{code}\n<<<END VB {i}>>>" for i, code in enumerate(vb_codes, 1)
+    ]
+    prompt = BATCH_PROMPT.format(methods="\n\n".join(blocks))
+    return CONTEXT_PROMPT.format(context=context) + prompt if context else prompt
+
+
+def merge_contexts(contexts, max_chars):
+    """Union of several context blocks (line-deduplicated, first seen first), capped at max_chars."""
+    out, seen, used = [], set(), 0
+    for context in contexts:
+        for line in (context or "").splitlines():
+            if line in seen:
+                continue
+            if used + len(line) + 1 > max_chars:
+                return "\n".join(out)
+            seen.add(line)
+            out.append(line)
+            used += len(line) + 1
+    return "\n".join(out)
+
+
+def split_batch_response(response, count):
+    """
+    Split a batched completion back into per-method translations.
+    Returns a list of length `count`; entries the model failed to deliver are None.
+    """
+    results = [None] * count
+    if not isinstance(response, str) or response.lstrip().startswith("⚠"):
+        return results
+    for match in BATCH_RESPONSE_PATTERN.finditer(response):
+        idx = int(match.group(1)) - 1
+        text = match.group(2).strip()
+        if 0 <= idx < count and text and results[idx] is None:
+            results[idx] = text
+    return results
@@ -0,0 +1,112 @@
+# translation_cache.py
+import os
+import hashlib
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.join("reports", "translation_cache.sqlite")
+DEFAULT_MAX_BYTES = int(float(os.getenv("TRANSLATION_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+
+def normalize_vb(vb_code: str) -> str:
+    """Drop indentation, trailing spaces and blank lines so cosmetic edits still hit."""
+    return "\n".join(line.strip() for line in vb_code.splitlines() if line.strip())
+
+
+def cache_key(vb_code: str, provider: str, model: str, template: str) -> str:
+    h = hashlib.sha256()
+    for part in (normalize_vb(vb_code), provider or "", model or "", template or ""):
+        h.update(part.encode("utf-8", errors="ignore"))
+        h.update(b"\x00")
+    return h.hexdigest()
+
+
+def is_cacheable(translation) -> bool:
+    """Only real translations are stored — never provider errors or failures."""
+    if not isinstance(translation, str) or not translation.strip():
+        return False
+    text = translation.lstrip()
+    return not (text.startswith("⚠") or text.startswith("// Translation failed"))
+
+
+class TranslationCache:
+    """Content-addressed SQLite cache of VB.NET → C# translations with LRU size eviction."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS translations (
+                key TEXT PRIMARY KEY,
+                translation TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            )"""
+        )
+        self._db.execute(
+            "CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations(last_used)"
+        )
+        self._db.commit()
+        self._total = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM translations"
+        ).fetchone()[0]
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._db.execute(
+                "SELECT translation FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute(
+                "UPDATE translations SET last_used = ? WHERE key = ?", (time.time(), key)
+            )
+            self._db.commit()
+            return row[0]
+
+    def put(self, key: str, translation: str):
+        if not is_cacheable(translation):
+            return
+        size = len(translation.encode("utf-8", errors="ignore"))
+        with self._lock:
+            old = self._db.execute(
+                "SELECT size FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO translations (key, translation, size, last_used) "
+                "VALUES (?, ?, ?, ?)",
+                (key, translation, size, time.time()),
+            )
+            self._total += size - (old[0] if old else 0)
+            if self._total > self.max_bytes:
+                self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        """Drop least-recently-used entries until the cache is back under 90% of its budget."""
+        target = int(self.max_bytes * 0.9)
+        rows = self._db.execute(
+            "SELECT key, size FROM translations ORDER BY last_used ASC"
+        )
+        doomed = []
+        for key, size in rows:
+            if self._total <= target:
+                break
+            doomed.append((key,))
+            self._total -= size
+        self._db.executemany("DELETE FROM translations WHERE key = ?", doomed)
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            self._db.close()
@@ -0,0 +1,183 @@
+# translation_engine.py
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from translation_batcher import pack_batches
+
+DEFAULT_CONCURRENCY = int(os.getenv("TRANSLATE_CONCURRENCY", "4"))
+PREFETCH_SIZE = 256
+_DONE = object()
+
+
+def _safe_translate(translate, vb_code, context=None):
+    try:
+        if context is None:
+            return translate(vb_code)
+        return translate(vb_code, context=context)
+    except Exception as e:
+        return f"// Translation failed: {e}"
+
+
+def prefetch(iterable, maxsize=PREFETCH_SIZE):
+    """
+    Drain `iterable` on a background thread into a bounded queue and yield from it,
+    so a slow producer (parsing) overlaps with the consumer (network I/O).
+    Exceptions raised by the producer are re-raised in the consumer.
+    """
+    q = queue.Queue(maxsize=maxsize)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                while not stop.is_set():
+                    try:
+                        q.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            q.put(_DONE)
+        except BaseException as e:
+            q.put(e)
+
+    threading.Thread(target=produce, name="prefetch", daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+def iter_ordered(items, worker, concurrency=None, window=None, on_done=None):
+    """
+    Run worker(item) on a bounded thread pool and yield (item, result) in source order.
+
+    At most `window` items are in flight at once, so memory stays bounded and a slow
+    item only holds back the yield order, not the other workers.
+    on_done(item, result) fires exactly once per item, as soon as it finishes
+    (completion order) and always before that item is yielded.
+    """
+    concurrency = max(1, concurrency or DEFAULT_CONCURRENCY)
+    window = max(concurrency, window or concurrency * 8)
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="translate") as pool:
+        yield from _ordered(items, lambda item: pool.submit(worker, item), window, on_done)
+
+
+def _ordered(items, submit, window, on_done=None):
+    """iter_ordered over any submit(item) → concurrent.futures.Future (threads or an event loop)."""
+    source = iter(items)
+    pending = deque()  # (item, future) in source order
+    reported = set()
+
+    def fill():
+        while len(pending) < window:
+            try:
+                item = next(source)
+            except StopIteration:
+                return
+            pending.append((item, submit(item)))
+
+    fill()
+    while pending:
+        if not pending[0][1].done():
+            waiting = [f for _, f in pending if f not in reported]
+            wait(waiting, return_when=FIRST_COMPLETED)
+
+        for item, future in pending:
+            if future.done() and future not in reported:
+                reported.add(future)
+                if on_done:
+                    on_done(item, future.result())
+
+        while pending and pending[0][1].done():
+            item, future = pending.popleft()
+            if future in reported:
+                reported.discard(future)
+            elif on_done:
+                # finished after the scan above: report it before it is yielded
+                on_done(item, future.result())
+            yield item, future.result()
+        fill()
+
+
+def translate_methods(
+    methods,
+    translate,
+    concurrency=None,
+    on_progress=None,
+    translate_batch=None,
+    batch_tokens=0,
+    context_for=None,
+    translate_async=None,
+):
+    """
+    Translate extracted VB.NET methods concurrently.
+    Yields report entries ({"file", "vb", "cs"}) in the same order as `methods`.
+
+    With `translate_batch` and a positive `batch_tokens`, consecutive small methods
+    are packed into one request; translate_batch(list_of_codes) must return a list
+    of translations of the same length.
+
+    `context_for(method)` returns extra project context (e.g. SymbolIndex.context_for);
+    it is passed to translate(code, context=...) and translate_batch(codes, contexts=...).
+
+    With `translate_async` (e.g. ai_refactor.async_translator) no worker threads are
+    used: `with translate_async(concurrency) as submit` opens one event loop, and
+    submit(codes, contexts=) starts a batch on it and returns a Future of its
+    translations. Batches stream through it like the thread pool: a new one starts
+    as each finishes and results are yielded in order.
+    """
+    packed = bool(batch_tokens and batch_tokens > 0 and (translate_batch or translate_async))
+    batches = pack_batches(methods, batch_tokens) if packed else ([m] for m in methods)
+    if not packed:
+        translate_batch = None
+
+    def worker(batch):
+        contexts = [context_for(m) for m in batch] if context_for else [None] * len(batch)
+        if translate_batch is None or len(batch) == 1:
+            return [_safe_translate(translate, m["code"], c) for m, c in zip(batch, contexts)]
+        try:
+            if context_for:
+                return translate_batch([m["code"] for m in batch], contexts=contexts)
+            return translate_batch([m["code"] for m in batch])
+        except Exception:
+            return [_safe_translate(translate, m["code"], c) for m, c in zip(batch, contexts)]
+
+    def on_batch_done(batch, translations):
+        if on_progress:
+            for method, translation in zip(batch, translations):
+                on_progress(method, translation)
+
+    if translate_async:
+        yield from _translate_async(
+            batches, translate_async, concurrency, on_batch_done, context_for
+        )
+        return
+
+    for batch, translations in iter_ordered(
+        batches, worker, concurrency=concurrency, on_done=on_batch_done
+    ):
+        for method, translation in zip(batch, translations):
+            yield {"file": method["file"], "vb": method["code"], "cs": translation}
+
+
+def _translate_async(batches, translate_async, concurrency, on_batch_done, context_for):
+    concurrency = max(1, concurrency or DEFAULT_CONCURRENCY)
+    with translate_async(concurrency) as submit:
+
+        def start(batch):
+            contexts = [context_for(m) for m in batch] if context_for else None
+            return submit([m["code"] for m in batch], contexts=contexts)
+
+        for batch, translations in _ordered(batches, start, concurrency * 8, on_batch_done):
+            for method, translation in zip(batch, translations):
+                yield {"file": method["file"], "vb": method["code"], "cs": translation}
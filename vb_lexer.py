@@ -0,0 +1,407 @@
+# vb_lexer.py
+"""
+Single-pass structural tokenizer for VB.NET sources.
+
+One linear scan over the logical lines of a file (comments stripped, `_` line
+continuations joined) emits Imports, Namespaces, types (Class / Module /
+Structure / Interface / Enum) and members (Sub / Function / Property / Operator)
+with 1-based line spans and character offsets into the decoded text.
+The parser, analyzer and annotator all read from this one result.
+"""
+import multiprocessing
+import os
+import re
+import threading
+from collections import OrderedDict, deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
+
+PARSER_VERSION = 3  # bump when parse results change: invalidates on-disk method caches
+DEFAULT_PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", "0")) or os.cpu_count() or 1
+POOL_MIN_FILES = 32  # below this, process start-up costs more than it saves
+EMPTY_PARSE = {"imports": [], "namespaces": [], "types": [], "members": []}
+
+MODIFIERS = (
+    "Public|Private|Protected|Friend|Shared|Overrides|Overridable|Overloads|"
+    "MustOverride|NotOverridable|Shadows|Static|ReadOnly|WriteOnly|Default|"
+    "Partial|Async|Iterator|NotInheritable|MustInherit|Widening|Narrowing"
+)
+BLOCK_KINDS = {
+    "namespace": "Namespace",
+    "class": "Class",
+    "module": "Module",
+    "structure": "Structure",
+    "interface": "Interface",
+    "enum": "Enum",
+    "sub": "Sub",
+    "function": "Function",
+    "property": "Property",
+    "operator": "Operator",
+}
+TYPE_KINDS = {"Class", "Module", "Structure", "Interface", "Enum"}
+MEMBER_KINDS = {"Sub", "Function", "Property", "Operator"}
+
+OPENER = re.compile(
+    r"^(?:<[^>]*>\s*)*(?P<mods>(?:(?:" + MODIFIERS + r")\s+)*)"
+    r"(?P<kind>Namespace|Class|Module|Structure|Interface|Enum|Sub|Function|Property|Operator)\s+"
+    r"(?P<name>\[?[A-Za-z_][\w.]*\]?|[^\s(]+)",
+    re.IGNORECASE,
+)
+END = re.compile(
+    r"^End\s+(Namespace|Class|Module|Structure|Interface|Enum|Sub|Function|Property|Operator)\b",
+    re.IGNORECASE,
+)
+IMPORTS = re.compile(r"^Imports\s+(?:[A-Za-z_]\w*\s*=\s*)?([A-Za-z_][\w.]*)", re.IGNORECASE)
+ACCESSOR = re.compile(
+    r"^(?:(?:Public|Private|Protected|Friend)\s+)*(?:Get|Set)\b", re.IGNORECASE
+)
+# A multi-line lambda header ends its line: `Dim f = Function(x As List(Of Integer)) As Integer`
+LAMBDA_START = re.compile(r"\b(Sub|Function)\s*\(", re.IGNORECASE)
+LAMBDA_TAIL = re.compile(r"\s*(?:As\s+[\w.]+\s*(?:\(.*\))?\s*)?", re.IGNORECASE)
+REM = re.compile(r"^\s*REM(?:\s|$)", re.IGNORECASE)
+# String literals ("" escapes read as two adjacent strings) or a comment quote
+STRING_OR_COMMENT = re.compile(r""""[^"]*"?|['‘’]""")
+# Cheap pre-filter: only logical lines containing one of these can matter structurally
+KEYWORDS = re.compile(
+    r"\b(?:sub|function|property|operator|class|module|structure|interface|enum|"
+    r"namespace|imports|end)\b",
+    re.IGNORECASE,
+)
+
+
+def _has_initializer(rest: str) -> bool:
+    """True if a property header carries `= value` or `As New` outside its parentheses."""
+    if re.search(r"\bAs\s+New\b", rest, re.IGNORECASE):
+        return True
+    depth = 0
+    for ch in rest:
+        if ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "=" and depth == 0:
+            return True
+    return False
+
+
+def _closing_paren(text: str, i: int) -> int:
+    """Index of the ")" closing the "(" at text[i], by depth; -1 if unbalanced."""
+    depth = 0
+    for j in range(i, len(text)):
+        if text[j] == "(":
+            depth += 1
+        elif text[j] == ")":
+            depth -= 1
+            if depth == 0:
+                return j
+    return -1
+
+
+def _lambda_header(text: str):
+    """"Sub" / "Function" if the line ends with a multi-line lambda header, else None."""
+    for m in LAMBDA_START.finditer(text):
+        close = _closing_paren(text, m.end() - 1)
+        if close != -1 and LAMBDA_TAIL.fullmatch(text, close + 1):
+            return m.group(1)
+    return None
+
+
+def _strip_comment(line: str) -> str:
+    """Remove a trailing ' or REM comment, ignoring quotes inside string literals."""
+    if "'" in line or "‘" in line or "’" in line:
+        for m in STRING_OR_COMMENT.finditer(line):
+            if m.group(0) in "'‘’":
+                line = line[:m.start()]
+                break
+    return "" if REM.match(line) else line
+
+
+def logical_lines(content: str):
+    """
+    Yield (text, start_offset, end_offset, first_line, last_line) per logical line:
+    physical lines joined on `_` continuations, comments stripped. Line numbers are
+    1-based and inclusive, so every physical line belongs to exactly one logical
+    line (a dangling `_` at the end runs to the last line).
+    """
+    offset = 0
+    buf, buf_start, first_line, lineno = [], 0, 0, 0
+    for lineno, raw in enumerate(content.splitlines(keepends=True), 1):
+        line_start = offset
+        offset += len(raw)
+        line = raw.rstrip("\r\n")
+        code = _strip_comment(line).strip()
+        if not buf:
+            buf_start, first_line = line_start + (len(raw) - len(raw.lstrip())), lineno
+        if code.endswith(" _") or code == "_":
+            buf.append(code[:-1].strip())
+            continue
+        if buf:
+            buf.append(code)
+            text = " ".join(p for p in buf if p)
+            buf = []
+        else:
+            text = code
+        yield text, buf_start, line_start + len(line), first_line, lineno
+    if buf:
+        text = " ".join(p for p in buf if p)
+        yield text, buf_start, offset, first_line, lineno
+
+
+def parse_vb(content: str):
+    """
+    Tokenize one VB.NET source text.
+    Returns {"imports", "namespaces", "types", "members"}; every element carries
+    kind, name, namespace, container, start_line, end_line, start, end.
+    Auto-properties and bodiless declarations are members with "body": False.
+    """
+    result = {"imports": [], "namespaces": [], "types": [], "members": []}
+    stack = []
+    pending_property = None
+
+    def namespace():
+        return ".".join(f["name"] for f in stack if f["kind"] == "Namespace")
+
+    def container():
+        for f in reversed(stack):
+            if f["kind"] in TYPE_KINDS:
+                return f
+        return None
+
+    def emit(frame, end, end_line, body=True):
+        item = {
+            "kind": frame["kind"],
+            "name": frame["name"],
+            "namespace": frame["namespace"],
+            "container": frame["container"],
+            "start_line": frame["start_line"],
+            "end_line": end_line,
+            "start": frame["start"],
+            "end": end,
+        }
+        if frame["kind"] == "Namespace":
+            result["namespaces"].append(item)
+        elif frame["kind"] in TYPE_KINDS:
+            result["types"].append(item)
+        else:
+            item["body"] = body
+            result["members"].append(item)
+
+    for text, start, end, first_line, last_line in logical_lines(content):
+        if not text:
+            continue
+
+        if pending_property is not None:
+            frame, pending_property = pending_property, None
+            if ACCESSOR.match(text):
+                stack.append(frame)
+            else:
+                emit(frame, frame["header_end"], frame["start_line"], body=False)
+
+        if not KEYWORDS.search(text):
+            continue
+
+        m = END.match(text)
+        if m:
+            kind = BLOCK_KINDS[m.group(1).lower()]
+            for i in range(len(stack) - 1, -1, -1):
+                if stack[i]["kind"] == kind:
+                    frame = stack[i]
+                    del stack[i:]
+                    if not frame.get("lambda"):
+                        emit(frame, end, last_line)
+                    break
+            continue
+
+        m = OPENER.match(text)
+        if m:
+            kind = BLOCK_KINDS[m.group("kind").lower()]
+            name = m.group("name").strip("[]")
+            owner = container()
+            frame = {
+                "kind": kind,
+                "name": name,
+                "namespace": namespace(),
+                "container": owner["name"] if owner else "",
+                "start_line": first_line,
+                "start": start,
+                "header_end": end,
+            }
+            if kind in MEMBER_KINDS:
+                mods = m.group("mods").lower()
+                if (owner and owner["kind"] == "Interface") or "mustoverride" in mods:
+                    emit(frame, end, last_line, body=False)
+                elif kind == "Property":
+                    if _has_initializer(text[m.end():]):
+                        emit(frame, end, last_line, body=False)
+                    else:
+                        pending_property = frame
+                else:
+                    stack.append(frame)
+            else:
+                stack.append(frame)
+            continue
+
+        m = IMPORTS.match(text)
+        if m:
+            result["imports"].append({"name": m.group(1), "line": first_line})
+            continue
+
+        lambda_kind = _lambda_header(text)
+        if lambda_kind:
+            stack.append({"kind": BLOCK_KINDS[lambda_kind.lower()], "lambda": True,
+                          "name": "", "namespace": "", "container": "",
+                          "start_line": first_line, "start": start})
+
+    if pending_property is not None:
+        emit(pending_property, pending_property["header_end"], pending_property["start_line"], body=False)
+    for f in stack:
+        if f["kind"] in TYPE_KINDS or f["kind"] == "Namespace":
+            emit(f, len(content), content.count("\n") + 1)
+
+    result["members"] = [m for m in result["members"] if m["name"]]
+    result["members"].sort(key=lambda m: m["start"])
+    result["types"].sort(key=lambda t: t["start"])
+    return result
+
+
+# ---- Shared per-file parse cache ----
+_CACHE_SIZE = 50_000
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def read_source(path: str) -> str:
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return f.read()
+
+
+def _file_key(path: str):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+
+def _cache_get(key):
+    if key is None:
+        return None
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None:
+            _cache.move_to_end(key)
+        return hit
+
+
+def _cache_put(key, parsed):
+    if key is None:
+        return
+    with _cache_lock:
+        _cache[key] = parsed
+        if len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+
+
+def parse_vb_file(path: str, content: str = None):
+    """
+    Parse a file once per (path, size, mtime); later calls from other agents reuse
+    the structural result without re-reading the file.
+    """
+    key = _file_key(path)
+    hit = _cache_get(key)
+    if hit is not None:
+        return hit
+    try:
+        parsed = parse_vb(content if content is not None else read_source(path))
+    except OSError:
+        parsed = EMPTY_PARSE
+    _cache_put(key, parsed)
+    return parsed
+
+
+def _member_bodies(content: str, parsed):
+    return [content[m["start"]:m["end"]] for m in parsed["members"] if m["body"]]
+
+
+def _parse_worker(job):
+    """Runs in a pool process: returns (key, parsed, method bodies or None)."""
+    path, with_code = job
+    key = _file_key(path)
+    try:
+        content = read_source(path)
+    except OSError:
+        return key, EMPTY_PARSE, [] if with_code else None
+    parsed = parse_vb(content)
+    return key, parsed, _member_bodies(content, parsed) if with_code else None
+
+
+def _parse_chunk(jobs):
+    return [_parse_worker(job) for job in jobs]
+
+
+def _resolve_cached(path, with_code):
+    """Answer from the shared parse cache if another stage already tokenized `path`."""
+    hit = _cache_get(_file_key(path))
+    if hit is None:
+        return None
+    return hit, _member_bodies(read_source(path), hit) if with_code else None
+
+
+def _store(result):
+    key, parsed, bodies = result
+    _cache_put(key, parsed)
+    return parsed, bodies
+
+
+def _pool_context():
+    """
+    Workers must not be forked: this runs on the prefetch thread while the
+    translation threads hold locks that a forked child would inherit locked.
+    forkserver where the platform has it (cheap, fork-free), otherwise spawn.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def iter_parse_vb_files(paths, workers=None, with_code=False, chunksize=16):
+    """
+    Lazily parse many files, spreading chunks across a process pool.
+    Yields (parsed, bodies) in the same order as `paths` (deterministic) while later
+    chunks are still being parsed; only a few chunks per worker are in flight.
+    `bodies` lists the source text of every member with a body when with_code=True.
+    Results seed the parse_vb_file cache so later consumers skip the work.
+    """
+    workers = max(1, workers or DEFAULT_PARSE_WORKERS)
+    if hasattr(paths, "__len__") and len(paths) < POOL_MIN_FILES:
+        workers = 1
+    source = iter(paths)
+
+    if workers == 1:
+        for path in source:
+            yield _resolve_cached(path, with_code) or _store(_parse_worker((path, with_code)))
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=_pool_context()) as pool:
+        pending = deque()
+
+        def fill():
+            while len(pending) < workers * 2:
+                chunk = list(islice(source, chunksize))
+                if not chunk:
+                    return
+                local = [_resolve_cached(p, with_code) for p in chunk]
+                jobs = [(p, with_code) for p, r in zip(chunk, local) if r is None]
+                pending.append((local, pool.submit(_parse_chunk, jobs) if jobs else None))
+
+        fill()
+        while pending:
+            local, future = pending.popleft()
+            parsed = iter(future.result() if future else [])
+            fill()
+            for result in local:
+                yield result if result is not None else _store(next(parsed))
+
+
+def parse_vb_files(paths, workers=None, with_code=False):
+    """Eager form of iter_parse_vb_files: returns [(parsed, bodies)] in input order."""
+    return list(iter_parse_vb_files(list(paths), workers=workers, with_code=with_code))
@@ -1,15 +1,134 @@
-import glob, re, os
+import os, json
+from repo_index import scan_repository, files_with_ext, load_manifest
+from vb_lexer import PARSER_VERSION, parse_vb, iter_parse_vb_files
 
+METHODS_CACHE_PATH = os.path.join("reports", "vb_methods.json")
 
-def extract_vb_methods(repo_path, console):
-    methods = []
-    for file in glob.glob(os.path.join(repo_path, "**/*.vb"), recursive=True):
-        with open(file, "r", encoding="utf-8", errors="ignore") as f:
-            content = f.read()
-        matches = re.findall(
-            r"(?:Public|Private|Protected|Friend)\s+Sub\s+[\s\S]*?End\s+Sub", content
+
+def _method_records(parsed, bodies):
+    members = [m for m in parsed["members"] if m["body"]]
+    return [
+        {
+            "code": code,
+            "start": m["start"],
+            "end": m["end"],
+            "kind": m["kind"],
+            "name": m["name"],
+            "container": m["container"],
+            "start_line": m["start_line"],
+            "end_line": m["end_line"],
+        }
+        for m, code in zip(members, bodies)
+    ]
+
+
+def extract_methods_from_content(content: str, parsed=None):
+    """Subs, Functions, Properties and Operators that have a body, in source order."""
+    parsed = parsed or parse_vb(content)
+    bodies = [content[m["start"]:m["end"]] for m in parsed["members"] if m["body"]]
+    return _method_records(parsed, bodies)
+
+
+def _load_methods_cache(repo_path, path=METHODS_CACHE_PATH):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("root") != os.path.abspath(repo_path) or data.get("version") != PARSER_VERSION:
+        return {}
+    return data.get("files", {})
+
+
+def _save_methods_cache(repo_path, files, path=METHODS_CACHE_PATH):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(
+            {"root": os.path.abspath(repo_path), "version": PARSER_VERSION, "files": files}, f
+        )
+
+
+def iter_vb_methods(
+    repo_path, index=None, incremental=True, workers=None, stats=None, symbols=None
+):
+    """
+    Lazily yield VB.NET methods from every .vb file in the repo, in index order,
+    as soon as each file is parsed — so translation can start before parsing ends.
+    Per-file results are kept in reports/vb_methods.json with the file hash they
+    came from, so only added or changed files are re-parsed on the next run.
+    Files to parse are spread over `workers` processes (default PARSE_WORKERS / CPU count).
+    `stats`, if given, is filled with {"files", "parsed", "methods"} as it goes.
+    `symbols`, a symbol_index.SymbolIndex, is updated for every file that is re-parsed.
+    With `symbols`, every changed file is parsed and indexed before the first method
+    is yielded: cross-file context (and so the prompt and cache key) must not depend
+    on how far parsing has got.
+    """
+    stats = stats if stats is not None else {}
+    stats.update(files=0, parsed=0, methods=0)
+    if index is None:
+        index = scan_repository(repo_path, previous=load_manifest(repo_path))
+    cached_files = _load_methods_cache(repo_path) if incremental else {}
+    files = {}
+
+    vb_files = files_with_ext(index, ".vb")
+    stale = [
+        e for e in vb_files
+        if not (
+            e["hash"]
+            and e["rel_path"] in cached_files
+            and cached_files[e["rel_path"]]["hash"] == e["hash"]
+            and not (symbols and symbols.needs_update(e["rel_path"], e["hash"]))
+        )
+    ]
+    stale_paths = {e["rel_path"] for e in stale}
+    fresh = iter_parse_vb_files([e["path"] for e in stale], workers=workers, with_code=True)
+
+    def parse_stale():
+        for entry, (parsed, bodies) in zip(stale, fresh):
+            file_methods = _method_records(parsed, bodies)
+            if symbols:
+                symbols.update_file(entry["rel_path"], entry["hash"], parsed, file_methods)
+            yield file_methods
+
+    reparsed = parse_stale()
+    if symbols:
+        reparsed = iter(list(reparsed))
+        symbols.retain(e["rel_path"] for e in vb_files)
+
+    for entry in vb_files:
+        if entry["rel_path"] in stale_paths:
+            file_methods = next(reparsed)
+            stats["parsed"] += 1
+        else:
+            file_methods = cached_files[entry["rel_path"]]["methods"]
+        files[entry["rel_path"]] = {"hash": entry["hash"], "methods": file_methods}
+        stats["files"] += 1
+        for m in file_methods:
+            stats["methods"] += 1
+            yield {"file": entry["path"], **m}
+
+    if stats["parsed"] or set(files) != set(cached_files):
+        _save_methods_cache(repo_path, files)
+
+
+def extract_vb_methods(
+    repo_path, console, index=None, incremental=True, workers=None, symbols=None
+):
+    """Eager form of iter_vb_methods: returns the full list and prints a count."""
+    stats = {}
+    methods = list(
+        iter_vb_methods(
+            repo_path,
+            index=index,
+            incremental=incremental,
+            workers=workers,
+            stats=stats,
+            symbols=symbols,
+        )
+    )
+    if incremental and stats["parsed"] < stats["files"]:
+        console.print(
+            f"[cyan]♻ Re-parsed {stats['parsed']} of {stats['files']} VB.NET files[/cyan]"
         )
-        for m in matches:
-            methods.append({"file": file, "code": m})
     console.print(f"[green]✅ Found {len(methods)} VB.NET methods[/green]")
     return methods